@@ -4,10 +4,10 @@ Initialization module for the Flask application.
 
 import os
 from dotenv import load_dotenv
-from pathlib import Path
 load_dotenv()
 from flask import Flask
 from flask_pymongo import PyMongo
+from . import db, metrics
 from .routes import main as main_blueprint
 
 def create_app(config=None):
@@ -17,32 +17,34 @@ def create_app(config=None):
     app = Flask(__name__)
     app.secret_key = os.environ.get("SECRET_KEY")
     
-    # Get the absolute path to the certificate file
-    cert_path = os.path.join(Path(__file__).parent.parent, 'isrgrootx1.pem')
-    
-    # Update MongoDB URI with absolute cert path
-    mongo_uri = os.environ.get("MONGO_URI")
-    if mongo_uri and 'tlsCAFile=' in mongo_uri:
-        mongo_uri = mongo_uri.replace('tlsCAFile=./isrgrootx1.pem', f'tlsCAFile={cert_path}')
-        
-    app.config["MONGO_URI"] = mongo_uri
-    
-    mongo = PyMongo(app)
+    # MongoDB URI with the absolute cert path
+    app.config["MONGO_URI"] = db.mongo_uri()
+
+    # One pooled client per process, shared with the scraper and the job threads
+    mongo = PyMongo(app, **db.client_options())
     app.mongo = mongo
+    db.set_client(mongo.cx)
 
     with app.app_context():
-        from .models import Item
+        from .models import Item, PriceHistory, JobRun, ProductGroup, Deals
         try:
             Item.init_collection()
+            PriceHistory.init_collection()
+            JobRun.init_collection()
+            ProductGroup.init_collection()
+            Deals.init_collection()
         except Exception as e:
             app.logger.error("Collection creation failed: %s", e)
 
     if config:
         app.config.update(config)
 
+    metrics.init_app(app)
     app.register_blueprint(main_blueprint)
     from app.admin import admin_bp
     app.register_blueprint(admin_bp)
+    from app.api import api
+    app.register_blueprint(api)
 
     return app
 
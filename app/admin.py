@@ -1,17 +1,17 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, session
+from flask import Blueprint, abort, render_template, request, redirect, url_for, flash, current_app, session, jsonify
 from app.scraper import parse_maxima_sales, parse_rimi_sales, categorize_maxima_items, upload_all_images
+from bson.objectid import ObjectId
+from app.models import JobRun
+from app import jobs, profiling
 import os
-from threading import Thread
-from flask import copy_current_request_context
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin', template_folder='templates')
 
-# Helper to run tasks in background threads with request context
-def run_in_background(task, *args, **kwargs):
-    @copy_current_request_context
-    def wrapper():
-        task(*args, **kwargs)
-    Thread(target=wrapper).start()
+def start_job(job_type, task, message):
+    if jobs.submit(job_type, task):
+        flash(message, "success")
+    else:
+        flash(f"A {job_type} run is already in progress.", "warning")
 
 @admin_bp.before_request
 def require_login():
@@ -43,8 +43,7 @@ def index():
 @admin_bp.route('/run_maxima', methods=['POST'])
 def run_maxima():
     try:
-        run_in_background(parse_maxima_sales)
-        flash("Maxima sales parsing started in the background.", "success")
+        start_job("scrape_maxima", parse_maxima_sales, "Maxima sales parsing started in the background.")
     except Exception as e:
         current_app.logger.error("Error in parsing Maxima sales: %s", e)
         flash("Error in parsing Maxima sales", "danger")
@@ -53,8 +52,7 @@ def run_maxima():
 @admin_bp.route('/run_rimi', methods=['POST'])
 def run_rimi():
     try:
-        run_in_background(parse_rimi_sales)
-        flash("Rimi sales parsing started in the background.", "success")
+        start_job("scrape_rimi", parse_rimi_sales, "Rimi sales parsing started in the background.")
     except Exception as e:
         current_app.logger.error("Error in parsing Rimi sales: %s", e)
         flash("Error in parsing Rimi sales", "danger")
@@ -63,8 +61,7 @@ def run_rimi():
 @admin_bp.route('/categorize', methods=['POST'])
 def categorize():
     try:
-        run_in_background(categorize_maxima_items)
-        flash("Categorizing Maxima items started in the background.", "success")
+        start_job("categorize_maxima", categorize_maxima_items, "Categorizing Maxima items started in the background.")
     except Exception as e:
         current_app.logger.error("Error in categorizing Maxima items: %s", e)
         flash("Error in categorizing Maxima items", "danger")
@@ -86,8 +83,50 @@ def upload_images():
     Route to upload images for all items.
     """
     try:
-        run_in_background(upload_all_images)
-        flash("Image upload started in the background.", "success")
+        start_job("upload_images", upload_all_images, "Image upload started in the background.")
     except Exception as e:
         flash(f"Error during image upload: {e}", "error")
     return redirect(url_for("admin.index"))
+
+@admin_bp.route("/jobs", methods=["GET"])
+def job_runs():
+    """
+    Lists recent job runs with their status, progress and duration (`?format=json` for JSON).
+    """
+    runs = JobRun.recent(limit=request.args.get("limit", 50, type=int))
+    if request.args.get("format") == "json":
+        for run in runs:
+            run["_id"] = str(run["_id"])
+        return jsonify(runs)
+    return render_template("admin_jobs.html", runs=runs)
+
+@admin_bp.route("/jobs/<run_id>/cancel", methods=["POST"])
+def cancel_job(run_id):
+    if not ObjectId.is_valid(run_id):
+        abort(404)
+    if JobRun.request_cancel(run_id):
+        flash("Cancellation requested.", "success")
+    else:
+        flash("That run is no longer active.", "warning")
+    return redirect(url_for("admin.job_runs"))
+
+@admin_bp.route("/profiling", methods=["GET", "POST"])
+def profiling_settings():
+    """
+    Sets the share of /search requests profiled with cProfile and lists the stored dumps.
+    """
+    if request.method == "POST":
+        rate = profiling.set_sample_rate(request.form.get("sample_rate", 0, type=float))
+        flash(f"Profiling {rate:.0%} of searches." if rate else "Search profiling is off.", "success")
+        return redirect(url_for("admin.profiling_settings"))
+    return render_template("admin_profiling.html", sample_rate=profiling.sample_rate(), dumps=profiling.dumps())
+
+@admin_bp.route("/profiling/<name>", methods=["GET"])
+def profile_report(name):
+    """
+    Shows the functions of a profile dump by cumulative time.
+    """
+    report = profiling.report(name, limit=request.args.get("limit", 40, type=int))
+    if report is None:
+        abort(404)
+    return current_app.response_class(report, mimetype="text/plain")
@@ -0,0 +1,196 @@
+"""
+JSON API for clients other than the server-rendered pages.
+
+Responses carry only the fields a client needs, are compressed with Brotli (when
+the `brotli` package is installed) or gzip when the client accepts it, and carry
+a weak ETag so that clients can revalidate with If-None-Match.
+"""
+
+import os
+import gzip
+import json
+import base64
+import hashlib
+import binascii
+from flask import Blueprint, current_app, jsonify, request, abort
+from .models import Item, ProductGroup, Deals
+from .search import SORTS, get_path
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+GROUPS_PAGE_SIZE = 50
+GROUPS_MAX_PAGE_SIZE = 200
+# Deal lists hold up to DEALS_TOP_N rows per partition
+DEALS_PAGE_SIZE = 20
+DEALS_MAX_PAGE_SIZE = 100
+# Smaller bodies are sent uncompressed
+MIN_COMPRESS_SIZE = 512
+
+@api.errorhandler(400)
+def bad_request(error):
+    return jsonify(error=error.description), 400
+
+def api_item(doc):
+    """
+    The API shape of an item document.
+    """
+    price = doc.get("price") or {}
+    return {
+        "id": str(doc["_id"]) if doc.get("_id") is not None else None,
+        "name": doc.get("name"),
+        "product_id": doc.get("product_id"),
+        "store": doc.get("store"),
+        "category": doc.get("category"),
+        "brand": doc.get("brand"),
+        "image_url": doc.get("image_url"),
+        "quantity": doc.get("quantity"),
+        "unit": doc.get("unit"),
+        "stock": doc.get("stock"),
+        "price": price.get("value"),
+        "old_price": price.get("old_value"),
+        "discount": price.get("discount"),
+        "price_per_unit": price.get("price_per_unit"),
+        "discount_deadline": get_path(doc, "time.discount_deadline"),
+    }
+
+def encode_cursor(state):
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        abort(400, description="Invalid cursor")
+
+def json_response(payload):
+    """
+    Serializes `payload` with a weak ETag (answering 304 when it matches) and the best
+    compression the client accepts.
+    """
+    body = current_app.json.dumps(payload).encode()
+    response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(hashlib.blake2b(body, digest_size=16).hexdigest(), weak=True)
+    response.headers["Cache-Control"] = f"public, max-age={int(os.environ.get('API_CACHE_MAX_AGE', 60))}"
+    response.vary.add("Accept-Encoding")
+    response.make_conditional(request)
+    if response.status_code == 304 or len(body) < MIN_COMPRESS_SIZE:
+        return response
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        response.set_data(brotli.compress(body, quality=5))
+        response.headers["Content-Encoding"] = "br"
+    elif accepted["gzip"]:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
+def search_filters(args):
+    filters = {}
+    for name in ("category", "store"):
+        if args.get(name):
+            filters[name] = args[name]
+    if args.get("stock") in ("true", "false"):
+        filters["stock"] = args["stock"] == "true"
+    for name in ("min_quantity", "max_quantity"):
+        value = args.get(name, type=float)
+        if value is not None:
+            filters[name] = value
+    return filters
+
+@api.route("/search")
+def search():
+    """
+    One page of search results as JSON:
+    `?query=`, `?sort=relevance|price|price_per_unit|discount`, `?order=asc|desc`,
+    `?limit=` (up to 100), the filters `category`, `store`, `stock`, `min_quantity`,
+    `max_quantity`, and `?cursor=` from the previous page's `next_cursor`.
+    """
+    query = request.args.get("query", "").strip()
+    if not query:
+        abort(400, description="query is required")
+    sort = request.args.get("sort", "relevance")
+    if sort not in SORTS:
+        abort(400, description=f"sort must be one of {', '.join(SORTS)}")
+    order = request.args.get("order") if request.args.get("order") in ("asc", "desc") else None
+    descending = {"asc": False, "desc": True}.get(order)
+    limit = min(max(request.args.get("limit", PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    filters = search_filters(request.args)
+
+    after = None
+    cursor = request.args.get("cursor")
+    if cursor:
+        state = decode_cursor(cursor)
+        # A cursor only continues the listing it came from
+        if not isinstance(state, dict) or state.get("sort") != [sort, order]:
+            abort(400, description="Cursor does not match this sort order")
+        after = state.get("after")
+
+    items, next_after = Item.search_page(query, filters, sort, descending, limit, after)
+    next_cursor = encode_cursor({"sort": [sort, order], "after": next_after}) if next_after is not None else None
+    return json_response({"query": query, "sort": sort, "items": [api_item(item) for item in items],
+                          "next_cursor": next_cursor})
+
+def api_group(doc):
+    """
+    The API shape of a product group (see app.matching).
+    """
+    group = {key: doc.get(key) for key in ("name", "category", "unit", "quantity", "stores", "size",
+                                           "cheapest", "savings")}
+    group["id"] = doc["_id"]
+    if "members" in doc:
+        group["members"] = doc["members"]
+    return group
+
+@api.route("/groups")
+def groups():
+    """
+    Groups of equivalent products across stores with their cheapest offer, cheapest per
+    unit first: `?category=`, `?limit=` (up to 200). `?store=&product_id=` instead returns
+    the group of one item with all of its members.
+    """
+    store, product_id = request.args.get("store"), request.args.get("product_id")
+    if store or product_id:
+        if not (store and product_id):
+            abort(400, description="store and product_id go together")
+        group = ProductGroup.for_item(store, product_id)
+        return json_response({"group": api_group(group) if group else None})
+    limit = min(max(request.args.get("limit", GROUPS_PAGE_SIZE, type=int), 1), GROUPS_MAX_PAGE_SIZE)
+    category = request.args.get("category") or None
+    return json_response({"category": category,
+                          "groups": [api_group(group) for group in ProductGroup.cheapest(category, limit)]})
+
+def deals_limit():
+    return min(max(request.args.get("limit", DEALS_PAGE_SIZE, type=int), 1), DEALS_MAX_PAGE_SIZE)
+
+@api.route("/deals/discounts")
+def top_discounts():
+    """
+    The deepest discounts, from the list materialized after each scrape: `?category=`, `?store=`, `?limit=`.
+    """
+    items = Deals.top_discounts(request.args.get("category"), request.args.get("store"), deals_limit())
+    return json_response({"items": [api_item(item) for item in items]})
+
+@api.route("/deals/cheapest")
+def cheapest_per_unit():
+    """
+    The lowest prices per unit: `?category=`, `?unit=` (g, ml, ...), `?limit=`.
+    """
+    items = Deals.cheapest_per_unit(request.args.get("category"), request.args.get("unit"), deals_limit())
+    return json_response({"items": [api_item(item) for item in items]})
+
+@api.route("/deals/expiring")
+def expiring_deals():
+    """
+    Discounts ending soonest: `?category=`, `?days=` (ending within that many days), `?limit=`.
+    """
+    days = request.args.get("days", type=int)
+    if days is not None and days < 0:
+        abort(400, description="days must not be negative")
+    items = Deals.expiring(request.args.get("category"), days, deals_limit())
+    return json_response({"items": [api_item(item) for item in items]})
@@ -0,0 +1,116 @@
+"""
+In-process caches for search results and page metadata.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire `ttl` seconds after being set.
+    Counts hits, misses and evictions for monitoring.
+    """
+
+    def __init__(self, name, maxsize=256, ttl=300):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        CACHES[name] = self
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_set(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class DataVersion:
+    """
+    Drops every cache when the items data version changes. The version is bumped in
+    MongoDB whenever a scrape run commits, so the caches of all gunicorn workers
+    follow it; each worker reads it at most once every `interval` seconds.
+    """
+
+    def __init__(self, interval=5):
+        self.interval = interval
+        self.version = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def check(self, load_version):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked < self.interval:
+                return
+            self._checked = now
+        version = load_version()
+        with self._lock:
+            if version != self.version:
+                if self.version is not None:
+                    clear_all()
+                self.version = version
+
+    def reset(self):
+        with self._lock:
+            self._checked = 0.0
+
+
+CACHES = {}
+
+def clear_all():
+    for cache in CACHES.values():
+        cache.clear()
+
+def stats():
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
+
+search_cache = TTLCache("search",
+                        maxsize=int(os.environ.get("SEARCH_CACHE_SIZE", 512)),
+                        ttl=float(os.environ.get("SEARCH_CACHE_TTL", 300)))
+metadata_cache = TTLCache("metadata", maxsize=32, ttl=float(os.environ.get("METADATA_CACHE_TTL", 600)))
+data_version = DataVersion(interval=float(os.environ.get("CACHE_VERSION_INTERVAL", 5)))
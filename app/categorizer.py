@@ -0,0 +1,150 @@
+"""
+Categorizer for items scraped without a category (Maxima), used by the scraper on
+ingest and by the batch re-categorize job.
+
+Keywords from category_keywords.txt are tried first, all at once through one
+compiled regex. Items no keyword matches take the category most common among
+their nearest labelled Rimi items in a char trigram TF-IDF index.
+"""
+
+import re
+import json
+import math
+import hashlib
+import logging
+from collections import defaultdict
+import numpy as np
+from app.models import Item
+from app.search import fold, trigrams
+
+logger = logging.getLogger(__name__)
+
+KEYWORDS_PATH = 'app/category_keywords.txt'
+# Bump when the categorization logic changes so the batch job revisits every item
+CATEGORIZER_VERSION = 1
+
+def load_category_keywords(path=KEYWORDS_PATH):
+    """Load category keywords from file."""
+    keywords = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if '=' in line:
+                    category, words = line.strip().split('=', 1)
+                    # A category may be spread over several lines
+                    keywords.setdefault(category, []).extend(
+                        word.strip().lower() for word in words.split(',') if word.strip())
+    except FileNotFoundError:
+        logger.error("Category keywords file not found")
+        return {}
+    return keywords
+
+
+class KeywordMatcher:
+    """
+    Finds the first category (in file order) with a keyword contained in a name,
+    scanning the name once with a single regex instead of once per keyword.
+    """
+
+    def __init__(self, keywords):
+        rank = {}
+        for index, (category, words) in enumerate(keywords.items()):
+            for word in words:
+                rank.setdefault(word, (index, category))
+        # The regex reports the longest keyword starting at each position, so each keyword
+        # also carries the best rank of the shorter keywords it starts with
+        self.rank = {word: min(r for other, r in rank.items() if word.startswith(other)) for word in rank}
+        alternatives = sorted(rank, key=len, reverse=True)
+        self.pattern = re.compile("(?=(%s))" % "|".join(map(re.escape, alternatives))) if alternatives else None
+
+    def match(self, name):
+        if self.pattern is None or not name:
+            return None
+        best = min((self.rank[m.group(1)] for m in self.pattern.finditer(name.lower())), default=None)
+        return best[1] if best else None
+
+
+class SimilarityIndex:
+    """
+    TF-IDF weighted char trigram vectors of labelled names, stored as NumPy posting
+    arrays. A query is scored against every labelled name with one bincount.
+    """
+
+    def __init__(self, names, labels, neighbours=10, min_similarity=0.3):
+        self.labels = list(labels)
+        self.neighbours = neighbours
+        self.min_similarity = min_similarity
+        docs = [trigrams(fold(name)) for name in names]
+        postings = defaultdict(list)
+        for i, grams in enumerate(docs):
+            for gram in grams:
+                postings[gram].append(i)
+        self.idf = {gram: math.log((1 + len(docs)) / (1 + len(ids))) + 1 for gram, ids in postings.items()}
+        norms = np.zeros(len(docs))
+        for gram, ids in postings.items():
+            norms[ids] += self.idf[gram] ** 2
+        norms = np.sqrt(norms)
+        norms[norms == 0] = 1
+        self.postings = {}
+        for gram, ids in postings.items():
+            ids = np.array(ids, dtype=np.int64)
+            self.postings[gram] = (ids, self.idf[gram] / norms[ids])
+        self.size = len(docs)
+
+    def similar(self, name):
+        """
+        Returns [(similarity, label)] of the nearest labelled names, best first.
+        """
+        grams = [gram for gram in trigrams(fold(name)) if gram in self.postings]
+        if not grams or not self.size:
+            return []
+        weights = np.array([self.idf[gram] for gram in grams])
+        weights /= np.linalg.norm(weights)
+        ids = np.concatenate([self.postings[gram][0] for gram in grams])
+        values = np.concatenate([self.postings[gram][1] * w for gram, w in zip(grams, weights)])
+        scores = np.bincount(ids, weights=values, minlength=self.size)
+        k = min(self.neighbours, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.labels[i]) for i in top if scores[i] >= self.min_similarity]
+
+    def vote(self, name):
+        totals = defaultdict(float)
+        for similarity, label in self.similar(name):
+            totals[label] += similarity
+        return max(totals, key=totals.get) if totals else None
+
+
+class Categorizer:
+    def __init__(self, keywords, labelled=()):
+        self.keywords = KeywordMatcher(keywords)
+        # Stored on categorized items; changes whenever the keyword file does
+        self.version = hashlib.blake2b(json.dumps([CATEGORIZER_VERSION, keywords], sort_keys=True).encode(),
+                                       digest_size=8).hexdigest()
+        labelled = [(name, label) for name, label in labelled if name and label]
+        self.similar = SimilarityIndex([name for name, _ in labelled], [label for _, label in labelled])
+
+    @classmethod
+    def load(cls, keywords_path=KEYWORDS_PATH):
+        """
+        Builds a categorizer from the keyword file and the categorized Rimi items.
+        """
+        labelled = [(item.get("search_name"), item.get("category")) for item in
+                    Item.collection().find({"store": "Rimi", "category": {"$ne": None}},
+                                           {"search_name": 1, "category": 1})]
+        logger.info("Loaded %d labelled Rimi items for categorization", len(labelled))
+        return cls(load_category_keywords(keywords_path), labelled)
+
+    def categorize(self, name, search_name=None):
+        """
+        Returns the category for an item name, or None when nothing is close enough.
+        """
+        return self.keywords.match(name) or self.similar.vote(search_name or name)
+
+    def apply(self, item):
+        """
+        Sets the category of a normalized item document and records this categorizer's version.
+        """
+        item["category"] = self.categorize(item["name"], item.get("search_name"))
+        item["categorized_with"] = self.version
+        return item
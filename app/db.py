@@ -0,0 +1,83 @@
+"""
+The process-wide MongoDB client.
+
+create_app() builds its PyMongo client with `client_options()` and registers it
+here, so the web app, the job threads and the scraper share one connection pool
+per process. Outside an app (the scraper CLI, scripts) `get_client()` creates
+the client itself from MONGO_URI. `bind()` points Item.collection() at a given
+database for the duration of a block, which is how the scraping pipeline gets
+its database injected.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from pymongo import MongoClient
+from app import metrics
+
+_client = None
+_client_lock = threading.Lock()
+_bound = ContextVar("bound_database", default=None)
+
+def mongo_uri():
+    """
+    MONGO_URI with the relative tlsCAFile rewritten to the certificate next to the repo root.
+    """
+    uri = os.environ.get("MONGO_URI")
+    if uri and 'tlsCAFile=' in uri:
+        cert_path = os.path.join(Path(__file__).parent.parent, 'isrgrootx1.pem')
+        uri = uri.replace('tlsCAFile=./isrgrootx1.pem', f'tlsCAFile={cert_path}')
+    return uri
+
+def client_options():
+    """
+    MongoClient keyword arguments from the environment:
+    MONGO_MAX_POOL_SIZE (default 20), MONGO_WRITE_CONCERN (`w`, e.g. 1 or majority)
+    and MONGO_COMPRESSORS (e.g. zstd,snappy,zlib; zstd and snappy need their extra packages).
+    Commands are timed for /metrics unless MONGO_COMMAND_METRICS=0.
+    """
+    options = {"maxPoolSize": int(os.environ.get("MONGO_MAX_POOL_SIZE", 20))}
+    if os.environ.get("MONGO_COMMAND_METRICS", "1") != "0":
+        options["event_listeners"] = [metrics.command_listener]
+    write_concern = os.environ.get("MONGO_WRITE_CONCERN")
+    if write_concern:
+        options["w"] = int(write_concern) if write_concern.isdigit() else write_concern
+    compressors = os.environ.get("MONGO_COMPRESSORS")
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+def set_client(client):
+    """Registers the client of the first app created in this process as the shared one."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = client
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            # Connect lazily, after any fork, like Flask-PyMongo does
+            _client = MongoClient(mongo_uri(), connect=False, **client_options())
+        return _client
+
+def get_database():
+    return get_client().get_default_database()
+
+def bound_database():
+    return _bound.get()
+
+@contextmanager
+def bind(database):
+    """
+    Makes Item.collection() and the collections derived from it use `database` in this
+    block, including the asyncio tasks started from it.
+    """
+    token = _bound.set(database)
+    try:
+        yield database
+    finally:
+        _bound.reset(token)
@@ -0,0 +1,77 @@
+"""
+Materialized deal lists (see models.Deals).
+
+Each list is one aggregation over `items` that ranks the items within a partition
+with $setWindowFields, keeps the first DEALS_TOP_N and $merges them into its
+collection, stamped with the build time. Rows the build did not touch (items that
+dropped out of a list) are deleted afterwards, so readers see the old rows until
+the new ones are in place instead of an empty list.
+
+The expiring deals window moves with the date, so that list is rebuilt after every
+scrape run, while the others only change when a run writes items.
+"""
+
+import os
+import logging
+from datetime import timedelta
+from app.models import Item, Deals, LIST_FIELDS, utcnow
+
+logger = logging.getLogger(__name__)
+
+# Item fields copied into the rows
+FIELDS = dict.fromkeys(LIST_FIELDS + ("quantity", "unit", "stock", "time.discount_deadline"), 1)
+
+def top_n():
+    return int(os.environ.get("DEALS_TOP_N", 20))
+
+def expiring_days():
+    return int(os.environ.get("DEALS_EXPIRING_DAYS", 3))
+
+def ranked(match, partition, sort, into, built):
+    """
+    The pipeline merging the first `top_n()` items matching `match` per `partition`,
+    in `sort` order, into the collection `into`.
+    """
+    return [
+        {"$match": match},
+        {"$setWindowFields": {"partitionBy": partition, "sortBy": dict(sort, _id=1),
+                              "output": {"rank": {"$documentNumber": {}}}}},
+        {"$match": {"rank": {"$lte": top_n()}}},
+        {"$project": dict(FIELDS, rank=1, built={"$literal": built})},
+        {"$merge": {"into": into, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+def pipelines(built):
+    """The pipeline of each deal collection."""
+    today = Deals.today()
+    on_sale = {"price.discount": {"$gt": 0}, "stock": {"$ne": False}}
+    return {
+        "top_discounts": ranked(on_sale, {"category": "$category", "store": "$store"},
+                                {"price.discount": -1}, "top_discounts", built),
+        # Prices per unit only compare within a unit
+        "cheapest_per_unit": ranked({"price.price_per_unit": {"$gt": 0}, "stock": {"$ne": False}},
+                                    {"category": "$category", "unit": "$unit"},
+                                    {"price.price_per_unit": 1}, "cheapest_per_unit", built),
+        "expiring_deals": ranked(dict(on_sale, **{"time.discount_deadline": {
+                                     "$gte": today, "$lt": today + timedelta(days=expiring_days() + 1)}}),
+                                 "$category", {"time.discount_deadline": 1}, "expiring_deals", built),
+    }
+
+def rebuild(names=None):
+    """
+    Rebuilds the deal collections `names` (by default all of them) and returns the
+    number of rows each one holds.
+    """
+    # Stored dates keep milliseconds; the stamp must compare as written once it is read back
+    now = utcnow()
+    built = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    summary = {}
+    for name, pipeline in pipelines(built).items():
+        if names is not None and name not in names:
+            continue
+        Item.collection().aggregate(pipeline, allowDiskUse=True)
+        # Only older builds: a concurrent run of another store may have just merged newer rows
+        Deals.collection(name).delete_many({"built": {"$lt": built}})
+        summary[name] = Deals.collection(name).count_documents({})
+    logger.info("Deals rebuilt: %s", summary)
+    return summary
@@ -0,0 +1,318 @@
+"""
+Asynchronous HTTP fetcher shared by the store scrapers.
+"""
+
+import os
+import zlib
+import gzip
+import json
+import time
+import asyncio
+import random
+import hashlib
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import httpx
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+class Page(str):
+    """
+    A fetched body. `unchanged` is True when it is byte-for-byte the body that was
+    parsed last time, so the pipeline can skip parsing it.
+    """
+    unchanged = False
+
+
+class HttpCache:
+    """
+    On-disk cache of fetched pages: validators (ETag, Last-Modified), a digest of the
+    body and the body itself, one JSON and one gzip file per URL.
+
+    Entries are staged while a run fetches and only written by `commit()`, once the
+    run's pages have gone through the pipeline, so a crashed run never leaves pages
+    marked as already parsed. A page counts as unchanged only if it was parsed within
+    `max_age` seconds, which bounds how long a page can go without a full re-parse.
+    """
+
+    def __init__(self, directory=None, max_age=None):
+        self.directory = directory or os.environ.get("SCRAPER_HTTP_CACHE_DIR", ".http_cache")
+        self.max_age = max_age if max_age is not None else float(os.environ.get("SCRAPER_HTTP_CACHE_MAX_AGE", 86400))
+        self._staged = {}
+
+    def _path(self, url, suffix):
+        return os.path.join(self.directory, hashlib.sha1(url.encode()).hexdigest() + suffix)
+
+    def entry(self, url):
+        try:
+            with open(self._path(url, ".json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def body(self, url):
+        try:
+            with gzip.open(self._path(url, ".html.gz"), "rt", encoding="utf-8") as f:
+                return f.read()
+        except (OSError, EOFError, zlib.error):
+            # Missing, or truncated by a crash before commit() wrote files atomically
+            return None
+
+    def drop(self, url):
+        """Forgets the entry of `url`, so that it is fetched unconditionally."""
+        self._staged.pop(url, None)
+        for suffix in (".json", ".html.gz"):
+            try:
+                os.remove(self._path(url, suffix))
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def digest(text):
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def validators(self, entry):
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def is_fresh(self, entry):
+        return bool(entry) and time.time() - entry.get("parsed", 0) < self.max_age
+
+    def stage(self, url, entry, text):
+        self._staged[url] = (entry, text)
+
+    def commit(self):
+        os.makedirs(self.directory, exist_ok=True)
+        staged, self._staged = self._staged, {}
+        for url, (entry, text) in staged.items():
+            # Body first and each file replaced whole, so an entry never points at a partial body
+            if text is not None:
+                path = self._path(url, ".html.gz")
+                with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+                    f.write(text)
+                os.replace(path + ".tmp", path)
+            path = self._path(url, ".json")
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(path + ".tmp", path)
+        return len(staged)
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def retry_after(response):
+    """
+    Seconds to wait according to a Retry-After header (delta-seconds or HTTP date), or None.
+    """
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Stops requests to a host after `threshold` consecutive failed attempts. After
+    `cooldown` seconds one probe request is let through: success closes the circuit,
+    another failure keeps it open for a further cooldown.
+    """
+
+    def __init__(self, host, threshold=5, cooldown=30.0, clock=time.monotonic):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        if self.clock() - self.opened_at >= self.cooldown:
+            # Half-open: this caller probes, everyone else waits for another cooldown
+            self.opened_at = self.clock()
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("Circuit for %s closed", self.host)
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold and self.opened_at is None:
+            logger.error("Circuit for %s opened after %d failed requests", self.host, self.failures)
+            self.opened_at = self.clock()
+
+
+class Fetcher:
+    """
+    Fetches pages over one pooled httpx.AsyncClient.
+    `concurrency` caps the number of requests in flight across all hosts and
+    `per_host_rate` caps the requests started per second against a single host.
+    Proxies are picked up from HTTP_PROXY/HTTPS_PROXY by httpx itself.
+
+    Timeouts, connection errors, 429 and 5xx responses are retried up to `retries`
+    times with full-jitter exponential backoff, waiting at least as long as any
+    Retry-After header asks (capped at `max_retry_after`). Failed attempts feed a
+    per-host CircuitBreaker; while it is open, requests to that host fail at once.
+
+    With a `cache` (by default unless SCRAPER_HTTP_CACHE=0) requests are conditional
+    and bodies identical to the last parsed one come back as unchanged Pages. The
+    cache is committed when the fetcher closes without an error.
+    """
+
+    def __init__(self, concurrency=None, per_host_rate=None, timeout=None, cache=None, transport=None,
+                 retries=None, backoff=None, max_backoff=30.0, max_retry_after=120.0,
+                 breaker_threshold=None, breaker_cooldown=None):
+        self.concurrency = concurrency or int(os.environ.get("SCRAPER_CONCURRENCY", 8))
+        self.per_host_rate = per_host_rate or float(os.environ.get("SCRAPER_HOST_RATE", 4))
+        self.timeout = timeout or float(os.environ.get("SCRAPER_TIMEOUT", 10))
+        self.retries = retries if retries is not None else int(os.environ.get("SCRAPER_RETRIES", 3))
+        self.backoff = backoff if backoff is not None else float(os.environ.get("SCRAPER_BACKOFF", 0.5))
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.breaker_threshold = breaker_threshold or int(os.environ.get("SCRAPER_BREAKER_THRESHOLD", 5))
+        self.breaker_cooldown = breaker_cooldown if breaker_cooldown is not None else \
+            float(os.environ.get("SCRAPER_BREAKER_COOLDOWN", 30))
+        self.breakers = {}
+        if cache is None and os.environ.get("SCRAPER_HTTP_CACHE", "1") != "0":
+            cache = HttpCache()
+        self.cache = cache or None
+        self.transport = transport
+        self.stats = Counter()
+        self.client = None
+        self._semaphore = None
+        self._host_locks = {}
+        self._host_next = {}
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.concurrency,
+                                max_keepalive_connections=self.concurrency),
+            follow_redirects=True,
+            transport=self.transport,
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.client.aclose()
+        self.client = None
+        if self.cache is not None and exc_type is None:
+            self.cache.commit()
+        if self.stats:
+            logger.info("Fetched pages: %s", dict(self.stats))
+
+    async def _wait_for_host(self, host):
+        # Space out request starts so that a host never sees more than per_host_rate per second
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            start = max(now, self._host_next.get(host, now))
+            self._host_next[host] = start + 1 / self.per_host_rate
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def breaker(self, host):
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(host, self.breaker_threshold, self.breaker_cooldown)
+        return self.breakers[host]
+
+    def backoff_delay(self, attempt, wait=None):
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if wait is not None:
+            delay = max(delay, min(wait, self.max_retry_after))
+        return delay
+
+    async def get(self, url, conditional=True):
+        """
+        Returns the body of `url` as a Page, or None if the request failed for good.
+        """
+        host = urlparse(url).netloc
+        breaker = self.breaker(host)
+        entry = self.cache.entry(url) if self.cache is not None and conditional else None
+        headers = self.cache.validators(entry) if self.cache is not None else {}
+        for attempt in range(self.retries + 1):
+            if not breaker.allow():
+                self.stats["circuit_open"] += 1
+                logger.error("Skipping %s: circuit for %s is open", url, host)
+                return None
+            wait = None
+            async with self._semaphore:
+                await self._wait_for_host(host)
+                started = time.perf_counter()
+                try:
+                    response = await self.client.get(url, headers=headers)
+                except httpx.TransportError as e:
+                    metrics.fetch_seconds.observe(time.perf_counter() - started, host=host, outcome="error")
+                    error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+                except httpx.HTTPError as e:
+                    logger.error("Request to %s failed: %s", url, e)
+                    return None
+                else:
+                    metrics.fetch_seconds.observe(time.perf_counter() - started, host=host,
+                                                  outcome=response.status_code)
+                    if response.status_code not in RETRY_STATUSES:
+                        breaker.record_success()
+                        if response.status_code != 304 and response.is_error:
+                            logger.error("Request to %s failed: HTTP %d", url, response.status_code)
+                            return None
+                        break
+                    error, wait = f"HTTP {response.status_code}", retry_after(response)
+            breaker.record_failure()
+            if attempt == self.retries:
+                self.stats["failed"] += 1
+                logger.error("Request to %s failed after %d attempts: %s", url, attempt + 1, error)
+                return None
+            delay = self.backoff_delay(attempt, wait)
+            self.stats["retries"] += 1
+            logger.warning("Request to %s failed (%s), retrying in %.1fs", url, error, delay)
+            await asyncio.sleep(delay)
+        if self.cache is None:
+            return Page(response.text)
+        if response.status_code == 304:
+            text = self.cache.body(url)
+            if text is None:
+                # The validators vouch for a body we no longer have: forget them and fetch it whole
+                logger.warning("Got 304 for %s but its cached body is unusable", url)
+                self.cache.drop(url)
+                return await self.get(url, conditional=False) if conditional else None
+            self.stats["not_modified"] += 1
+        else:
+            text = response.text
+        return self._cached_page(url, entry, response, text)
+
+    def _cached_page(self, url, entry, response, text):
+        digest = self.cache.digest(text)
+        page = Page(text)
+        page.unchanged = bool(entry) and entry.get("digest") == digest and self.cache.is_fresh(entry)
+        self.stats["unchanged" if page.unchanged else "changed"] += 1
+        self.cache.stage(url, {
+            "url": url,
+            "etag": response.headers.get("etag") or (entry or {}).get("etag"),
+            "last_modified": response.headers.get("last-modified") or (entry or {}).get("last_modified"),
+            "digest": digest,
+            "fetched": datetime.now(timezone.utc).isoformat(),
+            # Unchanged pages keep the time they were last actually parsed
+            "parsed": entry["parsed"] if page.unchanged else time.time(),
+        }, text if response.status_code != 304 else None)
+        return page
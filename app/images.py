@@ -0,0 +1,139 @@
+"""
+Mirrors item images to imgbb.
+
+Only items without a live mirror are read, through the `image_mirror.expires` index:
+those never mirrored (or rewritten by the scraper since) and those whose mirror
+expires within IMAGE_REMIRROR_MARGIN seconds. Items sharing a source URL share one
+upload, sources already mirrored for other items are reused from `image_mirrors`,
+and the remaining uploads run IMAGE_UPLOAD_CONCURRENCY at a time over one HTTP
+client. Results are written back with bulk writes.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import timedelta
+import httpx
+from pymongo import UpdateOne
+from app import jobs, metrics
+from app.models import Item, ImageMirror, utcnow
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_URL = "https://api.imgbb.com/1/upload"
+# Seconds imgbb keeps an upload
+EXPIRATION = 604800
+
+def pending_query(stores, valid_until):
+    """
+    Items with an image that is not mirrored, or whose mirror expires before `valid_until`.
+    """
+    return {
+        "store": {"$in": list(stores)},
+        "image_url": {"$gt": ""},
+        "$or": [{"image_mirror.expires": None}, {"image_mirror.expires": {"$lt": valid_until}}],
+    }
+
+def source_of(item):
+    # A mirrored item shows the mirror; the store's URL is kept in image_mirror.source
+    return (item.get("image_mirror") or {}).get("source") or item["image_url"]
+
+
+class ImageMirrorer:
+    def __init__(self, api_key=None, concurrency=None, margin=None, batch_size=500, transport=None):
+        self.api_key = api_key or os.environ.get("IMGBB_API_KEY")
+        if not self.api_key:
+            raise ValueError("IMGBB_API_KEY not found in environment variables")
+        self.concurrency = concurrency or int(os.environ.get("IMAGE_UPLOAD_CONCURRENCY", 4))
+        margin = margin if margin is not None else int(os.environ.get("IMAGE_REMIRROR_MARGIN", 86400))
+        self.margin = timedelta(seconds=margin)
+        self.batch_size = batch_size
+        self.transport = transport
+        self.summary = {"items": 0, "sources": 0, "reused": 0, "uploaded": 0, "failed": 0}
+        self._mirrors = {}
+        self._operations = []
+
+    async def upload(self, client, semaphore, source, name, store=None):
+        """
+        Uploads `source` by URL and returns (source, mirror URL or None).
+        """
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.post(UPLOAD_URL, params={"key": self.api_key, "expiration": EXPIRATION},
+                                             data={"name": name, "image": source})
+                response.raise_for_status()
+                return source, response.json()["data"]["url"]
+            except (httpx.HTTPError, KeyError, ValueError) as e:
+                logger.error("Failed to upload image '%s' (%s): %s", name, source, e)
+                return source, None
+            finally:
+                metrics.scrape_stage_seconds.observe(time.perf_counter() - started, store=store,
+                                                     stage="image_upload")
+
+    def add(self, source, mirror, items):
+        """
+        Queues `mirror` for every item showing `source`, flushing every `batch_size` item writes.
+        """
+        self._mirrors[source] = mirror
+        for item in items:
+            self._operations.append(UpdateOne(
+                {"_id": item["_id"]},
+                {"$set": {"image_url": mirror["url"], "image_mirror": {"source": source, "expires": mirror["expires"]}}}
+            ))
+        if len(self._operations) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        mirrors, self._mirrors = self._mirrors, {}
+        operations, self._operations = self._operations, []
+        ImageMirror.record(mirrors)
+        Item.bulk_write(operations)
+        jobs.progress(**self.summary)
+
+    async def mirror(self, by_source):
+        """
+        Mirrors every source of `by_source` ({source: [items]}) and updates its items.
+        """
+        reused = ImageMirror.fresh(by_source, utcnow() + self.margin)
+        for source, mirror in reused.items():
+            self.add(source, {"url": mirror["url"], "expires": mirror["expires"]}, by_source[source])
+        self.summary["reused"] = len(reused)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with httpx.AsyncClient(timeout=30, transport=self.transport) as client:
+            uploads = []
+            for source, items in by_source.items():
+                if source not in reused:
+                    store = items[0].get("store", "")
+                    name = f"{items[0].get('product_id') or 'unknown'}@{store}"
+                    uploads.append(self.upload(client, semaphore, source, name, store))
+            for upload in asyncio.as_completed(uploads):
+                source, url = await upload
+                if url is None:
+                    self.summary["failed"] += 1
+                    continue
+                self.summary["uploaded"] += 1
+                self.add(source, {"url": url, "expires": utcnow() + timedelta(seconds=EXPIRATION)},
+                         by_source[source])
+        self.flush()
+
+    def run(self, stores=("Maxima", "Rimi")):
+        """
+        Mirrors the images of `stores` that need it and returns the run summary.
+        """
+        query = pending_query(stores, utcnow() + self.margin)
+        by_source = defaultdict(list)
+        for item in Item.collection().find(query, {"image_url": 1, "image_mirror": 1, "product_id": 1, "store": 1}):
+            by_source[source_of(item)].append(item)
+        self.summary["items"] = sum(len(items) for items in by_source.values())
+        self.summary["sources"] = len(by_source)
+        logger.info("Mirroring images of %d items (%d distinct images)", self.summary["items"], len(by_source))
+        if by_source:
+            asyncio.run(self.mirror(by_source))
+        if self.summary["reused"] or self.summary["uploaded"]:
+            Item.bump_data_version()
+        logger.info("Finished mirroring images: %s", self.summary)
+        return self.summary
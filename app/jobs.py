@@ -0,0 +1,156 @@
+"""
+Background job runner for scrapes and other long admin tasks.
+
+Jobs run on a bounded thread pool inside the app process. Each run is recorded
+in `job_runs` (status, progress, timings) and holds the `job_locks` lease of its
+type, so a second click, or a click on another gunicorn worker, is refused
+while a run of that type is queued or running. Cancellation is cooperative: a
+job stops the next time it reports progress.
+"""
+
+import os
+import time
+import socket
+import logging
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app.models import JobRun
+
+logger = logging.getLogger(__name__)
+
+class JobCancelled(Exception):
+    """Raised inside a job when its run was cancelled."""
+
+
+class JobContext:
+    """
+    Handle of the run executing on the current thread; see `progress()`.
+    """
+
+    def __init__(self, run, check_interval=2.0):
+        self.run_id = run["_id"]
+        self.type = run["type"]
+        self.check_interval = check_interval
+        self._last_check = float("-inf")
+
+    def progress(self, **counters):
+        # Throttled: at most one round trip per check_interval
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        run = JobRun.update(self.run_id, **{f"progress.{key}": value for key, value in counters.items()})
+        JobRun.renew_lock(self.type, self.run_id)
+        if run and run.get("cancel_requested"):
+            raise JobCancelled(f"{self.type} run {self.run_id} cancelled")
+
+
+_local = threading.local()
+
+def current():
+    """Returns the JobContext of the run on this thread, or None outside a job."""
+    return getattr(_local, "job", None)
+
+def progress(**counters):
+    """
+    Records progress counters of the current run, if any, and raises JobCancelled
+    when the run has been cancelled. A no-op outside a job, so tasks can call it
+    unconditionally.
+    """
+    job = current()
+    if job is not None:
+        job.progress(**counters)
+
+
+def execute(run, task, args=(), kwargs=None, progress_interval=2.0):
+    """
+    Runs `task` on the calling thread as the already locked `run`, recording its
+    status, result and duration, and releases the lock. Returns the final run record.
+
+    A run may sit in the queue for longer than the lease, so the lease is renewed
+    first; the run is rejected instead when another run took the expired lease meanwhile.
+    """
+    job_type, run_id = run["type"], run["_id"]
+    if not JobRun.acquire_lock(job_type, run_id, run["owner"]):
+        logger.info("Not running %s run %s: its lease expired while queued", job_type, run_id)
+        return JobRun.update(run_id, status="rejected", finished=datetime.now(timezone.utc))
+    started = datetime.now(timezone.utc)
+    status, error = "succeeded", None
+    try:
+        current_run = JobRun.update(run_id, status="running", started=started)
+        if current_run and current_run.get("cancel_requested"):
+            raise JobCancelled(f"{job_type} run {run_id} cancelled before it started")
+        _local.job = JobContext(run, progress_interval)
+        result = task(*args, **(kwargs or {}))
+        if isinstance(result, (dict, int)):
+            JobRun.update(run_id, result=result)
+    except JobCancelled as e:
+        status = "cancelled"
+        logger.info("%s", e)
+    except Exception as e:
+        status, error = "failed", str(e)
+        logger.exception("%s run %s failed", job_type, run_id)
+    finally:
+        _local.job = None
+        finished = datetime.now(timezone.utc)
+        run = JobRun.update(run_id, status=status, error=error, finished=finished,
+                            duration=(finished - started).total_seconds())
+        JobRun.release_lock(job_type, run_id)
+    return run
+
+def owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def start(job_type, **fields):
+    """
+    Records a new run of `job_type` and takes its lock. Returns the run, or None
+    (recording the run as rejected) when another run of the type is active.
+    """
+    run = JobRun.create(job_type, owner(), **fields)
+    if not JobRun.acquire_lock(job_type, run["_id"], run["owner"]):
+        JobRun.update(run["_id"], status="rejected", finished=datetime.now(timezone.utc))
+        logger.info("Not starting %s: another run is active", job_type)
+        return None
+    return run
+
+
+class JobRunner:
+    def __init__(self, max_workers=None, progress_interval=2.0):
+        self.max_workers = max_workers or int(os.environ.get("JOB_WORKERS", 2))
+        self.progress_interval = progress_interval
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+
+    def submit(self, job_type, task, *args, **kwargs):
+        """
+        Queues `task` as a run of `job_type`. Returns the run record, or None when a
+        run of the same type is already active.
+        """
+        run = start(job_type)
+        if run is None:
+            return None
+        app = current_app._get_current_object()
+        self.executor.submit(self._run, app, run, task, args, kwargs)
+        return run
+
+    def _run(self, app, run, task, args, kwargs):
+        with app.app_context():
+            execute(run, task, args, kwargs, self.progress_interval)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+def get_runner():
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
+
+def submit(job_type, task, *args, **kwargs):
+    return get_runner().submit(job_type, task, *args, **kwargs)
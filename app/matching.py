@@ -0,0 +1,182 @@
+"""
+Cross-store product matching.
+
+Items are blocked by unit and nominal size: their quantity (already normalized to
+grams/millilitres by the store adapters) snapped to the roundest size within 1%,
+because Rimi derives quantities from rounded unit prices (a 400 g pack at
+€2.49 and €6.23/kg comes out as 399.68 g). Only products of one block are compared.
+Within a block, items of different stores sharing a name token are scored with
+RapidFuzz's token set ratio on their `search_name`; items whose brands are both
+known and clearly differ never match. Every item is linked to its best match in
+each other store and the links are clustered into `product_groups`.
+
+Groups are rebuilt incrementally: after a scrape run only the blocks holding
+items updated since the last sync are regrouped. Deleting items forces a full
+rebuild, as their blocks are no longer known.
+"""
+
+import os
+import math
+import hashlib
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from rapidfuzz import fuzz
+from app.models import Item, ProductGroup, utcnow
+from app.search import fold
+
+logger = logging.getLogger(__name__)
+
+# Fields of the items that matching reads
+FIELDS = {"name": 1, "search_name": 1, "store": 1, "product_id": 1, "brand": 1, "category": 1,
+          "unit": 1, "quantity": 1, "price": 1, "image_url": 1}
+# Brands scoring below this are different brands
+MIN_BRAND_SCORE = 70
+# Shorter tokens ("ar", "un", "%") say nothing about the product
+MIN_TOKEN_LENGTH = 3
+# Quantities this close to a round size are that size
+SIZE_TOLERANCE = 0.01
+# Covers clock skew between the app and MongoDB, whose $currentDate stamps time.updated
+SYNC_SLACK = timedelta(minutes=1)
+
+def min_score():
+    return float(os.environ.get("MATCH_MIN_SCORE", 85))
+
+def nominal_size(quantity):
+    """
+    The roundest size within SIZE_TOLERANCE of `quantity`: 399.68 and 400.3 are 400,
+    995 is 1000, while 125 stays 125.
+    """
+    step = 10 ** math.floor(math.log10(quantity))
+    while step >= 0.01:
+        for size_step in (step, step / 2):
+            size = round(quantity / size_step) * size_step
+            if size and abs(size - quantity) <= quantity * SIZE_TOLERANCE:
+                return round(size, 2)
+        step /= 10
+    return round(quantity, 2)
+
+def block_key(item):
+    """The (unit, nominal size) block of an item, or None when its size is unknown."""
+    unit, quantity = item.get("unit"), item.get("quantity")
+    if not unit or not quantity or quantity <= 0:
+        return None
+    return f"{unit}:{float(nominal_size(quantity))}"
+
+def brand_of(item):
+    """The folded brand, or None when the store filled in its own name."""
+    brand = fold(item.get("brand"))
+    return brand if brand and brand != fold(item.get("store")) else None
+
+def score(a, b):
+    """
+    Similarity of two items of one block from 0 to 100; 0 when their brands differ.
+    """
+    brand_a, brand_b = brand_of(a), brand_of(b)
+    if brand_a and brand_b and fuzz.ratio(brand_a, brand_b) < MIN_BRAND_SCORE:
+        return 0
+    return fuzz.token_set_ratio(fold(a.get("search_name")), fold(b.get("search_name")))
+
+def cluster(items, threshold=None):
+    """
+    Splits the items of one block into groups of equivalent products of at least two stores.
+    """
+    threshold = min_score() if threshold is None else threshold
+    by_token = defaultdict(set)
+    for index, item in enumerate(items):
+        for token in fold(item.get("search_name")).split():
+            if len(token) >= MIN_TOKEN_LENGTH:
+                by_token[token].add(index)
+
+    parent = list(range(len(items)))
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for index, item in enumerate(items):
+        candidates = set()
+        for token in fold(item.get("search_name")).split():
+            candidates |= by_token.get(token, set())
+        best = {}
+        for other in candidates:
+            store = items[other]["store"]
+            if store == item["store"]:
+                continue
+            similarity = score(item, items[other])
+            if similarity >= threshold and similarity > best.get(store, (0, None))[0]:
+                best[store] = (similarity, other)
+        for _, other in best.values():
+            parent[find(other)] = find(index)
+
+    clusters = defaultdict(list)
+    for index, item in enumerate(items):
+        clusters[find(index)].append(item)
+    return [members for members in clusters.values() if len({item["store"] for item in members}) > 1]
+
+def group_doc(block, members):
+    """
+    The product_groups document of one cluster, cheapest per unit first: sizes within a
+    block differ by up to SIZE_TOLERANCE.
+    """
+    members = sorted(members, key=lambda item: (item["price"]["price_per_unit"] or float("inf"),
+                                                item["price"]["value"], item["store"], item["product_id"]))
+    keys = sorted(f"{item['store']}/{item['product_id']}" for item in members)
+    cheapest = members[0]
+    offer = lambda item: {"store": item["store"], "product_id": item["product_id"], "name": item["name"],
+                          "price": item["price"]["value"], "price_per_unit": item["price"]["price_per_unit"]}
+    return {
+        "_id": hashlib.blake2b("\n".join(keys).encode(), digest_size=12).hexdigest(),
+        "block": block,
+        "unit": cheapest["unit"],
+        "quantity": nominal_size(cheapest["quantity"]),
+        "name": cheapest["name"],
+        "category": next((item["category"] for item in members if item.get("category")), None),
+        "stores": sorted({item["store"] for item in members}),
+        "size": len(members),
+        "members": [dict(offer(item), image_url=item.get("image_url")) for item in members],
+        "member_keys": keys,
+        "cheapest": offer(cheapest),
+        "savings": round(max(item["price"]["value"] for item in members) - cheapest["price"]["value"], 2),
+        "updated": utcnow(),
+    }
+
+def rebuild(full=False):
+    """
+    Regroups the blocks changed since the last sync (every block when `full`, on the
+    first run or after items were deleted) and returns a summary.
+    """
+    started = utcnow()
+    state = ProductGroup.state()
+    deletions = Item.data_version_doc().get("deletions", 0)
+    full = full or not state.get("synced") or state.get("deletions") != deletions
+
+    if full:
+        query, blocks = {"unit": {"$exists": True}, "quantity": {"$gt": 0}}, None
+    else:
+        changed = list(Item.collection().find({"time.updated": {"$gte": state["synced"] - SYNC_SLACK}},
+                                              {"store": 1, "product_id": 1, "unit": 1, "quantity": 1}))
+        blocks = {block_key(item) for item in changed} - {None}
+        # An item whose size changed leaves its old block, which is regrouped too
+        blocks |= set(ProductGroup.blocks_of([f"{item['store']}/{item['product_id']}" for item in changed]))
+        # Every quantity snapping to a block's size is within SIZE_TOLERANCE of it
+        sizes = [(unit, float(size)) for unit, size in (block.split(":", 1) for block in sorted(blocks))]
+        query = {"$or": [{"unit": unit, "quantity": {"$gte": size / (1 + SIZE_TOLERANCE),
+                                                     "$lte": size / (1 - SIZE_TOLERANCE)}}
+                         for unit, size in sizes]}
+
+    items = defaultdict(list)
+    if blocks is None or blocks:
+        for item in Item.collection().find(query, FIELDS):
+            key = block_key(item)
+            if key and item.get("price") and (blocks is None or key in blocks):
+                items[key].append(item)
+
+    groups = [group_doc(block, members) for block, block_items in items.items() for members in cluster(block_items)]
+    removed = ProductGroup.replace_blocks(blocks, groups)
+    ProductGroup.save_state(started, deletions)
+    summary = {"full": full, "blocks": len(items if blocks is None else blocks), "groups": len(groups),
+               "removed": removed}
+    logger.info("Product groups rebuilt: %s", summary)
+    return summary
@@ -0,0 +1,226 @@
+"""
+In-process metrics in the Prometheus text format, served at /metrics.
+
+Counters and histograms are labelled per store, category and stage for the
+scraping pipeline, per command and collection for MongoDB (through pymongo's
+command monitoring, see `CommandListener`) and per endpoint for HTTP requests.
+Every process keeps its own values: the web workers (including the jobs they
+run) answer /metrics themselves, and the scheduler serves its own when
+METRICS_PORT is set.
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from flask import g, request
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds; spans a single Mongo round trip up to a whole scrape stage
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REGISTRY = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name) or "" for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        """Yields the exposition lines of every label set."""
+        raise NotImplementedError
+
+    def render(self):
+        with self._lock:
+            lines = list(self.samples())
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"] + lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        for key, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, key)} {value}"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket, then the sum and the total count
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-2] += value
+            counts[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        counts = self._values.get(self._key(labels))
+        return counts[-1] if counts else 0
+
+    def samples(self):
+        for key, counts in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, [('le', bound)])} {cumulative}"
+            yield f"{self.name}_bucket{_labels(self.labelnames, key, [('le', '+Inf')])} {counts[-1]}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {counts[-2]}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {counts[-1]}"
+
+
+scrape_stage_seconds = Histogram(
+    "grocy_scrape_stage_seconds", "Time spent per scraping stage",
+    ("store", "category", "stage"))
+scrape_records = Counter(
+    "grocy_scrape_records_total", "Scraped records by outcome (unchanged, written)",
+    ("store", "category", "outcome"))
+scrape_pages = Counter(
+    "grocy_scrape_pages_total", "Fetched pages by outcome (parsed, unchanged)",
+    ("store", "category", "outcome"))
+fetch_seconds = Histogram(
+    "grocy_fetch_seconds", "Duration of HTTP request attempts made by the scraper",
+    ("host", "outcome"))
+mongo_command_seconds = Histogram(
+    "grocy_mongo_command_seconds", "Duration of MongoDB commands",
+    ("command", "collection"))
+mongo_command_failures = Counter(
+    "grocy_mongo_command_failures_total", "Failed MongoDB commands",
+    ("command", "collection"))
+http_request_seconds = Histogram(
+    "grocy_http_request_seconds", "Duration of HTTP requests served by the app",
+    ("endpoint", "method", "status"))
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+def clear():
+    for metric in REGISTRY:
+        metric.clear()
+
+def stage(stage, store, category=None):
+    """Times a block as `stage` of the scraping pipeline."""
+    return scrape_stage_seconds.time(store=store, category=category, stage=stage)
+
+
+class CommandListener(monitoring.CommandListener):
+    """
+    Records the duration of every MongoDB command by command name and collection.
+    """
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = \
+            collection if isinstance(collection, str) else ""
+
+    def _finished(self, event):
+        return self._collections.pop((event.connection_id, event.request_id), "")
+
+    def succeeded(self, event):
+        mongo_command_seconds.observe(event.duration_micros / 1e6, command=event.command_name,
+                                      collection=self._finished(event))
+
+    def failed(self, event):
+        collection = self._finished(event)
+        mongo_command_seconds.observe(event.duration_micros / 1e6, command=event.command_name, collection=collection)
+        mongo_command_failures.inc(command=event.command_name, collection=collection)
+
+
+command_listener = CommandListener()
+
+def init_app(app):
+    """
+    Times every request of `app` by endpoint.
+    """
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+            http_request_seconds.observe(time.perf_counter() - started, endpoint=endpoint,
+                                         method=request.method, status=response.status_code)
+        return response
+
+def serve(port):
+    """
+    Serves /metrics on `port` from a daemon thread, for processes without the web app.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    logger.info("Serving metrics on port %d", port)
+    return server
@@ -4,17 +4,59 @@ Models module for the Flask application.
 
 import os
 import json
+import time
 import unicodedata
-from flask import current_app
+from flask import current_app, has_app_context
 from bson.objectid import ObjectId
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from app import db
+from app.cache import search_cache, metadata_cache, data_version as cache_version, clear_all as clear_caches
 
 schema_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'dbschema.json')
 with open(schema_path, 'r') as f:
     DBSCHEMA = json.load(f)
 
+# (keys, options) for every index on the items collection
+ITEM_INDEXES = [
+    ([("store", ASCENDING), ("product_id", ASCENDING)], {
+        "name": "store_product_id_unique",
+        "unique": True,
+        # Manually added items have an empty product_id and are not deduplicated
+        "partialFilterExpression": {"product_id": {"$gt": ""}},
+    }),
+    # Covers the Item.scrape_state projection the scraper loads at the start of a run
+    ([("store", ASCENDING), ("product_id", ASCENDING), ("content_hash", ASCENDING),
+      ("price.value", ASCENDING), ("price.old_value", ASCENDING)],
+     {"name": "store_product_id_scrape_state"}),
+    ([("category", ASCENDING)], {"name": "category"}),
+    ([("store", ASCENDING)], {"name": "store"}),
+    ([("price.discount", DESCENDING)], {"name": "price_discount"}),
+    ([("time.discount_deadline", ASCENDING)], {"name": "time_discount_deadline"}),
+    # Finds the items whose image is not mirrored yet or whose mirror is about to expire
+    ([("image_mirror.expires", ASCENDING)], {"name": "image_mirror_expires"}),
+    # Product matching (app.matching) finds the items changed since its last sync and loads their blocks
+    ([("time.updated", ASCENDING)], {"name": "time_updated"}),
+    ([("unit", ASCENDING), ("quantity", ASCENDING)], {"name": "unit_quantity"}),
+]
+
+LIST_PAGE_SIZE = 50
+LIST_MAX_PAGE_SIZE = 500
+LIST_FIELDS = ("name", "product_id", "store", "category", "brand", "image_url", "price")
+
+def utcnow():
+    # MongoDB hands dates back as naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class Item:
     @staticmethod
     def collection():
+        database = db.bound_database()
+        if database is not None:
+            return database.items
+        if not has_app_context():
+            return db.get_database().items
         mongo = current_app.extensions.get("pymongo")
         if not mongo:
             mongo = getattr(current_app, "mongo", None)
@@ -26,6 +68,20 @@ class Item:
     def get_all(cls):
         return list(cls.collection().find())
 
+    @classmethod
+    def list(cls, page=1, page_size=LIST_PAGE_SIZE, fields=None, query=None):
+        """
+        Returns one page of items in insertion order, projected to `fields`.
+        """
+        page = max(int(page), 1)
+        page_size = min(max(int(page_size), 1), LIST_MAX_PAGE_SIZE)
+        projection = dict.fromkeys(fields or LIST_FIELDS, 1)
+        cursor = (cls.collection().find(query or {}, projection)
+                  .sort("_id", ASCENDING)
+                  .skip((page - 1) * page_size)
+                  .limit(page_size))
+        return list(cursor)
+
     @classmethod
     def get_by_id(cls, item_id):
         return cls.collection().find_one({"_id": ObjectId(item_id)})
@@ -49,6 +105,72 @@ class Item:
     def delete(cls, item_id):
         return cls.collection().delete_one({"_id": ObjectId(item_id)})
 
+    @classmethod
+    def scrape_state(cls, store):
+        """
+        Returns {product_id: (content_hash, (price, old_price))} for a store from an
+        index-only projection.
+        """
+        cursor = cls.collection().find(
+            {"store": store},
+            {"_id": 0, "product_id": 1, "content_hash": 1, "price.value": 1, "price.old_value": 1}
+        )
+        return {
+            doc.get("product_id"): (
+                doc.get("content_hash"),
+                (doc.get("price", {}).get("value"), doc.get("price", {}).get("old_value"))
+            )
+            for doc in cursor
+        }
+
+    @classmethod
+    def price_history(cls, product_id, store, since=None):
+        return PriceHistory.for_item(product_id, store, since)
+
+    @classmethod
+    def bulk_write(cls, operations, ordered=False):
+        """
+        Sends a list of pymongo write operations in one round trip.
+        """
+        if not operations:
+            return None
+        return cls.collection().bulk_write(operations, ordered=ordered)
+
+    @classmethod
+    def data_version_doc(cls):
+        return cls.collection().database.meta.find_one({"_id": "items"}) or {}
+
+    @classmethod
+    def data_version(cls):
+        """
+        Returns the items data version, bumped whenever a scrape run commits changes.
+        """
+        return cls.data_version_doc().get("version", 0)
+
+    @classmethod
+    def bump_data_version(cls, deleted=False):
+        """
+        Marks the items as changed so that the caches of every worker are dropped.
+        `deleted` also tells in-process search indexes to reload rather than catch up.
+        """
+        update = {"version": 1, "deletions": 1} if deleted else {"version": 1}
+        cls.collection().database.meta.update_one(
+            {"_id": "items"},
+            {"$inc": update, "$currentDate": {"updated": True}},
+            upsert=True
+        )
+        clear_caches()
+
+    @classmethod
+    def stores(cls):
+        cache_version.check(cls.data_version)
+        return metadata_cache.get_or_set("stores", lambda: sorted(cls.collection().distinct("store")))
+
+    @classmethod
+    def count(cls):
+        cache_version.check(cls.data_version)
+        return metadata_cache.get_or_set("count", cls.collection().estimated_document_count)
+
     @classmethod
     def remove_diacritics(cls, text):
         # Normalize to NFD and filter out non-spacing marks
@@ -56,49 +178,43 @@ class Item:
     
     @classmethod
     def search_by_name(cls, search_term, filters=None):
-        # Base search pipeline
-        pipeline = [
-            {
-                "$search": {
-                    "index": "search_name",
-                    "text": {
-                        "query": search_term,
-                        "path": "search_name",  
-                        "fuzzy": {}
-                    }
-                }
-            }
-        ]
+        # Results are cached per normalized query and filters until the data changes
+        cache_version.check(cls.data_version)
+        cache_key = (" ".join(search_term.lower().split()), tuple(sorted((filters or {}).items())))
+        results = search_cache.get(cache_key)
+        if results is not None:
+            return results
 
-        # Add filters if provided
-        match_conditions = {}
-        if filters:
-            if 'stock' in filters:
-                match_conditions['stock'] = filters['stock']
-            if 'category' in filters:
-                match_conditions['category'] = filters['category']
-            if 'min_quantity' in filters:
-                match_conditions['quantity'] = {'$gte': filters['min_quantity']}
-            if 'max_quantity' in filters:
-                match_conditions.setdefault('quantity', {})['$lte'] = filters['max_quantity']
-            if 'store' in filters:
-                match_conditions['store'] = filters['store']
-
-        # Add match stage if there are any conditions
-        if match_conditions:
-            pipeline.append({"$match": match_conditions})
-
-        pipeline.append({"$limit": 10})
-        
-        results = list(cls.collection().aggregate(pipeline))
-        current_app.logger.info(
-            "Search results for '%s' with filters %s: %s", 
-            search_term, 
-            filters, 
-            results
-        )
+        from app.search import get_backend
+        from app.profiling import log_if_slow
+        backend = get_backend()
+        started = time.perf_counter()
+        results = backend.search(search_term, filters)
+        log_if_slow(backend, search_term, filters, time.perf_counter() - started, len(results))
+        search_cache.set(cache_key, results)
         return results
 
+    @classmethod
+    def search_page(cls, search_term, filters=None, sort="relevance", descending=None, limit=20, after=None):
+        """
+        Returns (items, next cursor) of one sorted page of search results; see the backends' search_page.
+        """
+        cache_version.check(cls.data_version)
+        cache_key = ("page", " ".join(search_term.lower().split()), tuple(sorted((filters or {}).items())),
+                     sort, descending, limit, json.dumps(after))
+        page = search_cache.get(cache_key)
+        if page is not None:
+            return page
+
+        from app.search import get_backend
+        from app.profiling import log_if_slow
+        backend = get_backend()
+        started = time.perf_counter()
+        page = backend.search_page(search_term, filters, sort, descending, limit, after)
+        log_if_slow(backend, search_term, filters, time.perf_counter() - started, len(page[0]))
+        search_cache.set(cache_key, page)
+        return page
+
     @classmethod
     def init_collection(cls):
         mongo = getattr(current_app, "mongo", None)
@@ -119,5 +235,462 @@ class Item:
         else:
             db.create_collection("items", validator={"$jsonSchema": DBSCHEMA})
             current_app.logger.info("Created collection 'items' with schema validation.")
+        cls.ensure_indexes()
+
+    @classmethod
+    def ensure_indexes(cls):
+        """
+        Creates the item indexes. If the unique (store, product_id) index cannot be built
+        because of existing duplicates, they are removed once and the build is retried.
+        """
+        collection = cls.collection()
+        for keys, options in ITEM_INDEXES:
+            try:
+                collection.create_index(keys, **options)
+            except OperationFailure as e:
+                if not options.get("unique") or e.code != 11000:
+                    raise
+                current_app.logger.warning("Duplicate items found while building %s, deduplicating", options["name"])
+                cls.remove_duplicates()
+                collection.create_index(keys, **options)
+
+    @classmethod
+    def remove_duplicates(cls):
+        """
+        Deletes all but the most recently updated document of every (store, product_id) pair.
+        Only ids are grouped and the losers are removed with a single delete_many.
+        """
+        pipeline = [
+            {"$match": {"product_id": {"$gt": ""}}},
+            {"$sort": {"time.updated": -1}},
+            {
+                "$group": {
+                    "_id": {"store": "$store", "product_id": "$product_id"},
+                    "ids": {"$push": "$_id"},
+                    "count": {"$sum": 1}
+                }
+            },
+            {"$match": {"count": {"$gt": 1}}},
+            {"$project": {"_id": 0, "ids": 1}}
+        ]
+        duplicate_ids = []
+        for group in cls.collection().aggregate(pipeline, allowDiskUse=True):
+            duplicate_ids.extend(group["ids"][1:])
+        if not duplicate_ids:
+            current_app.logger.info("No duplicate items found")
+            return 0
+        result = cls.collection().delete_many({"_id": {"$in": duplicate_ids}})
+        cls.bump_data_version(deleted=True)
+        current_app.logger.info("Removed %d duplicate items", result.deleted_count)
+        return result.deleted_count
 
 
+class PriceHistory:
+    """
+    Price points of every item, stored in a MongoDB time-series collection.
+    A point is only written when an item is first seen or its price changes, and
+    points older than PRICE_HISTORY_RETENTION_DAYS expire, so the collection stays
+    bounded at roughly one small document per item per price change.
+    """
+
+    @staticmethod
+    def collection():
+        return Item.collection().database.price_history
+
+    @classmethod
+    def init_collection(cls):
+        db = Item.collection().database
+        if "price_history" in db.list_collection_names():
+            return
+        retention_days = int(os.environ.get("PRICE_HISTORY_RETENTION_DAYS", 365))
+        db.create_collection(
+            "price_history",
+            timeseries={"timeField": "time", "metaField": "meta", "granularity": "hours"},
+            expireAfterSeconds=retention_days * 24 * 3600
+        )
+        cls.collection().create_index(
+            [("meta.store", ASCENDING), ("meta.product_id", ASCENDING), ("time", ASCENDING)],
+            name="meta_time"
+        )
+        current_app.logger.info("Created time-series collection 'price_history'.")
+
+    @staticmethod
+    def point(item, when):
+        """
+        Builds the price point of an item document.
+        """
+        price = item["price"]
+        return {
+            "time": when,
+            "meta": {"store": item["store"], "product_id": item["product_id"]},
+            "price": price["value"],
+            "old_price": price["old_value"],
+            "discount": price["discount"],
+            "price_per_unit": price["price_per_unit"],
+        }
+
+    @classmethod
+    def record(cls, points):
+        if points:
+            cls.collection().insert_many(points, ordered=False)
+
+    @classmethod
+    def backfill(cls):
+        """
+        Records a baseline point for every scraped item without price history, once per
+        database: points are only written when a price changes, so items stored before
+        the history existed would otherwise have none until their price moves.
+        """
+        meta = Item.collection().database.meta
+        if (meta.find_one({"_id": "price_history"}) or {}).get("backfilled"):
+            return 0
+        tracked = {(point["meta"]["store"], point["meta"]["product_id"])
+                   for point in cls.collection().find({}, {"meta": 1})}
+        now = datetime.now(timezone.utc)
+        items = Item.collection().find({"product_id": {"$gt": ""}, "price.value": {"$exists": True}},
+                                       {"store": 1, "product_id": 1, "price": 1, "time.updated": 1})
+        points = [cls.point(item, (item.get("time") or {}).get("updated") or now) for item in items
+                  if (item["store"], item["product_id"]) not in tracked]
+        cls.record(points)
+        # Only once the points are in: a failed backfill is retried by the next run
+        meta.update_one({"_id": "price_history"}, {"$set": {"backfilled": datetime.now(timezone.utc)}}, upsert=True)
+        return len(points)
+
+    @classmethod
+    def for_item(cls, product_id, store, since=None):
+        """
+        Returns the price points of an item in time order, optionally only those at or after `since`.
+        """
+        query = {"meta.store": store, "meta.product_id": product_id}
+        if since:
+            query["time"] = {"$gte": since}
+        return list(cls.collection().find(query, {"_id": 0, "meta": 0}).sort("time", ASCENDING))
+
+
+class JobRun:
+    """
+    Status records of background job runs (`job_runs`) and the per-job-type lock
+    documents (`job_locks`) that keep one run of each type active across all workers.
+    A lock is a lease: it expires after JOB_LOCK_TTL seconds unless the running job
+    renews it, so a worker that dies mid-run does not block its job type forever.
+    """
+
+    ACTIVE = ("queued", "running")
+
+    @staticmethod
+    def collection():
+        return Item.collection().database.job_runs
+
+    @staticmethod
+    def locks():
+        return Item.collection().database.job_locks
+
+    @staticmethod
+    def lock_ttl():
+        return timedelta(seconds=int(os.environ.get("JOB_LOCK_TTL", 900)))
+
+    @classmethod
+    def init_collection(cls):
+        cls.collection().create_index([("type", ASCENDING), ("created", DESCENDING)], name="type_created")
+
+    @classmethod
+    def acquire_lock(cls, job_type, run_id, owner):
+        """
+        Takes (or keeps) the lock of `job_type` for `run_id`. Returns False if another run holds it.
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            cls.locks().find_one_and_update(
+                {"_id": job_type, "$or": [{"run_id": None}, {"run_id": run_id}, {"expires": {"$lt": now}}]},
+                {"$set": {"run_id": run_id, "owner": owner, "expires": now + cls.lock_ttl()}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    @classmethod
+    def renew_lock(cls, job_type, run_id):
+        cls.locks().update_one({"_id": job_type, "run_id": run_id},
+                               {"$set": {"expires": datetime.now(timezone.utc) + cls.lock_ttl()}})
+
+    @classmethod
+    def release_lock(cls, job_type, run_id):
+        cls.locks().update_one({"_id": job_type, "run_id": run_id}, {"$set": {"run_id": None, "expires": None}})
+
+    @classmethod
+    def create(cls, job_type, owner, **fields):
+        run = {
+            **fields,
+            "_id": ObjectId(),
+            "type": job_type,
+            "status": "queued",
+            "owner": owner,
+            "created": datetime.now(timezone.utc),
+            "started": None,
+            "finished": None,
+            "duration": None,
+            "progress": {},
+            "error": None,
+            "cancel_requested": False,
+        }
+        cls.collection().insert_one(run)
+        return run
+
+    @classmethod
+    def update(cls, run_id, **fields):
+        return cls.collection().find_one_and_update({"_id": run_id}, {"$set": fields},
+                                                    return_document=ReturnDocument.AFTER)
+
+    @classmethod
+    def get(cls, run_id):
+        return cls.collection().find_one({"_id": ObjectId(run_id)})
+
+    @classmethod
+    def recent(cls, limit=50):
+        return list(cls.collection().find().sort("created", DESCENDING).limit(limit))
+
+    @classmethod
+    def request_cancel(cls, run_id):
+        """
+        Flags an active run for cancellation; the run stops at its next progress report.
+        Returns the updated run, or None if it was not active.
+        """
+        return cls.collection().find_one_and_update(
+            {"_id": ObjectId(run_id), "status": {"$in": list(cls.ACTIVE)}},
+            {"$set": {"cancel_requested": True}},
+            return_document=ReturnDocument.AFTER
+        )
+
+
+class ScrapeSchedule:
+    """
+    One document per scrape target (a store, or a store category) in `scrape_schedule`,
+    holding when it is next due, when its content last changed and its last run's timings.
+    """
+
+    @staticmethod
+    def collection():
+        return Item.collection().database.scrape_schedule
+
+    @classmethod
+    def sync(cls, targets):
+        """
+        Adds missing targets with their first due time, updates the configuration (store,
+        category, url) of existing ones and drops targets no longer configured.
+        `targets` maps target ids to {"store", "category", "url", "next_run"}.
+        """
+        for target_id, target in targets.items():
+            config = {key: value for key, value in target.items() if key != "next_run"}
+            cls.collection().update_one(
+                {"_id": target_id},
+                {"$set": config,
+                 "$setOnInsert": {"next_run": target["next_run"], "last_run": None, "last_changed": None}},
+                upsert=True
+            )
+        cls.collection().delete_many({"_id": {"$nin": list(targets)}})
+
+    @classmethod
+    def due(cls, now):
+        """
+        Returns the targets due at `now`, those whose content changed most recently first.
+        """
+        targets = cls.collection().find({"next_run": {"$lte": now}})
+        never = datetime.min
+        return sorted(targets, key=lambda target: (target.get("last_changed") or never, -target["next_run"].timestamp()),
+                      reverse=True)
+
+    @classmethod
+    def record_run(cls, target_id, **fields):
+        cls.collection().update_one({"_id": target_id}, {"$set": fields})
+
+
+class ScrapeCheckpoint:
+    """
+    The pages a scrape run could not fetch, kept in `scrape_checkpoints` under the
+    run's target (e.g. "Maxima" or "Rimi:<category>") so that the next run fetches
+    only those instead of starting over. Checkpoints older than SCRAPE_CHECKPOINT_MAX_AGE
+    seconds are ignored, since by then a full run is due anyway.
+    """
+
+    @staticmethod
+    def collection():
+        return Item.collection().database.scrape_checkpoints
+
+    @staticmethod
+    def max_age():
+        return timedelta(seconds=int(os.environ.get("SCRAPE_CHECKPOINT_MAX_AGE", 6 * 3600)))
+
+    @classmethod
+    def get(cls, key):
+        """
+        Returns the pending pages of `key`, or None when there is no recent checkpoint.
+        """
+        since = utcnow() - cls.max_age()
+        checkpoint = cls.collection().find_one({"_id": key, "updated": {"$gte": since}})
+        return checkpoint["pending"] if checkpoint else None
+
+    @classmethod
+    def save(cls, key, pending):
+        cls.collection().update_one({"_id": key}, {"$set": {"pending": pending}, "$currentDate": {"updated": True}},
+                                    upsert=True)
+
+    @classmethod
+    def clear(cls, key):
+        cls.collection().delete_one({"_id": key})
+
+
+class ImageMirror:
+    """
+    Mirrored copies of store images in `image_mirrors`, keyed by source URL, so that an
+    image shared by several items, or by an item rewritten by the scraper, is uploaded once
+    per expiry period.
+    """
+
+    @staticmethod
+    def collection():
+        return Item.collection().database.image_mirrors
+
+    @classmethod
+    def fresh(cls, sources, valid_until):
+        """
+        Returns {source: mirror} for the sources whose mirror is still valid at `valid_until`.
+        """
+        mirrors = cls.collection().find({"_id": {"$in": list(sources)}, "expires": {"$gte": valid_until}})
+        return {mirror["_id"]: mirror for mirror in mirrors}
+
+    @classmethod
+    def record(cls, mirrors):
+        """
+        Stores {source: {"url", "expires"}} with one bulk write.
+        """
+        if mirrors:
+            cls.collection().bulk_write([UpdateOne({"_id": source}, {"$set": mirror}, upsert=True)
+                                         for source, mirror in mirrors.items()], ordered=False)
+
+
+class ProductGroup:
+    """
+    Equivalent products of different stores (see app.matching) in `product_groups`.
+    Every group denormalizes its members' prices and its cheapest member, so listing the
+    cheapest offer per group is a single indexed query. Groups never span blocks (a unit
+    and quantity), so a block's groups are replaced as a whole when its items change.
+    """
+
+    @staticmethod
+    def collection():
+        return Item.collection().database.product_groups
+
+    @classmethod
+    def init_collection(cls):
+        collection = cls.collection()
+        collection.create_index([("block", ASCENDING)], name="block")
+        collection.create_index([("member_keys", ASCENDING)], name="member_keys")
+        collection.create_index([("cheapest.price_per_unit", ASCENDING)], name="cheapest")
+        collection.create_index([("category", ASCENDING), ("cheapest.price_per_unit", ASCENDING)],
+                                name="category_cheapest")
+
+    @staticmethod
+    def state():
+        return Item.collection().database.meta.find_one({"_id": "product_groups"}) or {}
+
+    @staticmethod
+    def save_state(synced, deletions):
+        Item.collection().database.meta.update_one({"_id": "product_groups"},
+                                                   {"$set": {"synced": synced, "deletions": deletions}},
+                                                   upsert=True)
+
+    @classmethod
+    def replace_blocks(cls, blocks, groups):
+        """
+        Makes `groups` the only groups of `blocks` (of every block when None): upserts them,
+        then drops the other groups.
+        """
+        if groups:
+            cls.collection().bulk_write([UpdateOne({"_id": group["_id"]}, {"$set": group}, upsert=True)
+                                         for group in groups], ordered=False)
+        stale = {"_id": {"$nin": [group["_id"] for group in groups]}}
+        if blocks is not None:
+            stale["block"] = {"$in": list(blocks)}
+        return cls.collection().delete_many(stale).deleted_count
+
+    @classmethod
+    def blocks_of(cls, member_keys):
+        """Blocks of the groups holding any of `member_keys` ("store/product_id")."""
+        if not member_keys:
+            return []
+        return cls.collection().distinct("block", {"member_keys": {"$in": member_keys}})
+
+    @classmethod
+    def cheapest(cls, category=None, limit=50):
+        """
+        Returns groups with their cheapest offer, cheapest per unit first.
+        """
+        query = {"category": category} if category else {}
+        return list(cls.collection().find(query, {"members": 0, "member_keys": 0})
+                    .sort("cheapest.price_per_unit", ASCENDING).limit(limit))
+
+    @classmethod
+    def for_item(cls, store, product_id):
+        return cls.collection().find_one({"member_keys": f"{store}/{product_id}"})
+
+
+class Deals:
+    """
+    Materialized deal lists, rebuilt by app.deals at the end of every scrape run:
+    `top_discounts` (the deepest discounts per category and store), `cheapest_per_unit`
+    (the lowest price per unit per category and unit) and `expiring_deals` (discounts
+    ending soonest per category). Rows are item documents plus their `rank`, so each
+    reader below is one indexed query over a small collection.
+    """
+
+    COLLECTIONS = ("top_discounts", "cheapest_per_unit", "expiring_deals")
+    # Rows are shaped like items, without the fields only matching and rebuilding use
+    PROJECTION = {"rank": 0, "built": 0}
+
+    @staticmethod
+    def collection(name):
+        return Item.collection().database[name]
+
+    @classmethod
+    def init_collection(cls):
+        discounts = cls.collection("top_discounts")
+        discounts.create_index([("price.discount", DESCENDING)], name="discount")
+        discounts.create_index([("category", ASCENDING), ("price.discount", DESCENDING)], name="category_discount")
+        discounts.create_index([("store", ASCENDING), ("price.discount", DESCENDING)], name="store_discount")
+        cheapest = cls.collection("cheapest_per_unit")
+        cheapest.create_index([("category", ASCENDING), ("unit", ASCENDING), ("price.price_per_unit", ASCENDING)],
+                              name="category_unit_price_per_unit")
+        cheapest.create_index([("unit", ASCENDING), ("price.price_per_unit", ASCENDING)], name="unit_price_per_unit")
+        expiring = cls.collection("expiring_deals")
+        expiring.create_index([("time.discount_deadline", ASCENDING)], name="deadline")
+        expiring.create_index([("category", ASCENDING), ("time.discount_deadline", ASCENDING)],
+                              name="category_deadline")
+
+    @staticmethod
+    def today():
+        # Deadlines are dates at midnight; a deal is on until the end of its deadline day
+        return utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def top_discounts(cls, category=None, store=None, limit=20):
+        query = {key: value for key, value in (("category", category), ("store", store)) if value}
+        return list(cls.collection("top_discounts").find(query, cls.PROJECTION)
+                    .sort("price.discount", DESCENDING).limit(limit))
+
+    @classmethod
+    def cheapest_per_unit(cls, category=None, unit=None, limit=20):
+        query = {key: value for key, value in (("category", category), ("unit", unit)) if value}
+        return list(cls.collection("cheapest_per_unit").find(query, cls.PROJECTION)
+                    .sort("price.price_per_unit", ASCENDING).limit(limit))
+
+    @classmethod
+    def expiring(cls, category=None, days=None, limit=20):
+        deadline = {"$gte": cls.today()}
+        if days is not None:
+            deadline["$lt"] = cls.today() + timedelta(days=days + 1)
+        query = {"time.discount_deadline": deadline}
+        if category:
+            query["category"] = category
+        return list(cls.collection("expiring_deals").find(query, cls.PROJECTION)
+                    .sort("time.discount_deadline", ASCENDING).limit(limit))
@@ -0,0 +1,147 @@
+"""
+Opt-in profiling of /search.
+
+Each search request is split into phases (translate, search, render) whose
+durations go to /metrics and to the response's Server-Timing header. Searches
+slower than SLOW_SEARCH_MS are logged with their filters and a summary of the
+backend's explain output. A request runs under cProfile, its stats dumped to
+PROFILE_DIR, when it carries an `X-Profile` header (from a logged in admin, or
+matching PROFILE_TOKEN) or is sampled at the rate set on /admin/profiling.
+"""
+
+import io
+import os
+import time
+import pstats
+import random
+import cProfile
+import logging
+import functools
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from flask import g, request, session, make_response
+from app import metrics
+from app.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+search_phase_seconds = metrics.Histogram(
+    "grocy_search_phase_seconds", "Time spent per /search phase", ("phase",))
+slow_searches = metrics.Counter(
+    "grocy_slow_searches_total", "Searches slower than SLOW_SEARCH_MS", ("backend",))
+
+# The sample rate lives in MongoDB so that every worker follows the admin toggle
+_settings = TTLCache("profiling", maxsize=1, ttl=5)
+
+def slow_threshold():
+    return float(os.environ.get("SLOW_SEARCH_MS", 500)) / 1000
+
+def profile_dir():
+    return os.environ.get("PROFILE_DIR", "profiles")
+
+def _meta():
+    from app.models import Item
+    return Item.collection().database.meta
+
+def sample_rate():
+    """Share of /search requests profiled, 0 (off) to 1."""
+    return _settings.get_or_set("sample_rate", lambda: (_meta().find_one({"_id": "profiling"}) or {})
+                                .get("sample_rate", 0.0))
+
+def set_sample_rate(rate):
+    rate = min(max(float(rate), 0.0), 1.0)
+    _meta().update_one({"_id": "profiling"}, {"$set": {"sample_rate": rate}}, upsert=True)
+    _settings.clear()
+    return rate
+
+
+@contextmanager
+def phase(name):
+    """Times a block as a phase of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        search_phase_seconds.observe(elapsed, phase=name)
+        g.setdefault("phases", []).append((name, elapsed))
+
+def with_timings(body):
+    """Wraps a view's return value in a response carrying its phases as Server-Timing."""
+    response = make_response(body)
+    phases = g.get("phases")
+    if phases:
+        response.headers["Server-Timing"] = ", ".join(f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in phases)
+    return response
+
+def log_if_slow(backend, search_term, filters, elapsed, count):
+    """
+    Logs a search slower than SLOW_SEARCH_MS with the backend's explain summary.
+    """
+    if elapsed < slow_threshold():
+        return False
+    slow_searches.inc(backend=backend.name)
+    try:
+        plan = backend.explain(search_term, filters)
+    except Exception as e:
+        plan = f"explain failed: {e}"
+    logger.warning("Slow search (%.0f ms, %s backend, %d results): query=%r filters=%s plan=%s",
+                   elapsed * 1000, backend.name, count, search_term, filters, plan)
+    return True
+
+
+def requested():
+    """Whether the current request asks to be profiled."""
+    header = request.headers.get("X-Profile")
+    if header:
+        token = os.environ.get("PROFILE_TOKEN")
+        return session.get("admin_logged_in") or bool(token) and header == token
+    rate = sample_rate()
+    return rate > 0 and random.random() < rate
+
+def dump(profiler, name):
+    """Writes the stats of `profiler` to PROFILE_DIR, keeping the newest PROFILE_KEEP dumps."""
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    path = os.path.join(directory, f"{name}-{stamp}-{os.getpid()}.prof")
+    profiler.dump_stats(path)
+    for old in dumps()[int(os.environ.get("PROFILE_KEEP", 50)):]:
+        os.remove(os.path.join(directory, old))
+    return path
+
+def dumps():
+    """File names of the stored dumps, newest first."""
+    try:
+        names = [name for name in os.listdir(profile_dir()) if name.endswith(".prof")]
+    except FileNotFoundError:
+        return []
+    return sorted(names, key=lambda name: os.path.getmtime(os.path.join(profile_dir(), name)), reverse=True)
+
+def report(name, limit=40):
+    """
+    Returns the top `limit` functions of a dump by cumulative time as text, or None.
+    """
+    if name not in dumps():
+        return None
+    out = io.StringIO()
+    pstats.Stats(os.path.join(profile_dir(), name), stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+def profiled(name):
+    """
+    Runs the decorated view under cProfile when `requested()`, naming the dump in X-Profile-Dump.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not requested():
+                return view(*args, **kwargs)
+            profiler = cProfile.Profile()
+            response = make_response(profiler.runcall(view, *args, **kwargs))
+            path = dump(profiler, name)
+            logger.info("Profiled %s into %s", request.full_path, path)
+            response.headers["X-Profile-Dump"] = os.path.basename(path)
+            return response
+        return wrapper
+    return decorator
@@ -2,30 +2,41 @@
 Routes module for the Flask application.
 """
 
-from flask import Blueprint, copy_current_request_context, redirect, render_template, request, current_app, url_for
-from datetime import datetime
-from .models import Item
-from threading import Thread
-from flask import copy_current_request_context
-
-# Helper to run tasks in background threads with request context
-def run_in_background(task, *args, **kwargs):
-    @copy_current_request_context
-    def wrapper():
-        task(*args, **kwargs)
-    Thread(target=wrapper).start()
+from flask import Blueprint, Response, jsonify, redirect, render_template, request, current_app, url_for
+from datetime import datetime, timedelta, timezone
+from .models import Item, Deals, LIST_PAGE_SIZE
+from . import cache
+from . import jobs
+from . import metrics
+from . import profiling
 
 main = Blueprint("main", __name__)
 
+# Top discounts shown on the home page
+HOME_DEALS = 12
+
 @main.route("/")
 def index():
     """
     Route for the index page.
     """
-    items = Item.get_all()
-    total_items = Item.collection().count_documents({})
-    
-    # Read categories from links.txt
+    # Only cached aggregates and the materialized top discounts here; the page never scans items
+    total_items = Item.count()
+    categories = cache.metadata_cache.get_or_set("categories", link_categories)
+    stores = Item.stores()
+    deals = Deals.top_discounts(limit=HOME_DEALS)
+
+    return render_template("index.html", 
+                         total_items=total_items, 
+                         categories=sorted(categories),
+                         stores=stores,
+                         deals=deals,
+                         current_year=datetime.utcnow().year)
+
+def link_categories():
+    """
+    Reads the category names from links.txt.
+    """
     categories = []
     try:
         with open('app/links.txt', 'r') as f:
@@ -35,17 +46,34 @@ def index():
                     categories.append(category)
     except FileNotFoundError:
         current_app.logger.error("links.txt file not found")
-        categories = []
+    return categories
 
-    # Get distinct stores from items
-    stores = Item.collection().distinct("store")
+@main.route("/items")
+def list_items():
+    """
+    Route returning one page of items as JSON (`?page=`, `?page_size=`, `?fields=a,b`).
+    """
+    fields = [field for field in request.args.get("fields", "").split(",") if field]
+    page = request.args.get("page", 1, type=int)
+    page_size = request.args.get("page_size", LIST_PAGE_SIZE, type=int)
+    items = Item.list(page=page, page_size=page_size, fields=fields)
+    for item in items:
+        item["_id"] = str(item["_id"])
+    return jsonify({"page": max(page, 1), "total": Item.count(), "items": items})
 
-    return render_template("index.html", 
-                         items=items, 
-                         total_items=total_items, 
-                         categories=sorted(categories),
-                         stores=sorted(stores),
-                         current_year=datetime.utcnow().year)
+@main.route("/cache_stats")
+def cache_stats():
+    """
+    Route exposing cache hit/miss counters for monitoring.
+    """
+    return jsonify(cache.stats())
+
+@main.route("/metrics")
+def metrics_endpoint():
+    """
+    Route exposing this process's metrics in the Prometheus text format.
+    """
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
 
 @main.route("/add", methods=["POST"])
 def add():
@@ -84,6 +112,7 @@ def add():
         }
     }
     Item.create(data)
+    Item.bump_data_version()
     return redirect(url_for("main.index"))
 
 @main.route("/delete/<item_id>")
@@ -92,6 +121,7 @@ def delete(item_id):
     Route for deleting an item.
     """
     Item.delete(item_id)
+    Item.bump_data_version(deleted=True)
     return redirect(url_for("main.index"))
 
 @main.route("/delete_all", methods=["POST"])
@@ -101,6 +131,7 @@ def delete_all():
     """
     from .models import Item
     Item.collection().delete_many({})
+    Item.bump_data_version(deleted=True)
     return redirect(url_for("main.index"))
 
 @main.route("/scrape")
@@ -109,7 +140,7 @@ def scrape():
     Route for scraping sales data from Maxima.
     """
     from .scraper import parse_maxima_sales
-    run_in_background(parse_maxima_sales)
+    jobs.submit("scrape_maxima", parse_maxima_sales)
     return redirect(url_for("main.index"))
 
 @main.route("/scrape_rimi", endpoint="scrape_rimi")
@@ -118,7 +149,7 @@ def scrape_rimi():
     Route for scraping sales data from Rimi.
     """
     from .scraper import parse_rimi_sales
-    run_in_background(parse_rimi_sales)
+    jobs.submit("scrape_rimi", parse_rimi_sales)
     return redirect(url_for("main.index"))
 
 @main.route("/categorize_maxima")
@@ -127,35 +158,43 @@ def categorize_maxima():
     Route for categorizing Maxima items based on Rimi items.
     """
     from .scraper import categorize_maxima_items
-    run_in_background(categorize_maxima_items)
+    jobs.submit("categorize_maxima", categorize_maxima_items)
     return redirect(url_for("main.index"))
 
+def translate_query(query):
+    """
+    Translates an English query to Latvian, returning it unchanged if translation fails.
+    """
+    try:
+        import os
+        from google.cloud import translate_v2 as translate
+
+        # Set up translation client
+        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = '/Users/melihbulut/Grocy/keys/grocy-416211-959710a9980e.json'
+        translate_client = translate.Client()
+
+        # Translate the query
+        translation = translate_client.translate(
+            query,
+            target_language="lv",
+        )
+        return translation["translatedText"]
+    except Exception as e:
+        current_app.logger.error(f"Translation failed: {e}")
+        return query
+
 @main.route("/search")
+@profiling.profiled("search")
 def search():
     """
     Route for fuzzy searching items with filters.
+    Per-phase timings are returned in the Server-Timing header.
     """
     query = request.args.get("query", "")
     lang = request.args.get("lang", "english").lower()
     if query and lang == "english":
-        try:
-            import os
-            from google.cloud import translate_v2 as translate
-
-            # Set up translation client
-            os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = '/Users/melihbulut/Grocy/keys/grocy-416211-959710a9980e.json'
-            translate_client = translate.Client()
-
-            # Translate the query
-            translation = translate_client.translate(
-                query,
-                target_language="lv",
-            )
-            query = translation["translatedText"]
-        except Exception as e:
-            current_app.logger.error(f"Translation failed: {e}")
-            # Optionally, set a flag or message to inform the user
-            translation_failed = True
+        with profiling.phase("translate"):
+            query = translate_query(query)
 
     if query:
         filters = {
@@ -171,48 +210,66 @@ def search():
             filters['max_quantity'] = float(max_qty)
         # Remove empty filters
         filters = {k: v for k, v in filters.items() if v is not None and v != ''}
-        items = Item.search_by_name(query, filters)
+        with profiling.phase("search"):
+            items = Item.search_by_name(query, filters)
     else:
         items = []
-    return render_template("search_results_partial.html", items=items)
+    with profiling.phase("render"):
+        html = render_template("search_results_partial.html", items=items)
+    return profiling.with_timings(html)
+
+def step_chart(points, until, width=600, height=200):
+    """
+    Lays out price points as an SVG step line: each price holds until the next change.
+    Returns the polyline points attribute and the price range shown.
+    """
+    if not points:
+        return "", None, None
+    # MongoDB returns naive UTC datetimes
+    times = [point["time"].astimezone(timezone.utc).replace(tzinfo=None) if point["time"].tzinfo else point["time"]
+             for point in points] + [until.astimezone(timezone.utc).replace(tzinfo=None)]
+    prices = [point["price"] for point in points]
+    low, high = min(prices), max(prices)
+    start, span = times[0], (times[-1] - times[0]).total_seconds() or 1
+    spread = (high - low) or 1
+
+    def xy(when, price):
+        x = (when - start).total_seconds() / span * width
+        y = height - (price - low) / spread * height if high != low else height / 2
+        return f"{x:.1f},{y:.1f}"
+
+    coords = []
+    for index, price in enumerate(prices):
+        coords.append(xy(times[index], price))
+        coords.append(xy(times[index + 1], price))
+    return " ".join(coords), low, high
+
+@main.route("/price_history/<store>/<product_id>")
+def price_history(store, product_id):
+    """
+    Route for the price history of an item, as a chart or as JSON with ?format=json.
+    """
+    days = request.args.get("days", 90, type=int)
+    now = datetime.now(timezone.utc)
+    points = Item.price_history(product_id, store, now - timedelta(days=days))
+    if request.args.get("format") == "json":
+        return jsonify(store=store, product_id=product_id, points=points)
+    item = Item.collection().find_one({"store": store, "product_id": product_id})
+    polyline, low, high = step_chart(points, now)
+    return render_template("price_history.html",
+                           item=item,
+                           store=store,
+                           points=points,
+                           polyline=polyline,
+                           low=low,
+                           high=high,
+                           days=days,
+                           current_year=now.year)
 
 @main.route("/remove_duplicates")
 def remove_duplicates():
     """
-    Route for removing duplicate items.
-    """
-    def run_cleanup():
-        # Get all items grouped by product_id and store
-        pipeline = [
-            {
-                "$group": {
-                    "_id": {
-                        "product_id": "$product_id",
-                        "store": "$store"
-                    },
-                    "items": {"$push": "$$ROOT"},
-                    "count": {"$sum": 1}
-                }
-            },
-            {
-                "$match": {
-                    "count": {"$gt": 1}
-                }
-            }
-        ]
-        
-        duplicates = Item.collection().aggregate(pipeline)
-        removed_count = 0
-        
-        for group in duplicates:
-            # Sort by update time and keep the most recent
-            items = sorted(group["items"], key=lambda x: x["time"]["updated"], reverse=True)
-            # Keep the first (most recent) item and remove others
-            for item in items[1:]:
-                Item.delete(item["_id"])
-                removed_count += 1
-        
-        app = current_app._get_current_object() 
-        app.logger.info(f"Removed {removed_count} duplicate items")
-    run_in_background(run_cleanup)
+    Route for removing duplicate items left over from before the unique index existed.
+    """
+    jobs.submit("remove_duplicates", Item.remove_duplicates)
     return redirect(url_for("main.index"))
@@ -0,0 +1,101 @@
+"""
+Periodic scraping: `python -m app.scraper schedule`.
+
+Every store is a scrape target and so is every Rimi category in links.txt, each
+with its own due time in `scrape_schedule`. New categories are staggered evenly
+over their store's interval so that they do not all come due together. A target
+whose last run changed items comes due again after half the interval, and due
+targets run in order of how recently their content changed. Each run goes
+through the job runner, so it is recorded in `job_runs` with its duration and
+shares the store's lock with runs started from the admin page.
+
+Only one scheduler acts at a time: the others hold back while the `scheduler`
+lease in `job_locks` is held.
+"""
+
+import os
+import time
+import logging
+from datetime import timedelta
+from app import jobs
+from app.models import JobRun, ScrapeSchedule, utcnow
+from app.stores import MaximaAdapter, RimiAdapter, load_links
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVALS = {"Maxima": 3600, "Rimi": 6 * 3600}
+# Targets whose last run changed something come due again after this fraction of their interval
+CHANGED_FACTOR = 0.5
+
+def interval(store):
+    seconds = os.environ.get(f"SCRAPE_INTERVAL_{store.upper()}", DEFAULT_INTERVALS[store])
+    return timedelta(seconds=float(seconds))
+
+
+class Scheduler:
+    def __init__(self, links=None, tick=30, now=utcnow):
+        self.links = links if links is not None else load_links()
+        self.tick = tick
+        self.now = now
+        self.owner = f"{jobs.owner()}:scheduler"
+
+    def targets(self):
+        """
+        Returns {target_id: target} with first due times staggered over each store's interval.
+        """
+        now = self.now()
+        targets = {"Maxima": {"store": "Maxima", "category": None, "next_run": now}}
+        step = interval("Rimi") / max(len(self.links), 1)
+        for i, (category, url) in enumerate(self.links):
+            targets[f"Rimi:{category}"] = {"store": "Rimi", "category": category, "url": url,
+                                           "next_run": now + step * i}
+        return targets
+
+    def adapter(self, target):
+        if target["store"] == "Maxima":
+            return MaximaAdapter()
+        return RimiAdapter(links=[(target["category"], target["url"])])
+
+    def run_target(self, target):
+        from app.scraper import scrape_store
+        job_type = f"scrape_{target['store'].lower()}"
+        run = jobs.start(job_type, target=target["_id"])
+        if run is None:
+            # A manual run of the store is in progress; look again next tick
+            return None
+        run = jobs.execute(run, scrape_store, (self.adapter(target),))
+        now = self.now()
+        summary = run.get("result") or {}
+        changed = bool(summary.get("inserted") or summary.get("updated"))
+        next_run = now + interval(target["store"]) * (CHANGED_FACTOR if changed else 1)
+        fields = {"last_run": now, "next_run": next_run, "last_status": run["status"],
+                  "last_duration": run["duration"], "last_summary": summary}
+        if changed:
+            fields["last_changed"] = now
+        ScrapeSchedule.record_run(target["_id"], **fields)
+        logger.info("Scraped %s in %.1fs: %s; next run at %s",
+                    target["_id"], run["duration"], summary, next_run.isoformat(timespec="seconds"))
+        return run
+
+    def run_pending(self):
+        """
+        Runs every due target once and returns how many ran.
+        """
+        ScrapeSchedule.sync(self.targets())
+        count = 0
+        for target in ScrapeSchedule.due(self.now()):
+            if self.run_target(target) is not None:
+                count += 1
+            JobRun.renew_lock("scheduler", self.owner)
+        return count
+
+    def run_forever(self):
+        logger.info("Scheduler %s started", self.owner)
+        while True:
+            if JobRun.acquire_lock("scheduler", self.owner, self.owner):
+                try:
+                    self.run_pending()
+                finally:
+                    # Keep the lease between ticks; it lapses on its own if this process dies
+                    JobRun.renew_lock("scheduler", self.owner)
+            time.sleep(self.tick)
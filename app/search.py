@@ -0,0 +1,370 @@
+"""
+Search backends behind Item.search_by_name.
+
+`atlas` runs the Atlas Search `$search` stage against the `search_name` index.
+`local` keeps an in-process trigram index over `search_name` and ranks candidates
+with RapidFuzz, so search works without Atlas (locally, in tests) and without a
+network round trip per query. Pick one with SEARCH_BACKEND.
+"""
+
+import os
+import time
+import heapq
+import logging
+import threading
+from collections import Counter
+from rapidfuzz import fuzz, process
+from app.models import Item
+
+logger = logging.getLogger(__name__)
+
+RESULT_LIMIT = 10
+# Sort orders of search pages: the field sorted on (None ranks by relevance) and its default direction
+SORTS = {
+    "relevance": (None, -1),
+    "price": ("price.value", 1),
+    "price_per_unit": ("price.price_per_unit", 1),
+    "discount": ("price.discount", -1),
+}
+# The item fields search pages return
+PAGE_FIELDS = ("name", "product_id", "store", "category", "brand", "image_url", "quantity", "unit", "stock",
+               "price", "time.discount_deadline")
+
+def sort_order(sort, descending=None):
+    """
+    Returns (field, direction) of a SORTS key, reversed by `descending`. Relevance is always best first.
+    """
+    field, direction = SORTS[sort]
+    if field is not None and descending is not None:
+        direction = -1 if descending else 1
+    return field, direction
+
+def get_path(doc, path):
+    for part in path.split("."):
+        doc = doc.get(part) if isinstance(doc, dict) else None
+    return doc
+
+def match_conditions(filters):
+    """
+    Translates the search form filters into a MongoDB match document.
+    """
+    conditions = {}
+    if filters:
+        if 'stock' in filters:
+            conditions['stock'] = filters['stock']
+        if 'category' in filters:
+            conditions['category'] = filters['category']
+        if 'min_quantity' in filters:
+            conditions['quantity'] = {'$gte': filters['min_quantity']}
+        if 'max_quantity' in filters:
+            conditions.setdefault('quantity', {})['$lte'] = filters['max_quantity']
+        if 'store' in filters:
+            conditions['store'] = filters['store']
+    return conditions
+
+def explain_summary(explain):
+    """
+    Condenses an aggregate explain to its stages with the documents each returned and
+    its time estimate, plus the totals when the server reports them.
+    """
+    stages = []
+    for stage in explain.get("stages", []):
+        name = next((key for key in stage if key.startswith("$")), "?")
+        stages.append({"stage": name, "returned": stage.get("nReturned"),
+                       "ms": stage.get("executionTimeMillisEstimate")})
+    if not stages:
+        plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        while plan:
+            stages.append({"stage": plan.get("stage")})
+            plan = plan.get("inputStage")
+    stats = explain.get("executionStats", {})
+    return {"stages": stages, "docs_examined": stats.get("totalDocsExamined"),
+            "ms": stats.get("executionTimeMillis")}
+
+def fold(text):
+    """
+    Lowercases and strips diacritics so that "piens" matches "Piens" and "pienš".
+    """
+    return " ".join(Item.remove_diacritics((text or "").lower()).split())
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AtlasSearch:
+    name = "atlas"
+
+    @staticmethod
+    def pipeline(search_term, filters=None, limit=RESULT_LIMIT):
+        pipeline = [
+            {
+                "$search": {
+                    "index": "search_name",
+                    "text": {
+                        "query": search_term,
+                        "path": "search_name",
+                        "fuzzy": {}
+                    }
+                }
+            }
+        ]
+        conditions = match_conditions(filters)
+        if conditions:
+            pipeline.append({"$match": conditions})
+        pipeline.append({"$limit": limit})
+        return pipeline
+
+    def search(self, search_term, filters=None, limit=RESULT_LIMIT):
+        return list(Item.collection().aggregate(self.pipeline(search_term, filters, limit)))
+
+    def search_page(self, search_term, filters=None, sort="relevance", descending=None, limit=20, after=None):
+        """
+        Returns (items, next cursor) of one page, paginated with the `searchSequenceToken`
+        of the last item. Sorting on a field needs it mapped as a number in the index.
+        """
+        field, direction = sort_order(sort, descending)
+        search = self.pipeline(search_term)[0]["$search"]
+        if field is not None:
+            # _id breaks ties so that pages never overlap
+            search["sort"] = {field: direction, "_id": 1}
+        if after:
+            search["searchAfter"] = after
+        pipeline = [{"$search": search}]
+        conditions = match_conditions(filters)
+        if sort == "price_per_unit":
+            # 0 means the unit price is unknown
+            conditions["price.price_per_unit"] = {"$gt": 0}
+        if conditions:
+            pipeline.append({"$match": conditions})
+        pipeline.append({"$limit": limit + 1})
+        pipeline.append({"$project": {**{path: 1 for path in PAGE_FIELDS},
+                                      "cursor": {"$meta": "searchSequenceToken"}}})
+        docs = list(Item.collection().aggregate(pipeline))
+        page = docs[:limit]
+        return page, page[-1]["cursor"] if len(docs) > limit else None
+
+    def explain(self, search_term, filters=None, limit=RESULT_LIMIT):
+        collection = Item.collection()
+        result = collection.database.command(
+            "explain",
+            {"aggregate": collection.name, "pipeline": self.pipeline(search_term, filters, limit), "cursor": {}},
+            verbosity="executionStats"
+        )
+        return explain_summary(result)
+
+    def index_items(self, items):
+        # Atlas keeps its own index in sync with the collection
+        pass
+
+
+class LocalSearch:
+    """
+    In-process trigram inverted index over the folded `search_name`.
+
+    The first search loads the collection. Afterwards the index follows the data:
+    an ItemWriter in the same process pushes its writes straight in, and other
+    processes' scrape runs are picked up from the meta version document by
+    re-reading only items whose `time.updated` moved. Deletions force a reload.
+    """
+
+    name = "local"
+
+    def __init__(self, candidates=200, min_score=60, interval=None):
+        self.candidates = candidates
+        self.min_score = min_score
+        self.interval = interval if interval is not None else float(os.environ.get("CACHE_VERSION_INTERVAL", 5))
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.docs = {}
+            self.names = {}
+            self.postings = {}
+            self.loaded = False
+            self.synced = None
+            self.version = None
+            self._checked = 0.0
+
+    @staticmethod
+    def key(item):
+        # Manually added items share an empty product_id
+        if item.get("product_id"):
+            return (item.get("store"), item["product_id"])
+        return str(item.get("_id"))
+
+    def _add(self, item):
+        key = self.key(item)
+        self._remove(key)
+        doc = {**self.docs.get(key, {}), **item}
+        doc.pop("content_hash", None)
+        name = fold(doc.get("search_name") or doc.get("name"))
+        self.docs[key] = doc
+        self.names[key] = name
+        for gram in trigrams(name):
+            self.postings.setdefault(gram, set()).add(key)
+        updated = (doc.get("time") or {}).get("updated")
+        if updated is not None and "_id" in item and (self.synced is None or updated > self.synced):
+            self.synced = updated
+
+    def _remove(self, key):
+        name = self.names.pop(key, None)
+        if name is None:
+            return
+        for gram in trigrams(name):
+            keys = self.postings.get(gram)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[gram]
+
+    def load(self):
+        with self._lock:
+            self.reset()
+            meta = Item.data_version_doc()
+            for item in Item.collection().find():
+                self._add(item)
+            self.version = (meta.get("version", 0), meta.get("deletions", 0))
+            self.loaded = True
+            self._checked = time.monotonic()
+        logger.info("Loaded %d items into the local search index", len(self.docs))
+
+    def refresh(self):
+        """
+        Catches up with writes made by other processes since the last check.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked < self.interval:
+                return
+            self._checked = now
+        meta = Item.data_version_doc()
+        version = (meta.get("version", 0), meta.get("deletions", 0))
+        if version == self.version:
+            return
+        if version[1] != self.version[1]:
+            self.load()
+            return
+        query = {"time.updated": {"$gte": self.synced}} if self.synced is not None else {}
+        with self._lock:
+            count = 0
+            for item in Item.collection().find(query):
+                self._add(item)
+                count += 1
+            self.version = version
+        logger.info("Refreshed %d items in the local search index", count)
+
+    def index_items(self, items):
+        """
+        Applies items just written by this process. Ignored until the index is loaded.
+        """
+        with self._lock:
+            if self.loaded:
+                for item in items:
+                    self._add(item)
+
+    def search(self, search_term, filters=None, limit=RESULT_LIMIT):
+        if not self.loaded:
+            self.load()
+        else:
+            self.refresh()
+        with self._lock:
+            return [self.docs[key] for _, key in self._ranked(search_term, filters, limit)]
+
+    def _ranked(self, search_term, filters, limit):
+        """
+        Returns [(score, key)] of the best `limit` matches, best first.
+        """
+        query = fold(search_term)
+        if not query:
+            return []
+        with self._lock:
+            overlap = Counter()
+            for gram in trigrams(query):
+                overlap.update(self.postings.get(gram, ()))
+            if filters:
+                overlap = Counter({key: count for key, count in overlap.items()
+                                   if self._matches(self.docs[key], filters)})
+            candidates = {key: self.names[key]
+                          for key, _ in heapq.nlargest(self.candidates, overlap.items(), key=lambda kv: kv[1])}
+            ranked = process.extract(query, candidates, scorer=fuzz.WRatio,
+                                     score_cutoff=self.min_score, limit=limit)
+            return [(score, key) for _, score, key in ranked]
+
+    def search_page(self, search_term, filters=None, sort="relevance", descending=None, limit=20, after=None):
+        """
+        Returns (items, next cursor) of one page of the best `candidates` matches. The
+        cursor is the sort key of the last item: (signed sort value, item key).
+        """
+        if not self.loaded:
+            self.load()
+        else:
+            self.refresh()
+        field, direction = sort_order(sort, descending)
+        rows = []
+        with self._lock:
+            for score, key in self._ranked(search_term, filters, self.candidates):
+                doc = self.docs[key]
+                value = score if field is None else get_path(doc, field)
+                if value is None or (sort == "price_per_unit" and not value):
+                    continue
+                item_key = "/".join(key) if isinstance(key, tuple) else key
+                rows.append(((value * direction, item_key), doc))
+        rows.sort(key=lambda row: row[0])
+        if after is not None:
+            after = tuple(after)
+            rows = [row for row in rows if row[0] > after]
+        page = rows[:limit]
+        return [doc for _, doc in page], list(page[-1][0]) if len(rows) > limit else None
+
+    def explain(self, search_term, filters=None):
+        """
+        Sizes of the index and of the candidate set a query scores.
+        """
+        query = fold(search_term)
+        with self._lock:
+            keys = set()
+            for gram in trigrams(query):
+                keys.update(self.postings.get(gram, ()))
+            matching = sum(1 for key in keys if not filters or self._matches(self.docs[key], filters))
+            return {"indexed": len(self.docs), "grams": len(self.postings), "overlapping": len(keys),
+                    "matching": matching, "scored": min(matching, self.candidates)}
+
+    @staticmethod
+    def _matches(doc, filters):
+        if 'stock' in filters and doc.get('stock') != filters['stock']:
+            return False
+        if 'category' in filters and doc.get('category') != filters['category']:
+            return False
+        if 'store' in filters and doc.get('store') != filters['store']:
+            return False
+        quantity = doc.get('quantity')
+        if 'min_quantity' in filters and (quantity is None or quantity < filters['min_quantity']):
+            return False
+        if 'max_quantity' in filters and (quantity is None or quantity > filters['max_quantity']):
+            return False
+        return True
+
+
+BACKENDS = {"atlas": AtlasSearch, "local": LocalSearch}
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """
+    Returns the process-wide search backend selected by SEARCH_BACKEND (default `atlas`).
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = os.environ.get("SEARCH_BACKEND", "atlas").lower()
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown SEARCH_BACKEND {name!r}, expected one of {sorted(BACKENDS)}")
+            _backend = BACKENDS[name]()
+        return _backend
+
+def set_backend(backend):
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,651 @@
+"""
+Store adapters for the scraper.
+Each adapter fetches a store's pages and extracts raw product records from them;
+turning a raw record into an item document is shared by every store.
+"""
+
+import os
+import re
+import json
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
+from bs4 import BeautifulSoup
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # lxml is only needed for SCRAPER_PARSER=lxml
+    etree = lxml_html = None
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+PARSERS = ("bs4", "lxml")
+
+# Units are stored in grams/millilitres so that price_per_unit is comparable across stores
+UNIT_CONVERSIONS = {"kg": ("g", 1000), "l": ("ml", 1000)}
+
+def to_base_unit(quantity, unit):
+    """Converts kg to g and l to ml."""
+    if unit in UNIT_CONVERSIONS:
+        unit, factor = UNIT_CONVERSIONS[unit]
+        if quantity is not None:
+            quantity = quantity * factor
+    return quantity, unit
+
+def parse_number(text):
+    """Parses '1,29 €' style numbers, returning None when there is no number."""
+    if not text:
+        return None
+    try:
+        return float(text.split(' ')[0].replace(',', '.').replace('€', ''))
+    except ValueError:
+        return None
+
+# Bump when normalize() changes so that every stored item is rewritten on the next run
+NORMALIZE_VERSION = 1
+
+def content_hash(record):
+    """
+    Stable fingerprint of a raw record. Items whose fingerprint matches the stored
+    content_hash are skipped before a document is built.
+    """
+    payload = json.dumps([NORMALIZE_VERSION, record], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+def scrape_img(element, store=""):
+    """
+    Helper function to extract the src URL from an <img> element within the given element.
+    Returns the URL if found, otherwise None.
+    """
+    if not element:
+        logger.warning("No element provided for image scraping")
+        return None
+    img_element = element.find('div', class_='img')
+    if not img_element:
+        logger.warning("No 'div.img' found in the element: %s", element)
+        return None
+    img = img_element.find('img')
+    img_url_relative = img['src'] if img and img.has_attr('src') else None
+    if not img_url_relative:
+        logger.warning("No 'src' attribute found for image in element: %s", element)
+        return None
+    return clean_img_url(img_url_relative, store)
+
+def clean_img_url(img_url_relative, store=""):
+    """
+    Truncates an image src after '.png' and makes Maxima URLs absolute.
+    """
+    if ".png" in img_url_relative:
+        img_url_relative = img_url_relative.split(".png")[0] + ".png"
+        logger.info("Truncated image URL to: %s", img_url_relative)
+    else:
+        logger.warning("'.png' not found in image URL: %s", img_url_relative)
+    if store == "Rimi":
+        return img_url_relative
+    elif store == "Maxima":
+        full_url = f"https://www.maxima.lv{img_url_relative}"
+        logger.info("Full image URL for Maxima (truncated): %s", full_url)
+        return full_url
+    return img_url_relative
+
+def has_class(name):
+    """XPath predicate matching elements whose class attribute contains `name`."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+def lxml_text(element, strip=False):
+    """
+    lxml equivalent of BeautifulSoup's `.text` (or `get_text(strip=True)` when strip is set).
+    """
+    if strip:
+        return "".join(text.strip() for text in element.itertext())
+    return element.text_content()
+
+def lxml_first(xpath, element):
+    found = xpath(element)
+    return found[0] if found else None
+
+def load_links():
+    """Load (category, url) pairs from links.txt."""
+    links = []
+    with open('app/links.txt', 'r') as file:
+        for line in file:
+            if '=' not in line:
+                logger.error("Invalid line in links.txt (missing '=' sign): %s", line)
+                continue
+            category, base_url = line.strip().split('=', 1)
+            links.append((category, base_url))
+    return links
+
+
+class StoreAdapter:
+    """
+    Base class for a store.
+    Subclasses implement `pages` (fetch), `extract_bs4`/`extract_lxml` (raw records
+    from the parsed page) and `search_name`. A raw record is a dict with the keys product_id, name, brand,
+    image_url, category, stock, price, old_price, quantity, unit, unit_price and
+    discount_deadline; missing keys are treated as unknown.
+
+    The parser backend is picked with `parser` or SCRAPER_PARSER: "bs4" (default) or
+    "lxml", which evaluates the XPath expressions in `xpaths`, compiled once per class.
+    Both backends must extract identical records.
+
+    Pages that cannot be fetched are appended to `failed` as JSON-serializable units;
+    the scraper stores them as a checkpoint under `checkpoint_key` and hands them back
+    in `resume` on the next run, when `pages` fetches only those.
+    """
+    store = None
+    # Whether the scraper has to categorize records itself (the store has no categories of its own)
+    categorize = False
+    xpaths = {}
+
+    def __init__(self, parser=None):
+        parser = parser or os.environ.get("SCRAPER_PARSER", "bs4")
+        if parser not in PARSERS:
+            raise ValueError(f"Unknown parser backend: {parser}")
+        if parser == "lxml" and etree is None:
+            logger.warning("lxml is not installed, falling back to the bs4 parser")
+            parser = "bs4"
+        self.parser = parser
+        self.resume = None
+        self.failed = []
+
+    @property
+    def checkpoint_key(self):
+        return self.store
+
+    @classmethod
+    def compiled_xpaths(cls):
+        if "_compiled_xpaths" not in cls.__dict__:
+            cls._compiled_xpaths = {name: etree.XPath(expr) for name, expr in cls.xpaths.items()}
+        return cls._compiled_xpaths
+
+    async def pages(self, fetcher):
+        """Async generator of (html, context) for every page to scrape."""
+        raise NotImplementedError
+
+    def extract(self, html, context):
+        """Returns the raw records found on one page."""
+        if self.parser == "lxml" and not html.strip():
+            return []
+        with metrics.stage("parse", self.store, context):
+            document = lxml_html.document_fromstring(html) if self.parser == "lxml" \
+                else BeautifulSoup(html, 'html.parser')
+        with metrics.stage("extract", self.store, context):
+            if self.parser == "lxml":
+                return self.extract_lxml(document, context)
+            return self.extract_bs4(document, context)
+
+    def extract_bs4(self, soup, context):
+        raise NotImplementedError
+
+    def extract_lxml(self, root, context):
+        raise NotImplementedError
+
+    def lxml_img(self, element):
+        """lxml counterpart of scrape_img."""
+        xp = self.compiled_xpaths()
+        img_element = lxml_first(xp["img_div"], element)
+        img = lxml_first(xp["img"], img_element) if img_element is not None else None
+        src = img.get("src") if img is not None else None
+        if not src:
+            logger.warning("No image found for %s item", self.store)
+            return None
+        return clean_img_url(src, self.store)
+
+    def search_name(self, title):
+        return title.lower()
+
+    def normalize(self, record):
+        """
+        Builds an item document (see data/dbschema.json) from a raw record.
+        """
+        price = record.get("price") or 0.0
+        old_price = record.get("old_price")
+        discount = round((old_price - price) / old_price * 100) if old_price and old_price > price else 0
+
+        quantity, unit = record.get("quantity"), record.get("unit")
+        unit_price = record.get("unit_price")
+        if quantity is None and unit_price and unit:
+            quantity = price / unit_price
+        quantity, unit = to_base_unit(quantity, unit)
+        if quantity is not None:
+            quantity = round(quantity, 2)
+
+        if quantity and unit in ['g', 'ml']:
+            price_per_unit = round(price / (quantity / 1000), 2)
+        elif quantity:
+            price_per_unit = round(price / quantity, 2)
+        else:
+            price_per_unit = 0
+
+        now = datetime.astimezone(datetime.now(), timezone.utc)
+        return {
+            "name": record["name"],
+            "product_id": record["product_id"],
+            "description": "",
+            "search_name": self.search_name(record["name"]),
+            "image_url": record.get("image_url"),
+            "store": self.store,
+            "category": record.get("category"),
+            "stock": record.get("stock", True),
+            "unit": unit,
+            "quantity": quantity,
+            "brand": record.get("brand") or self.store,
+            "price": {
+                "value": price,
+                "old_value": old_price if old_price is not None else price,
+                "discount": discount,
+                "currency": "EUR",
+                "price_per_unit": price_per_unit
+            },
+            "time": {
+                "created": now,
+                "updated": now,
+                "discount_deadline": record.get("discount_deadline")
+            }
+        }
+
+
+class MaximaAdapter(StoreAdapter):
+    store = "Maxima"
+    categorize = True
+    base_url = "https://www.maxima.lv/ajax/salesloadmore"
+    # The whole catalogue in one response; only used when the endpoint does not page
+    url = base_url + "?sort_by=newest&limit=2000&search="
+    # Pages fetched ahead of the one being parsed and written
+    prefetch = 2
+
+    def __init__(self, parser=None, page_size=None):
+        super().__init__(parser)
+        self.page_size = page_size or int(os.environ.get("MAXIMA_PAGE_SIZE", 200))
+
+    def page_url(self, offset):
+        return f"{self.base_url}?sort_by=newest&limit={self.page_size}&offset={offset}&search="
+
+    _product_id_re = re.compile(r'data-product-id="([^"]*)"')
+
+    async def fetch_pages(self, fetcher, queue, offset=0):
+        """
+        Fetches the sales `page_size` items at a time from `offset` into `queue`, ending
+        it with None. Should the endpoint ignore the offset, falls back to the single
+        large request. A page that cannot be fetched ends the run and is recorded in `failed`.
+        """
+        try:
+            seen = set()
+            while True:
+                html = await fetcher.get(self.page_url(offset))
+                if html is None:
+                    self.failed.append({"offset": offset})
+                    return
+                product_ids = self._product_id_re.findall(html)
+                if not product_ids:
+                    return
+                if not set(product_ids) - seen:
+                    logger.warning("Maxima ignored offset=%d, fetching the whole catalogue at once", offset)
+                    html = await fetcher.get(self.url)
+                    if html is None:
+                        self.failed.append({"offset": offset})
+                        return
+                    await queue.put((html, None))
+                    return
+                seen.update(product_ids)
+                await queue.put((html, None))
+                if len(product_ids) < self.page_size:
+                    return
+                offset += self.page_size
+        finally:
+            await queue.put(None)
+
+    async def pages(self, fetcher):
+        # A bounded queue keeps at most `prefetch` pages in memory while the pipeline
+        # parses and writes the current one
+        queue = asyncio.Queue(maxsize=self.prefetch)
+        offset = self.resume[0]["offset"] if self.resume else 0
+        if offset:
+            logger.info("Resuming Maxima sales at offset %d", offset)
+        producer = asyncio.create_task(self.fetch_pages(fetcher, queue, offset))
+        try:
+            while (page := await queue.get()) is not None:
+                yield page
+            await producer
+        finally:
+            producer.cancel()
+
+    def search_name(self, title):
+        return re.sub(r'\b[A-Z]{2,}\b', '', title.split(',')[0]).strip().lower()
+
+    @staticmethod
+    def brand(title):
+        brand_match = re.search(r'\b(?:[A-ZĀČĒĢĪĶĻŅŠŪŽ]{2,}(?:\s+[A-ZĀČĒĢĪĶĻŅŠŪŽ]{2,})+)\b', title)
+        if not brand_match:
+            brand_match = re.search(r'\b[A-ZĀČĒĢĪĶĻŅŠŪŽ]{2,}\b', title)
+        return brand_match.group().strip() if brand_match else None
+
+    xpaths = {
+        "items": f"//div[{has_class('item')}]",
+        "discount_percents": ".//div[@class='discount percents']",
+        "title": f".//div[{has_class('title')}]",
+        "price": f".//div[{has_class('t1')}]",
+        "value": f".//span[{has_class('value')}]",
+        "cents": f".//span[{has_class('cents')}]",
+        "old_price": f".//div[{has_class('t2')}]",
+        "unit_price": f".//div[{has_class('t1')} and {has_class('with_unit_price')}]//span[{has_class('unit-price')}]",
+        "img_div": f".//div[{has_class('img')}]",
+        "img": ".//img",
+    }
+
+    @staticmethod
+    def quantity(title):
+        match = re.search(r'(\d+(?:[.,]\d+)?)\s*(gab\.|kg|ml|l|g)', title, re.IGNORECASE)
+        if match:
+            return float(match.group(1).replace(',', '.')), match.group(2).lower()
+        return None, None
+
+    @staticmethod
+    def deadline(dates_interval):
+        # data-dates-interval looks like "01.03.2025 - 09.03.2025."
+        if not dates_interval:
+            return None
+        end_date_str = dates_interval.split(' - ')[1].strip('.')
+        return datetime.strptime(end_date_str, '%d.%m.%Y')
+
+    def record(self, item_id, title, price, old_price, unit_price_text, dates_interval, image_url):
+        # Quantity from the title ("..., 500 g"), falling back to the unit price label
+        quantity, unit = self.quantity(title)
+        unit_price = None
+        if quantity is None and unit_price_text:
+            unit_price = parse_number(unit_price_text)
+            unit = unit_price_text.split('/')[-1].strip()
+        return {
+            "product_id": item_id,
+            "name": title,
+            "brand": self.brand(title),
+            "image_url": image_url,
+            "price": price,
+            "old_price": old_price,
+            "quantity": quantity,
+            "unit": unit,
+            "unit_price": unit_price,
+            "discount_deadline": self.deadline(dates_interval),
+        }
+
+    def extract_lxml(self, root, context):
+        xp = self.compiled_xpaths()
+        records = []
+        for item in xp["items"](root):
+            classes = item.get('class', '').split()
+            if 'offer-2-l-pd-sku-lidz' in classes or xp["discount_percents"](item):
+                continue
+            title_elem = lxml_first(xp["title"], item)
+            if title_elem is None:
+                continue
+            title = lxml_text(title_elem).strip()
+
+            price_element = lxml_first(xp["price"], item)
+            if price_element is not None:
+                value = lxml_text(lxml_first(xp["value"], price_element)).strip()
+                cents = lxml_text(lxml_first(xp["cents"], price_element)).strip()
+                price = float(f"{value}.{cents}")
+            else:
+                price = 0.0
+
+            old_price = None
+            old_price_element = lxml_first(xp["old_price"], item)
+            if old_price_element is not None:
+                old_price = parse_number(lxml_text(lxml_first(xp["value"], old_price_element)).strip())
+
+            unit_price_elem = lxml_first(xp["unit_price"], item)
+            unit_price_text = lxml_text(unit_price_elem).strip() if unit_price_elem is not None else None
+
+            records.append(self.record(item.get('data-product-id'), title, price, old_price,
+                                       unit_price_text, item.get('data-dates-interval'),
+                                       self.lxml_img(item)))
+        return records
+
+    def extract_bs4(self, soup, context):
+        records = []
+        for item in soup.find_all('div', class_='item'):
+            classes = item.get('class', [])
+            if 'offer-2-l-pd-sku-lidz' in classes or item.find('div', class_='discount percents'):
+                continue
+            title_elem = item.find('div', class_='title')
+            if not title_elem:
+                continue
+            title = title_elem.text.strip()
+
+            price_element = item.find('div', class_='t1')
+            if price_element:
+                value = price_element.find('span', class_='value').text.strip()
+                cents = price_element.find('span', class_='cents').text.strip()
+                price = float(f"{value}.{cents}")
+            else:
+                price = 0.0
+
+            old_price = None
+            old_price_element = item.find('div', class_='t2')
+            if old_price_element:
+                old_price = parse_number(old_price_element.find('span', class_='value').text.strip())
+
+            unit_price_elem = item.select_one('div.t1.with_unit_price span.unit-price')
+            unit_price_text = unit_price_elem.text.strip() if unit_price_elem else None
+
+            records.append(self.record(item.get('data-product-id'), title, price, old_price,
+                                       unit_price_text, item.get('data-dates-interval'),
+                                       scrape_img(item, self.store)))
+        return records
+
+
+class RimiAdapter(StoreAdapter):
+    """
+    Scrapes the Rimi categories listed in links.txt. All categories are crawled
+    concurrently; once the first page of a category reveals the page count the
+    remaining pages are requested concurrently too. A URL listed under several
+    categories is crawled once, as the first of them.
+    """
+    store = "Rimi"
+    page_size = 100
+
+    xpaths = {
+        "grid": f"//ul[{has_class('product-grid')}]",
+        "items": f".//li[{has_class('product-grid__item')}]",
+        "product": ".//div[@data-product-code]",
+        "card_name": f".//p[{has_class('card__name')}]",
+        "price": f".//div[{has_class('card__price')}]",
+        "old_price": f".//div[{has_class('card__old-price')}]",
+        "price_per": f".//p[{has_class('card__price-per')}]",
+        "span": ".//span",
+        "sup": ".//sup",
+        "img_div": f".//div[{has_class('img')}]",
+        "img": ".//img",
+    }
+
+    def __init__(self, links=None, parser=None):
+        super().__init__(parser)
+        self.links = self.unique_urls(links if links is not None else load_links())
+
+    @staticmethod
+    def unique_urls(links):
+        # Crawled under two categories, a page's products would alternate between them
+        categories = {}
+        for category, url in links:
+            if url in categories:
+                logger.warning("Skipping %s: its URL is already scraped as %s", category, categories[url])
+                continue
+            categories[url] = category
+        return [(category, url) for url, category in categories.items()]
+
+    @staticmethod
+    def page_url(base_url, page):
+        """Returns `base_url` with its currentPage query parameter set to `page`."""
+        parsed = urlparse(base_url)
+        q = parse_qs(parsed.query)
+        q["currentPage"] = [str(page)]
+        return urlunparse((parsed.scheme, parsed.netloc, parsed.path,
+                           parsed.params, urlencode(q, doseq=True), parsed.fragment))
+
+    # Pagination is read with regexes so that the page is only parsed once, by extract()
+    _product_re = re.compile(r'<li[^>]*class="[^"]*\bproduct-grid__item(?=[\s"])')
+    _page_re = re.compile(r'currentPage=(\d+)')
+
+    def product_count(self, html):
+        return len(self._product_re.findall(html))
+
+    def last_page(self, html):
+        pages = [int(page) for page in self._page_re.findall(html)]
+        return max(pages) if pages else None
+
+    @property
+    def checkpoint_key(self):
+        # The scheduler scrapes one category per run
+        return f"{self.store}:{self.links[0][0]}" if len(self.links) == 1 else self.store
+
+    async def fetch_page(self, fetcher, queue, category, base_url, page, walk=False):
+        """
+        Fetches one page of a category into `queue` and returns it, or records it in `failed`.
+        """
+        html = await fetcher.get(self.page_url(base_url, page))
+        if html is None:
+            self.failed.append({"category": category, "url": base_url, "page": page, "walk": walk})
+        else:
+            await queue.put((html, category))
+        return html
+
+    async def crawl_category(self, fetcher, queue, category, base_url):
+        html = await self.fetch_page(fetcher, queue, category, base_url, 1)
+        if html is None or self.product_count(html) < self.page_size:
+            return
+
+        last_page = self.last_page(html)
+        if last_page and last_page > 1:
+            await asyncio.gather(*(self.fetch_page(fetcher, queue, category, base_url, page)
+                                   for page in range(2, last_page + 1)))
+            return
+        await self.walk_category(fetcher, queue, category, base_url, 2)
+
+    async def walk_category(self, fetcher, queue, category, base_url, page):
+        # No pagination links: walk the pages until one comes back short
+        while True:
+            html = await self.fetch_page(fetcher, queue, category, base_url, page, walk=True)
+            if html is None or self.product_count(html) < self.page_size:
+                return
+            page += 1
+
+    def crawls(self, fetcher, queue):
+        """
+        The crawls of this run: every category, or only the pages left over by the last run.
+        """
+        if not self.resume:
+            return [self.crawl_category(fetcher, queue, category, base_url) for category, base_url in self.links]
+        urls = {base_url for _, base_url in self.links}
+        units = [unit for unit in self.resume if unit["url"] in urls]
+        logger.info("Resuming Rimi with %d pages left over by the last run", len(units))
+        crawls = []
+        for unit in units:
+            if unit["page"] == 1:
+                crawls.append(self.crawl_category(fetcher, queue, unit["category"], unit["url"]))
+            elif unit["walk"]:
+                crawls.append(self.walk_category(fetcher, queue, unit["category"], unit["url"], unit["page"]))
+            else:
+                crawls.append(self.fetch_page(fetcher, queue, unit["category"], unit["url"], unit["page"]))
+        return crawls
+
+    async def pages(self, fetcher):
+        queue = asyncio.Queue()
+
+        async def crawl_all():
+            try:
+                await asyncio.gather(*self.crawls(fetcher, queue))
+            finally:
+                await queue.put(None)
+
+        crawler = asyncio.create_task(crawl_all())
+        while (page := await queue.get()) is not None:
+            yield page
+        await crawler
+
+    def search_name(self, title):
+        # Split title at commas and any digit
+        return re.split(r'[,0-9]', title)[0].strip().lower()
+
+    def record(self, product_div, title, price_euros, price_cents, old_price_text,
+               price_per_unit_text, image_url, category):
+        try:
+            price = float(f"{price_euros}.{price_cents}")
+        except (TypeError, ValueError):
+            price = 0.0
+        unit_price = parse_number(price_per_unit_text)
+        return {
+            "product_id": product_div.get('data-product-code') or product_div.get('data-gtms-product-id'),
+            "name": title,
+            "brand": product_div.get("brand"),
+            "image_url": image_url or "",
+            "category": category,
+            "stock": bool(unit_price),
+            "price": price,
+            "old_price": parse_number(old_price_text),
+            "unit": price_per_unit_text.split('/')[-1].strip() if price_per_unit_text else None,
+            "unit_price": unit_price,
+        }
+
+    def extract_lxml(self, root, context):
+        xp = self.compiled_xpaths()
+        grid = lxml_first(xp["grid"], root)
+        li_items = xp["items"](grid) if grid is not None else []
+        logger.info("Found %d products in %s", len(li_items), context)
+        records = []
+        for li in li_items:
+            product_div = lxml_first(xp["product"], li)
+            if product_div is None:
+                continue
+            title = product_div.get("data-gtms-banner-title")
+            if not title:
+                name_elem = lxml_first(xp["card_name"], li)
+                title = lxml_text(name_elem, strip=True) if name_elem is not None else "Unknown"
+
+            price_euros = price_cents = None
+            price_card_elem = lxml_first(xp["price"], product_div)
+            if price_card_elem is not None:
+                price_euros = lxml_text(lxml_first(xp["span"], price_card_elem), strip=True)
+                price_cents = lxml_text(lxml_first(xp["sup"], price_card_elem), strip=True)
+
+            old_price_elem = lxml_first(xp["old_price"], product_div)
+            old_price_text = lxml_text(lxml_first(xp["span"], old_price_elem), strip=True) \
+                if old_price_elem is not None else None
+
+            price_per_unit_elem = lxml_first(xp["price_per"], product_div)
+            price_per_unit_text = lxml_text(price_per_unit_elem, strip=True) \
+                if price_per_unit_elem is not None else None
+
+            records.append(self.record(product_div, title, price_euros, price_cents, old_price_text,
+                                       price_per_unit_text, self.lxml_img(product_div), context))
+        return records
+
+    def extract_bs4(self, soup, context):
+        grid = soup.find('ul', class_='product-grid')
+        li_items = grid.find_all('li', class_='product-grid__item') if grid else []
+        logger.info("Found %d products in %s", len(li_items), context)
+        records = []
+        for li in li_items:
+            product_div = li.find('div', attrs={'data-product-code': True})
+            if not product_div:
+                continue
+            title = product_div.get("data-gtms-banner-title")
+            if not title:
+                name_elem = li.find('p', class_='card__name')
+                title = name_elem.get_text(strip=True) if name_elem else "Unknown"
+
+            price_card_elem = product_div.find('div', class_='card__price')
+            price_euros = price_card_elem.find('span').get_text(strip=True) if price_card_elem else None
+            price_cents = price_card_elem.find('sup').get_text(strip=True) if price_card_elem else None
+
+            old_price_elem = product_div.find('div', class_='card__old-price')
+            old_price_text = old_price_elem.find('span').get_text(strip=True) if old_price_elem else None
+
+            price_per_unit_elem = product_div.find('p', class_='card__price-per')
+            price_per_unit_text = price_per_unit_elem.get_text(strip=True) if price_per_unit_elem else None
+
+            records.append(self.record(product_div, title, price_euros, price_cents, old_price_text,
+                                       price_per_unit_text, scrape_img(product_div, self.store), context))
+        return records
@@ -0,0 +1,9 @@
+"""
+Offline benchmarks for the scraper.
+"""
+
+import os
+
+# app/__init__.py builds the Flask app at import time; give it a local URI so that
+# importing app.* works without network access. Nothing here talks to MongoDB.
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/grocy?serverSelectionTimeoutMS=100")
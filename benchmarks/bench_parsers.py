@@ -0,0 +1,47 @@
+"""
+Compares records/second of the parser backends on the fixture pages and checks
+that every backend extracts exactly the same records.
+
+    python -m benchmarks.bench_parsers [--repeat N]
+"""
+
+import argparse
+import logging
+import time
+
+from benchmarks.fixtures import maxima_pages, rimi_pages
+from app.stores import PARSERS, MaximaAdapter, RimiAdapter, etree
+
+
+def bench(adapter, pages, repeat):
+    records = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        records = [record for html in pages for record in adapter.extract(html, "Benchmark")]
+    elapsed = time.perf_counter() - start
+    return records, len(records) * repeat / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    backends = [name for name in PARSERS if name != "lxml" or etree is not None]
+    stores = [("Maxima", lambda p: MaximaAdapter(parser=p), maxima_pages()),
+              ("Rimi", lambda p: RimiAdapter(links=[], parser=p), rimi_pages())]
+    print(f"{'store':<8}{'parser':<8}{'records':>9}{'records/s':>12}{'speedup':>9}")
+    for store, make_adapter, pages in stores:
+        baseline = None
+        for backend in backends:
+            records, rate = bench(make_adapter(backend), pages, args.repeat)
+            if baseline is None:
+                baseline = (records, rate)
+            elif records != baseline[0]:
+                raise SystemExit(f"{store}: {backend} output differs from {backends[0]}")
+            print(f"{store:<8}{backend:<8}{len(records):>9}{rate:>12.0f}{rate / baseline[1]:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
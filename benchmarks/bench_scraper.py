@@ -0,0 +1,165 @@
+"""
+Replays store pages through parse_maxima_sales and parse_rimi_sales against the
+in-process FakeCollection and reports throughput, Mongo round trips per item,
+peak memory and per-stage timings. Needs no network; run from the repository root:
+
+    python -m benchmarks.bench_scraper [--store Maxima|Rimi] [--pages N]
+
+Every store is run twice on a fresh collection: "cold" inserts everything and
+"warm" replays the same pages over the stored items.
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import ExitStack
+from functools import wraps
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
+
+from tests.fake_mongo import FakeCollection
+from benchmarks.fixtures import maxima_page, recorded_pages, rimi_pages
+import app.scraper as scraper
+from app.models import Item, PriceHistory
+from app.stores import MaximaAdapter, RimiAdapter, load_links
+
+
+class ReplayFetcher:
+    """Stands in for app.fetcher.Fetcher, serving pages from `resolve(url)`."""
+
+    def __init__(self, resolve):
+        self.resolve = resolve
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def get(self, url):
+        await asyncio.sleep(0)
+        return self.resolve(url)
+
+
+def maxima_resolver(pages_per_category, catalogue=2000):
+    recorded = recorded_pages("maxima")
+    if recorded:
+        # A recorded response cannot be paged; serve it whole as the first page
+        return lambda url: recorded[0] if parse_qs(urlparse(url).query).get("offset", ["0"]) == ["0"] else None
+
+    def resolve(url):
+        query = parse_qs(urlparse(url).query)
+        limit, offset = int(query["limit"][0]), int(query.get("offset", ["0"])[0])
+        return maxima_page(count=max(0, min(limit, catalogue - offset)), offset=offset)
+    return resolve
+
+
+def rimi_resolver(pages_per_category):
+    categories = {urlparse(base_url).path: index for index, (_, base_url) in enumerate(load_links())}
+    cache = {}
+
+    def resolve(url):
+        parsed = urlparse(url)
+        index = categories.get(parsed.path)
+        if index is None:
+            return None
+        if index not in cache:
+            cache[index] = rimi_pages(pages_per_category, seed=index + 1)
+        page = int(parse_qs(parsed.query).get("currentPage", ["1"])[0])
+        pages = cache[index]
+        return pages[(page - 1) % len(pages)] if page <= max(len(pages), pages_per_category) else None
+    return resolve
+
+
+STORES = {
+    "Maxima": (scraper.parse_maxima_sales, MaximaAdapter, maxima_resolver),
+    "Rimi": (scraper.parse_rimi_sales, RimiAdapter, rimi_resolver),
+}
+
+
+class StageTimer:
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    def wrap(self, stage, func):
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.seconds[stage] += time.perf_counter() - start
+        return timed
+
+    def wrap_async(self, stage, func):
+        @wraps(func)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.seconds[stage] += time.perf_counter() - start
+        return timed
+
+
+def run(store, collection, history, pages_per_category, timer=None):
+    """
+    Runs one scrape of `store` against the `collection` and `history` fakes and
+    returns the writer summary.
+    """
+    parse, adapter_cls, make_resolver = STORES[store]
+    fetcher = ReplayFetcher(make_resolver(pages_per_category))
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(Item, "collection", lambda: collection))
+        stack.enter_context(mock.patch.object(PriceHistory, "collection", lambda: history))
+        stack.enter_context(mock.patch.object(scraper, "Fetcher", lambda: fetcher))
+        if timer:
+            stack.enter_context(mock.patch.object(fetcher, "get", timer.wrap_async("fetch", fetcher.get)))
+            for stage, owner, name in [("extract", adapter_cls, "extract"),
+                                       ("normalize", adapter_cls, "normalize"),
+                                       ("fingerprint", scraper, "content_hash"),
+                                       ("prefetch", Item, "scrape_state"),
+                                       ("bulk_write", Item, "bulk_write"),
+                                       ("history", PriceHistory, "record")]:
+                stack.enter_context(mock.patch.object(owner, name, timer.wrap(stage, getattr(owner, name))))
+        return parse()
+
+
+def report(store, label, summary, elapsed, ops, peak, stages):
+    items = sum(summary.values())
+    stage_text = "  ".join(f"{stage}={seconds * 1000:.0f}ms" for stage, seconds in stages.items())
+    print(f"{store:<7}{label:<6}{items:>7}{items / elapsed:>10.0f}{ops:>6}{ops / max(items, 1):>9.4f}"
+          f"{peak / 2**20:>9.1f}  {summary}")
+    print(f"{'':13}{stage_text}  other={max(elapsed - sum(stages.values()), 0) * 1000:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", choices=sorted(STORES), action="append")
+    parser.add_argument("--pages", type=int, default=3, help="pages per Rimi category")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    print(f"{'store':<7}{'run':<6}{'items':>7}{'items/s':>10}{'ops':>6}{'ops/item':>9}{'peak MB':>9}  summary")
+    for store in args.store or sorted(STORES):
+        collection, history = FakeCollection(), FakeCollection()
+        for label in ("cold", "warm"):
+            if label == "cold":
+                # Peak memory is measured on its own run since tracemalloc slows everything down
+                tracemalloc.start()
+                run(store, FakeCollection(), FakeCollection(), args.pages)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            timer = StageTimer()
+            ops_before = collection.ops + history.ops
+            start = time.perf_counter()
+            summary = run(store, collection, history, args.pages, timer)
+            elapsed = time.perf_counter() - start
+            report(store, label, summary, elapsed, collection.ops + history.ops - ops_before, peak, timer.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Search latency (p50/p99) of the search backends.
+
+The local backend is measured over the fixture pages loaded into a FakeCollection.
+With --atlas the same queries also run through the Atlas `$search` path against
+the items collection of MONGO_URI, which has to be an Atlas cluster with the
+`search_name` index.
+
+    python -m benchmarks.bench_search [--queries N] [--atlas]
+"""
+
+import argparse
+import logging
+import os
+import random
+import statistics
+import time
+from unittest import mock
+
+from tests.fake_mongo import FakeCollection
+from benchmarks.fixtures import maxima_pages, rimi_pages
+from app.models import Item
+from app.search import AtlasSearch, LocalSearch
+from app.stores import MaximaAdapter, RimiAdapter
+
+
+def load_items(collection):
+    for adapter, pages in ((MaximaAdapter(), maxima_pages()), (RimiAdapter(links=[]), rimi_pages())):
+        for html in pages:
+            for record in adapter.extract(html, "Benchmark"):
+                collection.insert_one(adapter.normalize(record))
+
+
+def make_queries(collection, count, seed=1):
+    # Real words from the catalogue, half of them with a typo
+    rng = random.Random(seed)
+    words = sorted({word for doc in collection.data.values() for word in doc["search_name"].split() if len(word) > 3})
+    queries = []
+    for _ in range(count):
+        word = rng.choice(words)
+        if rng.random() < 0.5:
+            i = rng.randrange(len(word))
+            word = word[:i] + word[i + 1:]
+        queries.append(word)
+    return queries
+
+
+def measure(backend, queries, filters=None):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        backend.search(query, filters)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50": statistics.median(timings),
+        "p99": timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+        "mean": statistics.fmean(timings),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--atlas", action="store_true", help="also time Atlas $search on MONGO_URI")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    collection = FakeCollection()
+    load_items(collection)
+    queries = make_queries(collection, args.queries)
+    print(f"{len(collection.data)} items, {len(queries)} queries")
+    print(f"{'backend':<10}{'filters':<10}{'p50 ms':>9}{'p99 ms':>9}{'mean ms':>9}")
+
+    runs = []
+    with mock.patch.object(Item, "collection", lambda: collection):
+        local = LocalSearch()
+        start = time.perf_counter()
+        local.load()
+        print(f"local index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+        runs.append(("local", local, collection))
+    if args.atlas:
+        from pymongo import MongoClient
+        atlas_collection = MongoClient(os.environ["MONGO_URI"]).get_default_database().items
+        runs.append(("atlas", AtlasSearch(), atlas_collection))
+
+    for name, backend, items in runs:
+        with mock.patch.object(Item, "collection", lambda: items):
+            for label, filters in (("none", None), ("store", {"store": "Rimi", "stock": True})):
+                stats = measure(backend, queries, filters)
+                print(f"{name:<10}{label:<10}{stats['p50']:>9.2f}{stats['p99']:>9.2f}{stats['mean']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
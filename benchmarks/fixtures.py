@@ -0,0 +1,90 @@
+"""
+Store pages for the offline benchmarks.
+Recorded pages saved under benchmarks/pages/ as maxima*.html and rimi*.html are used
+when present; otherwise pages with the same markup are generated.
+"""
+
+import random
+from pathlib import Path
+
+PAGES_DIR = Path(__file__).parent / "pages"
+
+WORDS = ["piens", "siers", "jogurts", "maize", "kafija", "sula", "vistas fileja", "ābolu",
+         "tomāti", "šokolāde", "makaroni", "rīsi", "cepumi", "kefīrs", "desa", "lasis"]
+BRANDS = ["VALIO", "RIMI", "TIGRA", "LAIMA", "SMILTENES PIENS", "DOBELE", ""]
+QUANTITIES = ["500 g", "1 kg", "0,4 kg", "1 l", "330 ml", "10 gab.", ""]
+
+
+def maxima_item(rng, product_id):
+    name = rng.choice(WORDS).capitalize()
+    brand = rng.choice(BRANDS)
+    quantity = rng.choice(QUANTITIES)
+    title = ", ".join(part for part in (f"{name} {brand}".strip(), quantity) if part)
+    price = rng.randint(50, 1500)
+    old_price = price + rng.randint(10, 400) if rng.random() < 0.8 else None
+    classes = "item offer-2-l-pd-sku-lidz" if rng.random() < 0.05 else "item"
+    old_price_html = f'<div class="t2"><span class="value">{old_price // 100},{old_price % 100:02d}</span></div>' \
+        if old_price else ""
+    return f"""
+<div class="{classes}" data-product-id="{product_id}" data-dates-interval="01.03.2025 - {rng.randint(1, 28):02d}.04.2025.">
+  <div class="img"><img src="/images/products/{product_id}.png?w=300&amp;h=300"></div>
+  <div class="title">{title}</div>
+  <div class="t1 with_unit_price">
+    <span class="value">{price // 100}</span><span class="cents">{price % 100:02d}</span>
+    <span class="unit-price">{price / 50:.2f} €/kg</span>
+  </div>
+  {old_price_html}
+</div>"""
+
+
+def maxima_page(count=2000, seed=1, offset=0):
+    """A salesloadmore?limit=<count>&offset=<offset> response."""
+    rng = random.Random(seed * 1000003 + offset)
+    return "<div class=\"items\">" + "".join(maxima_item(rng, 100000 + offset + i) for i in range(count)) + "</div>"
+
+
+def rimi_item(rng, product_id):
+    name = rng.choice(WORDS).capitalize()
+    price = rng.randint(50, 1500)
+    old_price = price + rng.randint(10, 400) if rng.random() < 0.5 else None
+    unit = rng.choice(["kg", "l", "gab."])
+    old_price_html = f'<div class="card__old-price"><span>{old_price // 100},{old_price % 100:02d}€</span></div>' \
+        if old_price else ""
+    return f"""
+<li class="product-grid__item">
+  <div class="js-product-container card -horizontal-for-mobile" data-product-code="{product_id}"
+       data-gtms-product-id="{product_id}" data-gtms-banner-title="{name} {rng.choice(QUANTITIES)}">
+    <div class="card__image-wrapper"><div class="img">
+      <img src="https://rimibaltic-res.cloudinary.com/image/upload/{product_id}.png?w=200" alt="">
+    </div></div>
+    <div class="card__details">
+      <p class="card__name">{name}</p>
+      <div class="price-tag card__price"><span>{price // 100}</span><div><sup>{price % 100:02d}</sup><sub>€/gab.</sub></div></div>
+      {old_price_html}
+      <p class="card__price-per">{price / 70:.2f} €/{unit}</p>
+    </div>
+  </div>
+</li>"""
+
+
+def rimi_page(count=100, page=1, last_page=1, seed=1):
+    """A category page with `count` products and pagination up to `last_page`."""
+    rng = random.Random(seed * 1000 + page)
+    cards = "".join(rimi_item(rng, f"{seed:02d}{page:03d}{i:04d}") for i in range(count))
+    pagination = "".join(f'<li><a href="?currentPage={p}&amp;pageSize=100">{p}</a></li>'
+                         for p in range(1, last_page + 1))
+    return f'<html><body><ul class="product-grid">{cards}</ul><ul class="pagination">{pagination}</ul></body></html>'
+
+
+def recorded_pages(store):
+    """Recorded pages for `store` ("maxima" or "rimi"), or an empty list."""
+    return [path.read_text(encoding="utf-8") for path in sorted(PAGES_DIR.glob(f"{store}*.html"))]
+
+
+def maxima_pages():
+    return recorded_pages("maxima") or [maxima_page()]
+
+
+def rimi_pages(pages=5, seed=1):
+    return recorded_pages("rimi") or [rimi_page(100 if p < pages else 37, p, pages, seed)
+                                      for p in range(1, pages + 1)]
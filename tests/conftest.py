@@ -0,0 +1,39 @@
+import os
+
+# app/__init__.py builds the Flask app at import time; nothing in the tests talks to MongoDB
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/grocy?serverSelectionTimeoutMS=100")
+
+import pytest  # noqa: E402
+from app import cache, search  # noqa: E402
+from app.models import Item, PriceHistory, JobRun  # noqa: E402
+from fake_mongo import FakeCollection  # noqa: E402
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # The caches are module-level; start every test cold
+    cache.clear_all()
+    for each in cache.CACHES.values():
+        each.hits = each.misses = each.evictions = 0
+    cache.data_version.version = None
+    cache.data_version.reset()
+    search.set_backend(None)
+    yield
+    cache.clear_all()
+    search.set_backend(None)
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """
+    The items collection, a FakeCollection; the other collections are the ones of its
+    FakeDatabase. create_app does not create indexes.
+    """
+    fake_collection = FakeCollection()
+    monkeypatch.setattr(Item, "collection", lambda: fake_collection)
+    monkeypatch.setattr(Item, "init_collection", lambda: None)
+    monkeypatch.setattr(PriceHistory, "init_collection", lambda: None)
+    monkeypatch.setattr(JobRun, "init_collection", lambda: None)
+    return fake_collection
+
+@pytest.fixture
+def fake_history(fake_db):
+    return PriceHistory.collection()
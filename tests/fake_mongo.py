@@ -0,0 +1,278 @@
+"""
+In-process stand-in for a pymongo collection, used by the tests and the benchmarks.
+It understands the subset of queries and updates the app sends and counts every
+call that would be a round trip to MongoDB.
+"""
+
+import copy
+from collections import Counter
+from bson.objectid import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.models import utcnow
+
+
+def _get_path(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+def _set_path(doc, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+def _matches(doc, query):
+    for key, cond in query.items():
+        if key == "$or":
+            if not any(_matches(doc, sub) for sub in cond):
+                return False
+            continue
+        value = _get_path(doc, key)
+        if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            for op, arg in cond.items():
+                # On an array field, $in and $nin look at its elements
+                values = value if isinstance(value, list) else [value]
+                if op == "$in" and not any(each in arg for each in values):
+                    return False
+                if op == "$nin" and any(each in arg for each in values):
+                    return False
+                if op == "$ne" and value == arg:
+                    return False
+                if op == "$exists" and (value is not None) != bool(arg):
+                    return False
+                if op in ("$gt", "$gte", "$lt", "$lte"):
+                    if value is None:
+                        return False
+                    if op == "$gt" and not value > arg:
+                        return False
+                    if op == "$gte" and not value >= arg:
+                        return False
+                    if op == "$lt" and not value < arg:
+                        return False
+                    if op == "$lte" and not value <= arg:
+                        return False
+        elif isinstance(value, list) and not isinstance(cond, list):
+            # Like MongoDB, a scalar matches an array containing it
+            if cond not in value:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    if not any(include for path, include in projection.items() if path != "_id"):
+        # Exclusion projection
+        result = copy.deepcopy(doc)
+        for path in projection:
+            result.pop(path, None)
+        return result
+    result = {"_id": doc.get("_id")} if projection.get("_id", 1) else {}
+    for path, include in projection.items():
+        if path == "_id" or not include:
+            continue
+        value = _get_path(doc, path)
+        if value is not None:
+            _set_path(result, path, copy.deepcopy(value))
+    return result
+
+
+class FakeCursor(list):
+    """The list returned by FakeCollection.find, with pymongo's cursor modifiers."""
+
+    def sort(self, key, direction=1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        docs = list(self)
+        for path, order in reversed(keys):
+            docs.sort(key=lambda doc: (_get_path(doc, path) is not None, _get_path(doc, path)),
+                      reverse=order < 0)
+        return FakeCursor(docs)
+
+    def skip(self, count):
+        return FakeCursor(self[count:])
+
+    def limit(self, count):
+        return FakeCursor(self[:count] if count else self)
+
+
+class FakeCollection:
+    def __init__(self, database=None):
+        self.database = database if database is not None else FakeDatabase()
+        self.data = {}
+        self.calls = Counter()
+        # (store, product_id) -> _id, standing in for the unique index
+        self._keys = {}
+
+    @property
+    def ops(self):
+        return sum(self.calls.values())
+
+    def _store(self, doc):
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self.data:
+            raise DuplicateKeyError(f"E11000 duplicate key error _id: {doc['_id']}")
+        self.data[doc["_id"]] = doc
+        self._keys.setdefault((doc.get("store"), doc.get("product_id")), doc["_id"])
+
+    def _remove(self, _id):
+        doc = self.data.pop(_id)
+        key = (doc.get("store"), doc.get("product_id"))
+        if self._keys.get(key) == _id:
+            del self._keys[key]
+            for other in self.data.values():
+                if (other.get("store"), other.get("product_id")) == key:
+                    self._keys[key] = other["_id"]
+                    break
+
+    def _find_ref(self, query):
+        if set(query) == {"_id"} and not isinstance(query["_id"], dict):
+            return self.data.get(query["_id"])
+        if set(query) == {"store", "product_id"} and not any(isinstance(v, dict) for v in query.values()):
+            _id = self._keys.get((query["store"], query["product_id"]))
+            return self.data.get(_id)
+        for doc in self.data.values():
+            if _matches(doc, query):
+                return doc
+        return None
+
+    def find(self, query=None, projection=None, *args, **kwargs):
+        self.calls["find"] += 1
+        return FakeCursor(_project(doc, projection) for doc in self.data.values() if _matches(doc, query or {}))
+
+    def find_one(self, query, projection=None):
+        self.calls["find_one"] += 1
+        doc = self._find_ref(query)
+        return _project(doc, projection) if doc is not None else None
+
+    def insert_one(self, data):
+        self.calls["insert_one"] += 1
+        data.setdefault("_id", ObjectId())
+        self._store(copy.deepcopy(data))
+        class Result:
+            inserted_id = data["_id"]
+        return Result()
+
+    def insert_many(self, documents, ordered=True):
+        self.calls["insert_many"] += 1
+        for doc in documents:
+            doc.setdefault("_id", ObjectId())
+            self._store(copy.deepcopy(doc))
+
+    def _apply_update(self, doc, update_doc):
+        for k, v in update_doc.get("$set", {}).items():
+            _set_path(doc, k, copy.deepcopy(v))
+        for k in update_doc.get("$currentDate", {}):
+            _set_path(doc, k, utcnow())
+        for k, v in update_doc.get("$inc", {}).items():
+            _set_path(doc, k, (_get_path(doc, k) or 0) + v)
+
+    def _update(self, query, update_doc, upsert=False):
+        """Applies an update and returns (matched, upserted)."""
+        doc = self._find_ref(query)
+        if doc is not None:
+            self._apply_update(doc, update_doc)
+            return True, False
+        if upsert:
+            doc = {k: copy.deepcopy(v) for k, v in query.items() if not k.startswith("$")}
+            for k, v in update_doc.get("$setOnInsert", {}).items():
+                _set_path(doc, k, copy.deepcopy(v))
+            self._apply_update(doc, update_doc)
+            self._store(doc)
+            return False, True
+        return False, False
+
+    def update_one(self, query, update_doc, upsert=False):
+        self.calls["update_one"] += 1
+        self._update(query, update_doc, upsert)
+
+    def find_one_and_update(self, query, update_doc, projection=None, upsert=False, return_document=False):
+        self.calls["find_one_and_update"] += 1
+        doc = self._find_ref(query)
+        before = copy.deepcopy(doc)
+        self._update(query, update_doc, upsert)
+        if return_document:  # ReturnDocument.AFTER
+            doc = self._find_ref({"_id": doc["_id"]}) if doc is not None else self._find_ref(query)
+            return _project(doc, projection) if doc is not None else None
+        return _project(before, projection) if before is not None else None
+
+    def delete_one(self, query):
+        self.calls["delete_one"] += 1
+        doc = self._find_ref(query)
+        if doc is not None:
+            self._remove(doc["_id"])
+
+    def delete_many(self, query):
+        self.calls["delete_many"] += 1
+        ids = [doc["_id"] for doc in self.data.values() if _matches(doc, query)]
+        for _id in ids:
+            self._remove(_id)
+        class Result:
+            deleted_count = len(ids)
+        return Result()
+
+    def bulk_write(self, requests, ordered=True):
+        self.calls["bulk_write"] += 1
+        inserted = modified = 0
+        for request in requests:
+            if isinstance(request, InsertOne):
+                request._doc.setdefault("_id", ObjectId())
+                self._store(copy.deepcopy(request._doc))
+                inserted += 1
+            elif isinstance(request, UpdateOne):
+                matched, upserted = self._update(request._filter, request._doc, upsert=request._upsert)
+                modified += int(matched)
+                inserted += int(upserted)
+        class Result:
+            inserted_count = inserted
+            modified_count = modified
+        return Result()
+
+    def aggregate(self, pipeline, **kwargs):
+        self.calls["aggregate"] += 1
+        return list(self.data.values())
+
+    def distinct(self, key, query=None):
+        self.calls["distinct"] += 1
+        values = []
+        for doc in self.data.values():
+            value = _get_path(doc, key)
+            if _matches(doc, query or {}) and value is not None and value not in values:
+                values.append(value)
+        return values
+
+    def create_index(self, keys, **kwargs):
+        self.calls["create_index"] += 1
+        return kwargs.get("name")
+
+    def estimated_document_count(self):
+        self.calls["estimated_document_count"] += 1
+        return len(self.data)
+
+    def count_documents(self, query):
+        self.calls["count_documents"] += 1
+        return sum(1 for doc in self.data.values() if _matches(doc, query))
+
+
+class FakeDatabase:
+    """Hands out a FakeCollection per attribute or item name, like pymongo's Database."""
+
+    def __init__(self):
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(database=self)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def list_collection_names(self):
+        return list(self._collections)
@@ -0,0 +1,91 @@
+"""
+Item documents, store pages and scraper stand-ins shared by the test modules.
+"""
+
+from datetime import datetime
+from app.stores import content_hash
+
+def make_item(product_id, price=1.0, deadline=None, store="Maxima"):
+    now = datetime.utcnow()
+    return {
+        "content_hash": content_hash({"product_id": product_id, "price": price, "deadline": deadline}),
+        "name": f"Product {product_id}",
+        "product_id": product_id,
+        "description": "",
+        "search_name": f"product {product_id}",
+        "image_url": "",
+        "store": store,
+        "category": None,
+        "stock": True,
+        "unit": "g",
+        "quantity": 500,
+        "brand": "Brand",
+        "price": {
+            "value": price,
+            "old_value": price,
+            "discount": 0,
+            "currency": "EUR",
+            "price_per_unit": round(price / 0.5, 2)
+        },
+        "time": {
+            "created": now,
+            "updated": now,
+            "discount_deadline": deadline
+        }
+    }
+
+def named(product_id, search_name, **fields):
+    item = make_item(product_id, **fields)
+    item["search_name"] = search_name
+    return item
+
+def rimi_page(product_ids, last_page=None):
+    cards = "".join(f"""
+        <li class="product-grid__item">
+          <div data-product-code="{product_id}" data-gtms-banner-title="Piens {product_id}, 1l">
+            <div class="img"><img src="https://rimi.example/{product_id}.png?w=200"></div>
+            <div class="card__price"><span>1</span><sup>29</sup></div>
+            <div class="card__old-price"><span>1,59€</span></div>
+            <p class="card__price-per">1,29 €/l</p>
+          </div>
+        </li>""" for product_id in product_ids)
+    pagination = ""
+    if last_page:
+        pagination = "".join(f'<li><a href="?currentPage={page}&pageSize=100">{page}</a></li>'
+                             for page in range(1, last_page + 1))
+    return f'<ul class="product-grid">{cards}</ul><ul class="pagination">{pagination}</ul>'
+
+MAXIMA_PAGE = """
+<div class="item" data-product-id="777" data-dates-interval="01.03.2025 - 09.03.2025.">
+  <div class="img"><img src="/images/777.png?v=1"></div>
+  <div class="title">Jogurts VALIO dabīgais, 0,4 kg</div>
+  <div class="t1 with_unit_price"><span class="value">1</span><span class="cents">99</span>
+    <span class="unit-price">4,98 €/kg</span></div>
+  <div class="t2"><span class="value">2,49</span></div>
+</div>
+<div class="item offer-2-l-pd-sku-lidz" data-product-id="778">
+  <div class="title">Skipped</div>
+</div>
+"""
+
+class FakeFetcher:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+    async def get(self, url):
+        self.requested.append(url)
+        return self.pages.get(url)
+    async def __aenter__(self):
+        return self
+    async def __aexit__(self, *exc_info):
+        pass
+
+class ListWriter:
+    def __init__(self):
+        self.items = []
+    def is_unchanged(self, product_id, content_hash):
+        return False
+    def add(self, new_item):
+        self.items.append(new_item)
+    def flush(self):
+        return {"inserted": len(self.items), "updated": 0, "unchanged": 0}
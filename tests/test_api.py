@@ -0,0 +1,61 @@
+import gzip
+import json
+import pytest
+from app import create_app, search
+from app.api import decode_cursor
+from app.models import Item
+from app.search import LocalSearch
+from helpers import make_item
+
+@pytest.fixture
+def client(fake_db):
+    search.set_backend(LocalSearch(interval=0))
+    for i, price in enumerate([1.5, 0.5, 2.5, 1.0, 3.0]):
+        item = make_item(str(i), price=price, store="Rimi" if i % 2 else "Maxima")
+        item["search_name"] = f"piens {i}"
+        item["price"]["old_value"] = 4.0
+        item["price"]["discount"] = round((4.0 - price) / 4.0 * 100)
+        Item.create(item)
+    return create_app({"TESTING": True}).test_client()
+
+def pages(client, url):
+    """Follows next_cursor through every page, returning the product ids per page."""
+    result = []
+    while url:
+        body = client.get(url).get_json()
+        result.append([item["product_id"] for item in body["items"]])
+        url = body["next_cursor"] and f"{url.split('&cursor=')[0]}&cursor={body['next_cursor']}"
+    return result
+
+def test_sorted_cursor_pagination(client):
+    assert pages(client, "/api/v1/search?query=piens&sort=price&limit=2") == [["1", "3"], ["0", "2"], ["4"]]
+    assert pages(client, "/api/v1/search?query=piens&sort=price&order=desc&limit=3") == [["4", "2", "0"], ["3", "1"]]
+    assert pages(client, "/api/v1/search?query=piens&sort=discount&limit=5") == [["1", "3", "0", "2", "4"]]
+    relevance = pages(client, "/api/v1/search?query=piens&limit=2")
+    assert sorted(sum(relevance, [])) == ["0", "1", "2", "3", "4"]
+
+def test_projection_and_filters(client):
+    body = client.get("/api/v1/search?query=piens&store=Rimi&sort=price_per_unit").get_json()
+    assert [item["product_id"] for item in body["items"]] == ["1", "3"]
+    assert set(body["items"][0]) == {"id", "name", "product_id", "store", "category", "brand", "image_url",
+                                     "quantity", "unit", "stock", "price", "old_price", "discount",
+                                     "price_per_unit", "discount_deadline"}
+
+def test_etag_and_compression(client):
+    url = "/api/v1/search?query=piens&limit=5"
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert len(json.loads(gzip.decompress(response.data))["items"]) == 5
+    etag = response.headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert "Content-Encoding" not in client.get(url).headers
+
+def test_bad_requests(client):
+    assert client.get("/api/v1/search").status_code == 400
+    assert client.get("/api/v1/search?query=piens&sort=name").status_code == 400
+    cursor = client.get("/api/v1/search?query=piens&sort=price&limit=1").get_json()["next_cursor"]
+    assert decode_cursor(cursor)["sort"] == ["price", None]
+    response = client.get(f"/api/v1/search?query=piens&sort=discount&cursor={cursor}")
+    assert response.status_code == 400 and "error" in response.get_json()
+    assert client.get("/api/v1/search?query=piens&cursor=%%%").status_code == 400
@@ -0,0 +1,56 @@
+import pytest
+from flask import Flask
+from app import cache
+from app.cache import TTLCache
+from app.models import Item
+
+pytestmark = pytest.mark.usefixtures("fake_db")
+
+def test_ttl_cache_evicts_least_recently_used():
+    lru = TTLCache("test-lru", maxsize=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1 and lru.get("c") == 3
+    assert lru.stats()["evictions"] == 1
+    assert (lru.hits, lru.misses) == (3, 1)
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: clock[0])
+    ttl = TTLCache("test-ttl", maxsize=8, ttl=10)
+    ttl.set("key", "value")
+    clock[0] += 9
+    assert ttl.get("key") == "value"
+    clock[0] += 2
+    assert ttl.get("key") is None
+    assert ttl.stats()["size"] == 0
+
+def test_search_results_cached_until_data_version_changes(fake_db, monkeypatch):
+    Flask("test_app").app_context().push()
+    calls = []
+    monkeypatch.setattr(fake_db, "aggregate", lambda pipeline: calls.append(pipeline) or [{"name": "Piens"}])
+
+    assert Item.search_by_name("Piens", {"store": "Rimi"}) == [{"name": "Piens"}]
+    assert Item.search_by_name("  piens ", {"store": "Rimi"}) == [{"name": "Piens"}]
+    assert len(calls) == 1
+    Item.search_by_name("piens", {"store": "Maxima"})
+    assert len(calls) == 2
+
+    # Another worker committed a scrape run: the version check drops the cache
+    fake_db.database.meta.update_one({"_id": "items"}, {"$inc": {"version": 1}}, upsert=True)
+    cache.data_version.reset()
+    Item.search_by_name("piens", {"store": "Rimi"})
+    assert len(calls) == 3
+    assert cache.stats()["search"]["hits"] == 1
+
+def test_metadata_cached_and_cleared_on_bump(fake_db):
+    fake_db.insert_one({"store": "Rimi", "product_id": "1"})
+    assert Item.stores() == ["Rimi"]
+    fake_db.insert_one({"store": "Maxima", "product_id": "2"})
+    assert Item.stores() == ["Rimi"]
+    Item.bump_data_version()
+    assert Item.stores() == ["Maxima", "Rimi"]
+    assert Item.count() == 2
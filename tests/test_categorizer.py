@@ -0,0 +1,49 @@
+from app.categorizer import Categorizer, KeywordMatcher, load_category_keywords
+from app.scraper import categorize_maxima_items
+import pytest
+
+pytestmark = pytest.mark.usefixtures("fake_db")
+
+def first_keyword_category(keywords, name):
+    # The per-keyword loop the matcher replaces
+    for category, words in keywords.items():
+        if any(word in name.lower() for word in words):
+            return category
+    return None
+
+def test_keyword_matcher_agrees_with_keyword_loop():
+    keywords = load_category_keywords()
+    matcher = KeywordMatcher(keywords)
+    names = ["Piens 2,5%, 1l", "Siers feta 200g", "Saldēta vistas fileja", "Kaķu barība ar lasi",
+             "Rudzu maize", "Sarkanvīns", "Zobu pasta", "Nekas neatbilst"]
+    for name in names:
+        assert matcher.match(name) == first_keyword_category(keywords, name)
+
+def test_keyword_file_merges_repeated_categories():
+    keywords = load_category_keywords()
+    assert "ābols" in keywords["Fruits&Vegetables"]
+    assert "tomāts" in keywords["Fruits&Vegetables"]
+
+def test_similarity_falls_back_to_labelled_items():
+    categorizer = Categorizer({}, [("griķu putraimi", "Packaged-Food"), ("griķi", "Packaged-Food"),
+                                   ("zemeņu saldējums", "Frozen-Products")])
+    assert categorizer.categorize("Griķu pārslas") == "Packaged-Food"
+    assert categorizer.categorize("xyz") is None
+
+def test_categorize_maxima_items_only_revisits_stale_items(fake_db, monkeypatch):
+    fake_db.insert_one({"store": "Rimi", "name": "Griķi", "search_name": "griķi", "category": "Packaged-Food"})
+    for name in ("Piens 1l", "Griķi tvaicēti", "Nezināms"):
+        fake_db.insert_one({"store": "Maxima", "name": name, "search_name": name.lower(), "category": None})
+    fake_db.insert_one({"store": "Maxima", "name": "Maize", "search_name": "maize", "category": "Breads"})
+
+    assert categorize_maxima_items() == 4
+    assert fake_db.calls["bulk_write"] == 1
+    categories = {doc["name"]: doc["category"] for doc in fake_db.data.values() if doc["store"] == "Maxima"}
+    assert categories == {"Piens 1l": "Beverages", "Griķi tvaicēti": "Packaged-Food",
+                          "Nezināms": None, "Maize": "Breads"}
+
+    # Nothing left until the keyword file changes
+    assert categorize_maxima_items() == 0
+    monkeypatch.setattr("app.categorizer.load_category_keywords", lambda path: {"Dairy": ["piens"]})
+    assert categorize_maxima_items() == 4
+    assert fake_db.find_one({"name": "Piens 1l"})["category"] == "Dairy"
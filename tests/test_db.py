@@ -0,0 +1,30 @@
+from app import app, db, metrics
+from app.models import Item, PriceHistory
+from app.scraper import scrape_store
+from app.stores import MaximaAdapter
+from fake_mongo import FakeDatabase
+from helpers import FakeFetcher, MAXIMA_PAGE
+
+def test_client_options_from_environment(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "8")
+    monkeypatch.setenv("MONGO_WRITE_CONCERN", "majority")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zstd,zlib")
+    assert db.client_options()["event_listeners"] == [metrics.command_listener]
+    monkeypatch.setenv("MONGO_COMMAND_METRICS", "0")
+    assert db.client_options() == {"maxPoolSize": 8, "w": "majority", "compressors": "zstd,zlib"}
+    monkeypatch.setenv("MONGO_WRITE_CONCERN", "1")
+    monkeypatch.delenv("MONGO_COMPRESSORS")
+    assert db.client_options() == {"maxPoolSize": 8, "w": 1}
+
+def test_app_client_is_shared():
+    assert db.get_client() is app.mongo.cx
+
+def test_scrape_store_uses_injected_database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr("app.scraper.Fetcher", lambda: FakeFetcher({MaximaAdapter().page_url(0): MAXIMA_PAGE}))
+    assert scrape_store(MaximaAdapter(), database=database)["inserted"] == 1
+    assert [doc["product_id"] for doc in database.items.data.values()] == ["777"]
+    assert len(database.price_history.data) == 1
+    with db.bind(database):
+        assert Item.collection() is database.items
+        assert PriceHistory.collection() is database.price_history
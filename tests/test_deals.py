@@ -0,0 +1,63 @@
+import pytest
+from datetime import timedelta
+from app import create_app, deals
+from app.models import Deals
+from app.scraper import scrape_store
+from app.stores import MaximaAdapter
+from helpers import FakeFetcher, MAXIMA_PAGE, make_item
+
+pytestmark = pytest.mark.usefixtures("fake_db")
+
+def row(product_id, discount=0, deadline=None, category="Piena produkti", **fields):
+    item = make_item(product_id, price=1.0 - discount / 100, deadline=deadline, **fields)
+    item.update(category=category, name=f"Deal {product_id}")
+    item["price"]["discount"] = discount
+    return item
+
+def test_rebuild_merges_ranked_lists_and_drops_stale_rows(fake_db, monkeypatch):
+    # The fake cannot run the pipelines; stand in for $merge with one row per target
+    pipelines = []
+    def aggregate(pipeline, **kwargs):
+        pipelines.append(pipeline)
+        merge, project = pipeline[-1]["$merge"], pipeline[-2]["$project"]
+        Deals.collection(merge["into"]).insert_one({"_id": len(pipelines), "built": project["built"]["$literal"]})
+    monkeypatch.setattr(fake_db, "aggregate", aggregate)
+    Deals.collection("top_discounts").insert_one({"_id": "stale", "built": Deals.today()})
+    # Rows of a concurrent, later build are kept
+    Deals.collection("top_discounts").insert_one({"_id": "newer", "built": Deals.today() + timedelta(days=1)})
+
+    assert deals.rebuild() == {"top_discounts": 2, "cheapest_per_unit": 1, "expiring_deals": 1}
+    assert Deals.collection("top_discounts").find_one({"_id": "stale"}) is None
+    assert Deals.collection("top_discounts").find_one({"_id": "newer"})
+    assert [pipeline[-1]["$merge"]["into"] for pipeline in pipelines] == list(Deals.COLLECTIONS)
+    window = pipelines[2][0]["$match"]["time.discount_deadline"]
+    assert window["$lt"] - window["$gte"] == timedelta(days=deals.expiring_days() + 1)
+    assert all(pipeline[1]["$setWindowFields"]["output"] == {"rank": {"$documentNumber": {}}}
+               for pipeline in pipelines)
+
+def test_deal_routes_and_home_page_read_the_lists():
+    today = Deals.today()
+    for item in [row("1", 30, store="Rimi"), row("2", 50), row("3", 10, category="Maize")]:
+        Deals.collection("top_discounts").insert_one(item)
+    for item in [row("4", 20, deadline=today - timedelta(days=1)), row("5", 20, deadline=today + timedelta(days=5)),
+                 row("6", 20, deadline=today)]:
+        Deals.collection("expiring_deals").insert_one(item)
+    client = create_app({"TESTING": True}).test_client()
+
+    ids = lambda url: [item["product_id"] for item in client.get(url).get_json()["items"]]
+    assert ids("/api/v1/deals/discounts") == ["2", "1", "3"]
+    assert ids("/api/v1/deals/discounts?category=Piena produkti&store=Rimi") == ["1"]
+    assert ids("/api/v1/deals/expiring") == ["6", "5"]
+    assert ids("/api/v1/deals/expiring?days=2") == ["6"]
+    assert client.get("/api/v1/deals/expiring?days=-1").status_code == 400
+
+    page = client.get("/").text
+    assert page.index("Deal 2") < page.index("Deal 1") < page.index("Deal 3")
+
+def test_expiring_deals_rebuilt_after_every_scrape(monkeypatch):
+    rebuilt = []
+    monkeypatch.setattr("app.scraper.deals.rebuild", lambda names=None: rebuilt.append(names))
+    monkeypatch.setattr("app.scraper.Fetcher", lambda: FakeFetcher({MaximaAdapter().page_url(0): MAXIMA_PAGE}))
+    scrape_store(MaximaAdapter())
+    scrape_store(MaximaAdapter())  # nothing changed
+    assert rebuilt == [None, ["expiring_deals"]]
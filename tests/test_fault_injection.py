@@ -0,0 +1,151 @@
+"""
+Fault injection against a local stub HTTP server: throttling, server errors, slow
+responses and a dead host, as seen by the real Fetcher and the scraping pipeline.
+"""
+
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app.fetcher import Fetcher
+from app.models import ScrapeCheckpoint
+from app.scraper import scrape_store
+from app.stores import RimiAdapter
+from helpers import rimi_page
+
+
+class StubServer:
+    """
+    Serves scripted responses: each request takes the next (status, body[, headers[, delay]])
+    scripted for its full path, or else for its path without the query, the last one
+    repeating. A callable body is called with the request path. Every request path is
+    recorded in `hits`.
+    """
+
+    def __init__(self):
+        self.scripts = {}
+        self.hits = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits.append(self.path)
+                script = stub.scripts.get(self.path) or stub.scripts.get(self.path.split("?")[0]) \
+                    or [(404, "", {}, 0)]
+                status, body, headers, delay = script.pop(0) if len(script) > 1 else script[0]
+                time.sleep(delay)
+                body = body(self.path) if callable(body) else body
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body.encode())))
+                self.end_headers()
+                self.wfile.write(body.encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def script(self, path, *responses):
+        defaults = (None, None, {}, 0)
+        self.scripts[path] = [tuple(response) + defaults[len(response):] for response in responses]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv("SCRAPER_HTTP_CACHE", "0")
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    stub = StubServer()
+    stub.thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+def fetch_all(urls, **options):
+    async def run():
+        async with Fetcher(per_host_rate=1000, **options) as fetcher:
+            return [await fetcher.get(url) for url in urls], fetcher.stats
+    return asyncio.run(run())
+
+
+def test_retries_transient_errors_and_honours_retry_after(server):
+    server.script("/flaky", (503, "", {"Retry-After": "0.3"}), (429, "", {"Retry-After": "0.3"}), (200, "ok"))
+    started = time.monotonic()
+    (page,), stats = fetch_all([server.url("/flaky")], retries=3, backoff=0.01)
+    assert page == "ok"
+    assert len(server.hits) == 3
+    assert stats["retries"] == 2
+    # Both waits came from Retry-After, not the 10ms backoff
+    assert time.monotonic() - started >= 0.6
+
+def test_retries_timeouts(server):
+    server.script("/slow", (200, "late", {}, 0.5), (200, "ok"))
+    (page,), stats = fetch_all([server.url("/slow")], retries=2, backoff=0.01, timeout=0.2)
+    assert page == "ok"
+    assert stats["retries"] == 1
+
+def test_gives_up_on_client_errors_and_after_bounded_retries(server):
+    server.script("/missing", (404, "no"))
+    server.script("/broken", (500, "down"))
+    (missing, broken), stats = fetch_all([server.url("/missing"), server.url("/broken")],
+                                         retries=2, backoff=0.01)
+    assert (missing, broken) == (None, None)
+    assert server.hits.count("/missing") == 1
+    assert server.hits.count("/broken") == 3
+    assert stats["failed"] == 1
+
+def test_circuit_breaker_stops_hammering_a_dead_host(server):
+    server.script("/down", (503, ""))
+    urls = [server.url(f"/down?page={page}") for page in range(10)]
+    started = time.monotonic()
+    pages, stats = fetch_all(urls, retries=1, backoff=0.01, breaker_threshold=4, breaker_cooldown=60)
+    assert pages == [None] * 10
+    # Two pages of two attempts open the circuit; the other eight fail without a request
+    assert len(server.hits) == 4
+    assert stats["circuit_open"] == 8
+    assert time.monotonic() - started < 1
+
+def test_circuit_breaker_probes_after_cooldown(server):
+    server.script("/recovering", (503, ""), (503, ""), (200, "ok"))
+    async def run():
+        async with Fetcher(per_host_rate=1000, retries=0, breaker_threshold=2, breaker_cooldown=0.2) as fetcher:
+            first = [await fetcher.get(server.url("/recovering")) for _ in range(3)]
+            await asyncio.sleep(0.25)
+            return first, await fetcher.get(server.url("/recovering"))
+    first, probe = asyncio.run(run())
+    assert first == [None, None, None]
+    assert probe == "ok"
+    assert len(server.hits) == 3
+
+
+def test_rimi_run_resumes_from_failed_page(server, fake_db, monkeypatch):
+    monkeypatch.setenv("SCRAPER_RETRIES", "1")
+    monkeypatch.setenv("SCRAPER_BACKOFF", "0.01")
+
+    def page(path):
+        number = int(path.split("currentPage=")[1].split("&")[0])
+        count = 100 if number < 3 else 1
+        return rimi_page([f"{number}-{i}" for i in range(count)], last_page=3)
+    # Page 2 fails on both attempts of the first run
+    server.script("/c/milk", (200, page))
+    server.script("/c/milk?currentPage=2&pageSize=100", (500, ""), (500, ""), (200, page))
+    base_url = server.url("/c/milk?currentPage=1&pageSize=100")
+    adapter = lambda: RimiAdapter(links=[("Milk-products", base_url)])
+
+    first = scrape_store(adapter())
+    assert first["inserted"] == 101
+    pending = ScrapeCheckpoint.get("Rimi:Milk-products")
+    assert [unit["page"] for unit in pending] == [2]
+
+    server.hits.clear()
+    second = scrape_store(adapter())
+    assert second["inserted"] == 100
+    assert server.hits == ["/c/milk?currentPage=2&pageSize=100"]
+    assert ScrapeCheckpoint.get("Rimi:Milk-products") is None
+    assert len(fake_db.data) == 201
@@ -0,0 +1,80 @@
+import asyncio
+import httpx
+import pytest
+from app.fetcher import Fetcher, HttpCache
+
+def serve(bodies, etags=None):
+    """MockTransport serving bodies[url]; answers 304 when If-None-Match matches etags[url]."""
+    requests = []
+    def handler(request):
+        url = str(request.url)
+        requests.append(request)
+        etag = (etags or {}).get(url)
+        if etag and request.headers.get("if-none-match") == etag:
+            return httpx.Response(304)
+        headers = {"ETag": etag} if etag else {}
+        return httpx.Response(200, text=bodies[url], headers=headers)
+    return httpx.MockTransport(handler), requests
+
+def fetch(cache, transport, url):
+    async def run():
+        async with Fetcher(cache=cache, transport=transport, per_host_rate=1000) as fetcher:
+            return await fetcher.get(url)
+    return asyncio.run(run())
+
+URL = "https://shop.example/page"
+
+def test_conditional_request_returns_cached_body_as_unchanged(tmp_path):
+    cache = HttpCache(tmp_path)
+    transport, requests = serve({URL: "<html>1</html>"}, {URL: '"v1"'})
+    first = fetch(cache, transport, URL)
+    assert (first, first.unchanged) == ("<html>1</html>", False)
+
+    second = fetch(cache, transport, URL)
+    assert requests[-1].headers["if-none-match"] == '"v1"'
+    assert (second, second.unchanged) == ("<html>1</html>", True)
+
+def test_digest_detects_unchanged_and_changed_bodies(tmp_path):
+    cache = HttpCache(tmp_path)
+    bodies = {URL: "<html>1</html>"}
+    transport, _ = serve(bodies)
+    assert not fetch(cache, transport, URL).unchanged
+    assert fetch(cache, transport, URL).unchanged
+    bodies[URL] = "<html>2</html>"
+    assert not fetch(cache, transport, URL).unchanged
+    assert fetch(cache, transport, URL).unchanged
+
+def test_stale_or_uncommitted_entries_are_parsed_again(tmp_path):
+    transport, _ = serve({URL: "<html>1</html>"})
+    fetch(HttpCache(tmp_path, max_age=0), transport, URL)
+    assert not fetch(HttpCache(tmp_path, max_age=0), transport, URL).unchanged
+
+    other = tmp_path / "other"
+    async def failing_run():
+        async with Fetcher(cache=HttpCache(other), transport=transport) as fetcher:
+            await fetcher.get(URL)
+            raise RuntimeError("pipeline failed")
+    with pytest.raises(RuntimeError):
+        asyncio.run(failing_run())
+    assert not fetch(HttpCache(other), transport, URL).unchanged
+
+def cache_files(directory):
+    return [path.name for path in directory.iterdir()]
+
+@pytest.mark.parametrize("damage", ["truncate", "remove"])
+def test_unusable_cached_body_is_fetched_again(tmp_path, damage):
+    cache = HttpCache(tmp_path)
+    transport, requests = serve({URL: "<html>1</html>"}, {URL: '"v1"'})
+    fetch(cache, transport, URL)
+    body = tmp_path / next(name for name in cache_files(tmp_path) if name.endswith(".html.gz"))
+    if damage == "truncate":
+        body.write_bytes(body.read_bytes()[:10])
+    else:
+        body.unlink()
+
+    page = fetch(cache, transport, URL)
+    assert (page, page.unchanged) == ("<html>1</html>", False)
+    assert "if-none-match" not in requests[-1].headers
+    # The entry is whole again: the next run revalidates and finds the body unchanged
+    assert fetch(cache, transport, URL).unchanged
+    assert not any(name.endswith(".tmp") for name in cache_files(tmp_path))
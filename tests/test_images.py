@@ -0,0 +1,62 @@
+import httpx
+import pytest
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs
+from app.images import EXPIRATION, ImageMirrorer
+from app.models import ImageMirror
+from app.scraper import ItemWriter
+
+pytestmark = pytest.mark.usefixtures("fake_db")
+
+def imgbb():
+    """MockTransport answering uploads with a mirror URL per source; records the uploaded sources."""
+    uploads = []
+    def handler(request):
+        assert request.url.params["expiration"] == str(EXPIRATION)
+        source = parse_qs(request.content.decode())["image"][0]
+        uploads.append(source)
+        return httpx.Response(200, json={"data": {"url": f"https://i.ibb.co/{len(uploads)}.png"}})
+    return httpx.MockTransport(handler), uploads
+
+def add_item(fake_db, product_id, image_url, **fields):
+    fake_db.insert_one({"store": "Rimi", "product_id": product_id, "image_url": image_url, **fields})
+
+def test_uploads_each_source_once_and_batches_writes(fake_db):
+    add_item(fake_db, "1", "https://rimi.example/a.png")
+    add_item(fake_db, "2", "https://rimi.example/a.png")
+    add_item(fake_db, "3", "https://rimi.example/b.png")
+    add_item(fake_db, "4", "")
+    transport, uploads = imgbb()
+
+    summary = ImageMirrorer(api_key="key", transport=transport).run()
+    assert sorted(uploads) == ["https://rimi.example/a.png", "https://rimi.example/b.png"]
+    assert summary["items"] == 3 and summary["uploaded"] == 2
+    assert fake_db.calls["bulk_write"] == 1 and fake_db.calls["update_one"] == 0
+    first, second = fake_db.find_one({"product_id": "1"}), fake_db.find_one({"product_id": "2"})
+    assert first["image_url"] == second["image_url"] and "ibb.co" in first["image_url"]
+    assert first["image_mirror"]["source"] == "https://rimi.example/a.png"
+
+    # Nothing left to do until the mirrors near expiry
+    assert ImageMirrorer(api_key="key", transport=transport).run()["items"] == 0
+    assert len(uploads) == 2
+
+def test_remirrors_expiring_images_and_reuses_known_sources(fake_db):
+    soon = datetime.utcnow() + timedelta(hours=1)
+    add_item(fake_db, "1", "https://i.ibb.co/old.png",
+             image_mirror={"source": "https://rimi.example/a.png", "expires": soon})
+    # Rewritten by the scraper since it was mirrored: its source still has a live mirror
+    add_item(fake_db, "2", "https://rimi.example/b.png", image_mirror=None)
+    ImageMirror.record({"https://rimi.example/b.png": {"url": "https://i.ibb.co/b.png",
+                                                       "expires": datetime.utcnow() + timedelta(days=5)}})
+    transport, uploads = imgbb()
+
+    summary = ImageMirrorer(api_key="key", transport=transport).run()
+    assert uploads == ["https://rimi.example/a.png"]
+    assert (summary["uploaded"], summary["reused"]) == (1, 1)
+    assert fake_db.find_one({"product_id": "1"})["image_mirror"]["expires"] > soon
+    assert fake_db.find_one({"product_id": "2"})["image_url"] == "https://i.ibb.co/b.png"
+
+def test_scraper_rewrites_reset_the_mirror():
+    update = ItemWriter._update_doc({"name": "Piens", "image_url": "https://rimi.example/a.png",
+                                     "time": {"created": datetime.utcnow(), "updated": None}})
+    assert update["$set"]["image_mirror"] is None
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import pytest
+from datetime import datetime, timedelta, timezone
+from flask import Flask
+from app import jobs
+from app.jobs import JobRunner
+from app.models import JobRun
+from app.scraper import run_adapter
+from app.stores import RimiAdapter
+from helpers import FakeFetcher, ListWriter, rimi_page
+
+pytestmark = pytest.mark.usefixtures("fake_db")
+
+@pytest.fixture
+def runner():
+    app = Flask("test_app")
+    with app.app_context():
+        runner = JobRunner(max_workers=2, progress_interval=0)
+        yield runner
+        runner.shutdown()
+
+def wait_for(run, *statuses):
+    for _ in range(200):
+        current = JobRun.get(run["_id"])
+        if current["status"] in statuses:
+            return current
+        threading.Event().wait(0.01)
+    raise AssertionError(f"run stayed {current['status']}")
+
+def test_one_active_run_per_job_type(runner):
+    release = threading.Event()
+    first = runner.submit("scrape_rimi", release.wait)
+    assert first is not None
+    assert runner.submit("scrape_rimi", lambda: None) is None
+    assert runner.submit("scrape_maxima", lambda: {"inserted": 1}) is not None
+
+    release.set()
+    done = wait_for(first, "succeeded")
+    assert done["duration"] is not None
+    assert runner.submit("scrape_rimi", lambda: None) is not None
+    assert [run["status"] for run in JobRun.recent() if run["type"] == "scrape_rimi"].count("rejected") == 1
+
+def test_cancel_stops_run_at_next_progress_report(runner):
+    started = threading.Event()
+    def task():
+        for i in range(1000):
+            jobs.progress(done=i)
+            started.set()
+            threading.Event().wait(0.01)
+    run = runner.submit("upload_images", task)
+    started.wait(1)
+    assert JobRun.request_cancel(str(run["_id"]))
+    cancelled = wait_for(run, "cancelled")
+    assert 0 < cancelled["progress"]["done"] < 999
+    assert JobRun.request_cancel(str(run["_id"])) is None
+
+def test_scrape_reports_progress_per_page_not_only_per_flush(monkeypatch):
+    base_url = "https://rimi.example/c/SH-1?currentPage=1&pageSize=100"
+    pages = {RimiAdapter.page_url(base_url, page): rimi_page([f"{page}-{i}" for i in range(100)], last_page=3)
+             for page in (1, 2, 3)}
+    reports = []
+    monkeypatch.setattr("app.scraper.jobs.progress", lambda **counters: reports.append(counters))
+    monkeypatch.setattr("app.scraper.Fetcher", lambda: FakeFetcher(pages))
+    asyncio.run(run_adapter(RimiAdapter(links=[("Milk-products", base_url)]), ListWriter()))
+    assert sorted(report["pages"] for report in reports) == [1, 2, 3]
+
+def test_failed_run_records_error_and_releases_lock(runner):
+    def task():
+        raise ValueError("boom")
+    run = runner.submit("categorize_maxima", task)
+    failed = wait_for(run, "failed")
+    assert failed["error"] == "boom"
+    assert runner.submit("categorize_maxima", lambda: None) is not None
+
+def test_expired_lock_can_be_taken_over(fake_db):
+    assert JobRun.acquire_lock("scrape_rimi", "run-1", "worker-a")
+    assert not JobRun.acquire_lock("scrape_rimi", "run-2", "worker-b")
+    fake_db.database.job_locks.data["scrape_rimi"]["expires"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+    assert JobRun.acquire_lock("scrape_rimi", "run-2", "worker-b")
+
+def test_queued_run_renews_its_lease_when_picked_up(fake_db):
+    locks = fake_db.database.job_locks.data
+    expired = datetime.now(timezone.utc) - timedelta(seconds=1)
+    queued = jobs.start("scrape_rimi")
+    locks["scrape_rimi"]["expires"] = expired
+    assert jobs.execute(queued, lambda: None)["status"] == "succeeded"
+
+    # Another run took the expired lease while this one waited in the queue
+    queued, ran = jobs.start("scrape_rimi"), []
+    locks["scrape_rimi"]["expires"] = expired
+    other = jobs.start("scrape_rimi")
+    assert jobs.execute(queued, lambda: ran.append(True))["status"] == "rejected"
+    assert not ran and locks["scrape_rimi"]["run_id"] == other["_id"]
@@ -0,0 +1,83 @@
+import pytest
+from datetime import datetime, timedelta
+from app import create_app, matching
+from app.models import Item, ProductGroup
+from helpers import make_item
+
+pytestmark = pytest.mark.usefixtures("fake_db")
+
+def product(product_id, store, search_name, price, quantity=500, brand=None, category=None):
+    item = make_item(product_id, price=price, store=store)
+    item.update(search_name=search_name, name=search_name.title(), quantity=quantity, brand=brand or store,
+                category=category)
+    item["price"]["price_per_unit"] = round(price / (quantity / 1000), 2)
+    return item
+
+def groups():
+    return sorted((sorted(group["member_keys"]) for group in ProductGroup.collection().find({})))
+
+def test_matches_same_size_products_across_stores():
+    for item in [product("m1", "Maxima", "piens 2.5% tere", 1.09, quantity=1000, category="Piena produkti"),
+                 product("r1", "Rimi", "tere piens 2,5%", 0.99, quantity=1000),
+                 product("m2", "Maxima", "piens 2.5% tere", 0.59),  # another size
+                 product("r2", "Rimi", "maize rudzu", 1.20),
+                 product("m3", "Maxima", "jogurts zemeņu", 0.80, brand="Valio"),
+                 product("r3", "Rimi", "jogurts zemenu", 0.75, brand="Danone")]:  # another brand
+        Item.create(item)
+    assert matching.rebuild() == {"full": True, "blocks": 2, "groups": 1, "removed": 0}
+    group = ProductGroup.for_item("Maxima", "m1")
+    assert group["member_keys"] == ["Maxima/m1", "Rimi/r1"]
+    assert group["cheapest"]["store"] == "Rimi" and group["cheapest"]["price_per_unit"] == 0.99
+    assert group["category"] == "Piena produkti" and group["savings"] == 0.1
+
+def test_sizes_derived_from_unit_prices_share_a_block():
+    # Rimi's quantity is price / rounded unit price: €2.49 at €6.23/kg is 399.68 g
+    rimi_quantity = round(2.49 / 6.23 * 1000, 2)
+    assert rimi_quantity == 399.68
+    assert [matching.nominal_size(quantity) for quantity in (rimi_quantity, 400.3, 995, 125, 120)] == \
+        [400, 400, 1000, 125, 120]
+    Item.create(product("m1", "Maxima", "siers gouda", 2.59, quantity=400))
+    Item.create(product("r1", "Rimi", "siers gouda", 2.49, quantity=rimi_quantity))
+    matching.rebuild()
+    group = ProductGroup.for_item("Maxima", "m1")
+    assert group["member_keys"] == ["Maxima/m1", "Rimi/r1"]
+    assert (group["quantity"], group["cheapest"]["store"]) == (400, "Rimi")
+
+    # The incremental rebuild finds the block from either quantity
+    state = ProductGroup.state()
+    ProductGroup.save_state(state["synced"] - matching.SYNC_SLACK, state["deletions"])
+    assert matching.rebuild()["groups"] == 1
+
+def test_incremental_rebuild_regroups_only_changed_blocks(fake_db):
+    Item.create(product("m1", "Maxima", "sviests", 2.0))
+    Item.create(product("r1", "Rimi", "sviests", 2.2))
+    Item.create(product("m2", "Maxima", "biezpiens", 1.0, quantity=200))
+    Item.create(product("r2", "Rimi", "biezpiens", 1.1, quantity=200))
+    matching.rebuild()
+    assert groups() == [["Maxima/m1", "Rimi/r1"], ["Maxima/m2", "Rimi/r2"]]
+
+    # Only the butter changes size; the curd block is not touched
+    state = ProductGroup.state()
+    ProductGroup.save_state(state["synced"] + matching.SYNC_SLACK, state["deletions"])
+    old = datetime.utcnow() - timedelta(hours=1)
+    for doc in fake_db.data.values():
+        doc["time"]["updated"] = old
+    fake_db.update_one({"store": "Rimi", "product_id": "r1"},
+                       {"$set": {"quantity": 250}, "$currentDate": {"time.updated": True}})
+    summary = matching.rebuild()
+    assert summary == {"full": False, "blocks": 2, "groups": 0, "removed": 1}
+    assert groups() == [["Maxima/m2", "Rimi/r2"]]
+
+def test_groups_endpoint_lists_cheapest_per_unit():
+    Item.create(product("m1", "Maxima", "sviests", 2.0, category="Piena produkti"))
+    Item.create(product("r1", "Rimi", "sviests", 1.8))
+    Item.create(product("m2", "Maxima", "biezpiens", 1.0, quantity=200, category="Piena produkti"))
+    Item.create(product("r2", "Rimi", "biezpiens", 1.1, quantity=200))
+    matching.rebuild()
+    client = create_app({"TESTING": True}).test_client()
+    body = client.get("/api/v1/groups?category=Piena produkti").get_json()
+    assert [group["cheapest"]["product_id"] for group in body["groups"]] == ["r1", "m2"]
+    assert "members" not in body["groups"][0]
+    group = client.get("/api/v1/groups?store=Maxima&product_id=m2").get_json()["group"]
+    assert [member["product_id"] for member in group["members"]] == ["m2", "r2"]
+    assert client.get("/api/v1/groups?store=Maxima").status_code == 400
@@ -0,0 +1,61 @@
+import pytest
+from types import SimpleNamespace
+from app import create_app, metrics
+from app.models import Item
+from app.scraper import scrape_store
+from app.stores import MaximaAdapter
+from helpers import FakeFetcher, MAXIMA_PAGE
+
+@pytest.fixture(autouse=True)
+def clear_metrics(fake_db):
+    metrics.clear()
+
+def test_histogram_and_counter_exposition():
+    histogram = metrics.Histogram("test_seconds", "Test histogram", ("stage",), buckets=(0.1, 1))
+    counter = metrics.Counter("test_total", "Test counter", ("outcome",))
+    try:
+        histogram.observe(0.05, stage="a")
+        histogram.observe(0.5, stage="a")
+        histogram.observe(5, stage="a")
+        counter.inc(outcome='say "hi"')
+        text = metrics.render()
+    finally:
+        metrics.REGISTRY.remove(histogram)
+        metrics.REGISTRY.remove(counter)
+    assert "# TYPE test_seconds histogram" in text
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{stage="a",le="1"} 2' in text
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 'test_seconds_count{stage="a"} 3' in text
+    assert 'test_total{outcome="say \\"hi\\""} 1' in text
+
+def test_local_scrape_records_every_stage(monkeypatch):
+    monkeypatch.setattr("app.scraper.Fetcher", lambda: FakeFetcher({MaximaAdapter().page_url(0): MAXIMA_PAGE}))
+    scrape_store(MaximaAdapter())
+    for stage in ("load_state", "fetch", "parse", "extract", "normalize", "categorize", "write", "index",
+                  "price_history"):
+        assert metrics.scrape_stage_seconds.count(store="Maxima", stage=stage) >= 1, stage
+    assert metrics.scrape_pages.value(store="Maxima", outcome="parsed") == 1
+    assert metrics.scrape_records.value(store="Maxima", outcome="written") == 1
+
+def test_command_listener_times_commands():
+    listener = metrics.CommandListener()
+    started = SimpleNamespace(command_name="find", command={"find": "items"}, connection_id=("h", 1), request_id=7)
+    listener.started(started)
+    listener.succeeded(SimpleNamespace(command_name="find", connection_id=("h", 1), request_id=7,
+                                       duration_micros=1500))
+    listener.started(SimpleNamespace(command_name="insert", command={"insert": "items"}, connection_id=("h", 1),
+                                     request_id=8))
+    listener.failed(SimpleNamespace(command_name="insert", connection_id=("h", 1), request_id=8,
+                                    duration_micros=10))
+    assert metrics.mongo_command_seconds.count(command="find", collection="items") == 1
+    assert metrics.mongo_command_failures.value(command="insert", collection="items") == 1
+    assert listener._collections == {}
+
+def test_metrics_endpoint_covers_search_latency(monkeypatch):
+    monkeypatch.setattr(Item, "search_by_name", classmethod(lambda cls, term, filters=None: []))
+    client = create_app({"TESTING": True}).test_client()
+    client.get("/search?query=piens&lang=latvian")
+    response = client.get("/metrics")
+    assert response.mimetype == "text/plain"
+    assert 'grocy_http_request_seconds_count{endpoint="/search",method="GET",status="200"} 1' in response.text
@@ -1,56 +1,10 @@
-from bson.objectid import ObjectId
 import pytest
 from datetime import datetime
 from flask import Flask
 from app.models import Item
 
-# Fake collection implementation for testing
-class FakeCollection:
-    def __init__(self):
-        self.data = {}
-    def find(self, *args, **kwargs):
-        return list(self.data.values())
-    def find_one(self, query):
-        for doc in self.data.values():
-            match = True
-            for k, v in query.items():
-                if k == "_id":
-                    if doc.get("_id") != v:
-                        match = False
-                        break
-                elif doc.get(k) != v:
-                    match = False
-                    break
-            if match:
-                return doc
-        return None
-    def insert_one(self, data):
-        _id = ObjectId()  # generate a valid ObjectId
-        data["_id"] = _id
-        self.data[_id] = data
-        class Result:
-            inserted_id = _id
-        return Result()
-    def update_one(self, query, update_doc):
-        doc = self.find_one(query)
-        if doc:
-            for k, v in update_doc.get("$set", {}).items():
-                doc[k] = v
-    def delete_one(self, query):
-        doc = self.find_one(query)
-        if doc:
-            _id = doc["_id"]
-            del self.data[_id]
-    def aggregate(self, pipeline):
-        return list(self.data.values())
-
-# Fixture to setup a fake collection and patch Item.collection and init_collection
-@pytest.fixture(autouse=True)
-def fake_db(monkeypatch):
-    fake_collection = FakeCollection()
-    monkeypatch.setattr(Item, "collection", lambda: fake_collection)
-    monkeypatch.setattr(Item, "init_collection", lambda: None)
-    return fake_collection
+# Every test runs against the fake items collection of conftest.fake_db
+pytestmark = pytest.mark.usefixtures("fake_db")
 
 def test_create_and_get_item(fake_db):
     now = datetime.utcnow()
@@ -213,4 +167,19 @@ def test_search_by_name(fake_db, monkeypatch):
         Item.create(data)
     results = Item.search_by_name("cafe")
     # Since our fake aggregate returns all docs, ensure both appear
-    assert len(results) >= 2
\ No newline at end of file
+    assert len(results) >= 2
+
+
+def test_remove_duplicates(fake_db):
+    test_app = Flask("test_app")
+    test_app.app_context().push()
+    now = datetime.utcnow()
+    ids = []
+    for _ in range(3):
+        created = Item.create({"product_id": "dup", "store": "Rimi", "name": "Dup", "time": {"updated": now}})
+        ids.append(created["_id"])
+    # Newest first, as produced by the $sort/$group pipeline
+    fake_db.aggregate = lambda pipeline, **kwargs: [{"ids": list(reversed(ids))}]
+    removed = Item.remove_duplicates()
+    assert removed == 2
+    assert list(fake_db.data) == [ids[-1]]
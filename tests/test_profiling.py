@@ -0,0 +1,66 @@
+import logging
+import pytest
+from app import create_app, profiling, search
+from app.models import Item
+from app.search import LocalSearch, explain_summary
+from helpers import named
+
+@pytest.fixture(autouse=True)
+def items(fake_db, monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path / "profiles"))
+    search.set_backend(LocalSearch(interval=0))
+    Item.create(named("1", "piens"))
+    Item.create(named("2", "maize"))
+
+@pytest.fixture
+def client():
+    return create_app({"TESTING": True, "SECRET_KEY": "test"}).test_client()
+
+def test_search_reports_phase_timings_without_logging_results(client, caplog):
+    caplog.set_level(logging.INFO)
+    response = client.get("/search?query=piens&lang=latvian")
+    assert response.status_code == 200
+    phases = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert phases == ["search", "render"]
+    assert "Product 1" not in caplog.text
+
+def test_slow_searches_are_logged_with_explain_summary(client, monkeypatch, caplog):
+    monkeypatch.setenv("SLOW_SEARCH_MS", "0")
+    client.get("/search?query=piens&lang=latvian&stock=true")
+    slow = [record.getMessage() for record in caplog.records if record.getMessage().startswith("Slow search")]
+    assert len(slow) == 1
+    assert "query='piens'" in slow[0] and "'stock': True" in slow[0] and "'indexed': 2" in slow[0]
+
+def test_profile_header_needs_token_or_admin(client, monkeypatch):
+    assert "X-Profile-Dump" not in client.get("/search?query=piens&lang=latvian", headers={"X-Profile": "1"}).headers
+    monkeypatch.setenv("PROFILE_TOKEN", "secret")
+    response = client.get("/search?query=piens&lang=latvian", headers={"X-Profile": "secret"})
+    name = response.headers["X-Profile-Dump"]
+    assert profiling.dumps() == [name]
+    assert "cumulative" in profiling.report(name)
+
+def test_admin_sample_rate_profiles_searches(client):
+    with client.session_transaction() as session:
+        session["admin_logged_in"] = True
+    client.post("/admin/profiling", data={"sample_rate": "1"})
+    assert profiling.sample_rate() == 1.0
+    name = client.get("/search?query=maize&lang=latvian").headers["X-Profile-Dump"]
+    assert "search" in client.get(f"/admin/profiling/{name}").text
+    assert client.get("/admin/profiling/../../etc/passwd").status_code == 404
+
+    client.post("/admin/profiling", data={"sample_rate": "0"})
+    assert "X-Profile-Dump" not in client.get("/search?query=maize&lang=latvian").headers
+
+def test_explain_summary():
+    explain = {
+        "stages": [{"$_internalSearchMongotRemote": {}, "nReturned": 40, "executionTimeMillisEstimate": 12},
+                   {"$limit": 10, "nReturned": 10, "executionTimeMillisEstimate": 12}],
+        "executionStats": {"totalDocsExamined": 40, "executionTimeMillis": 13},
+    }
+    assert explain_summary(explain) == {
+        "stages": [{"stage": "$_internalSearchMongotRemote", "returned": 40, "ms": 12},
+                   {"stage": "$limit", "returned": 10, "ms": 12}],
+        "docs_examined": 40, "ms": 13,
+    }
+    planner = {"queryPlanner": {"winningPlan": {"stage": "LIMIT", "inputStage": {"stage": "IXSCAN"}}}}
+    assert explain_summary(planner)["stages"] == [{"stage": "LIMIT"}, {"stage": "IXSCAN"}]
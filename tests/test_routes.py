@@ -0,0 +1,60 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from app import create_app
+from app.models import Item, PriceHistory
+
+@pytest.fixture
+def client(fake_db):
+    app = create_app({"TESTING": True})
+    return app.test_client()
+
+def make_item(product_id, price, old_price, store="Rimi"):
+    now = datetime.now(timezone.utc)
+    return {
+        "name": f"Product {product_id}",
+        "product_id": product_id,
+        "store": store,
+        "price": {"value": price, "old_value": old_price, "discount": round((old_price - price) / old_price * 100),
+                  "currency": "EUR", "price_per_unit": price},
+        "time": {"created": now, "updated": now, "discount_deadline": None},
+    }
+
+def test_price_history(client, fake_db, fake_history):
+    item = make_item("1", 0.99, 1.99)
+    Item.create(item)
+    now = datetime.now(timezone.utc)
+    PriceHistory.record([
+        PriceHistory.point(make_item("1", 1.49, 1.49), now - timedelta(days=200)),
+        PriceHistory.point(make_item("1", 1.29, 1.29), now - timedelta(days=20)),
+        PriceHistory.point(item, now - timedelta(days=2)),
+    ])
+
+    response = client.get("/price_history/Rimi/1?format=json")
+    assert [point["price"] for point in response.get_json()["points"]] == [1.29, 0.99]
+
+    response = client.get("/price_history/Rimi/1")
+    assert response.status_code == 200
+    assert b"<polyline" in response.data
+    assert b"was never charged" in response.data
+
+def test_index_does_not_load_items(client, fake_db):
+    for i in range(3):
+        Item.create(make_item(str(i), 1.0, 1.0, store="Rimi" if i else "Maxima"))
+    response = client.get("/")
+    assert response.status_code == 200
+    assert b"Total Items: 3" in response.data
+    assert fake_db.calls["find"] == 0
+
+def test_list_items_paginates_with_projection(client, fake_db):
+    for i in range(5):
+        Item.create(make_item(str(i), 1.0, 1.0))
+    data = client.get("/items?page=2&page_size=2&fields=product_id").get_json()
+    assert data["total"] == 5
+    assert [item["product_id"] for item in data["items"]] == ["2", "3"]
+    assert set(data["items"][0]) == {"_id", "product_id"}
+
+def test_cancel_job_with_malformed_run_id_is_not_found(client):
+    client.application.secret_key = "test"
+    with client.session_transaction() as session:
+        session["admin_logged_in"] = True
+    assert client.post("/admin/jobs/not-a-run-id/cancel").status_code == 404
@@ -0,0 +1,89 @@
+import pytest
+from datetime import datetime, timedelta
+from app.models import JobRun, ScrapeSchedule
+from app.scheduler import Scheduler
+
+LINKS = [("Milk-products", "https://rimi.example/milk"), ("Breads", "https://rimi.example/bread"),
+         ("Fish", "https://rimi.example/fish")]
+
+pytestmark = pytest.mark.usefixtures("fake_db")
+
+@pytest.fixture
+def clock():
+    return [datetime(2025, 3, 1, 12, 0)]
+
+@pytest.fixture
+def scraped(monkeypatch):
+    calls, changes = [], {}
+    def scrape_store(adapter):
+        target = adapter.links[0][0] if adapter.store == "Rimi" else "Maxima"
+        calls.append(target)
+        return {"inserted": 0, "updated": changes.get(target, 0), "unchanged": 1}
+    monkeypatch.setattr("app.scraper.scrape_store", scrape_store)
+    return calls, changes
+
+def test_categories_are_staggered(clock, monkeypatch):
+    monkeypatch.setenv("SCRAPE_INTERVAL_RIMI", "3600")
+    scheduler = Scheduler(links=LINKS, now=lambda: clock[0])
+    targets = scheduler.targets()
+    assert [targets[f"Rimi:{c}"]["next_run"] - clock[0] for c, _ in LINKS] == \
+        [timedelta(0), timedelta(minutes=20), timedelta(minutes=40)]
+
+def test_sync_picks_up_changed_urls_and_keeps_schedule(clock):
+    scheduler = Scheduler(links=LINKS, now=lambda: clock[0])
+    ScrapeSchedule.sync(scheduler.targets())
+    ScrapeSchedule.record_run("Rimi:Breads", next_run=clock[0] + timedelta(hours=5))
+    moved = [(category, url + "-new" if category == "Breads" else url) for category, url in LINKS]
+    clock[0] += timedelta(hours=1)
+    ScrapeSchedule.sync(Scheduler(links=moved, now=lambda: clock[0]).targets())
+    target = ScrapeSchedule.collection().find_one({"_id": "Rimi:Breads"})
+    assert target["url"] == "https://rimi.example/bread-new"
+    assert target["next_run"] == datetime(2025, 3, 1, 17, 0)
+    assert Scheduler(links=moved).adapter(target).links == [("Breads", "https://rimi.example/bread-new")]
+
+def test_run_pending_follows_cadence_and_records_runs(clock, scraped, monkeypatch):
+    monkeypatch.setenv("SCRAPE_INTERVAL_RIMI", "3600")
+    monkeypatch.setenv("SCRAPE_INTERVAL_MAXIMA", "3600")
+    calls, _ = scraped
+    scheduler = Scheduler(links=LINKS, now=lambda: clock[0])
+
+    assert scheduler.run_pending() == 2
+    assert sorted(calls) == ["Maxima", "Milk-products"]
+    clock[0] += timedelta(minutes=20)
+    scheduler.run_pending()
+    assert calls[-1] == "Breads"
+
+    # Overdue longest runs first when nothing changed
+    clock[0] += timedelta(minutes=45)
+    calls.clear()
+    scheduler.run_pending()
+    assert calls[0] == "Fish"
+    assert set(calls) == {"Fish", "Maxima", "Milk-products"}
+    target = ScrapeSchedule.collection().find_one({"_id": "Rimi:Milk-products"})
+    assert target["last_status"] == "succeeded"
+    assert target["last_duration"] is not None
+    assert target["next_run"] == clock[0] + timedelta(hours=1)
+    runs = [run for run in JobRun.recent() if run.get("target") == "Rimi:Milk-products"]
+    assert len(runs) == 2 and all(run["duration"] is not None for run in runs)
+
+def test_changed_targets_come_due_sooner_and_first(clock, scraped, monkeypatch):
+    monkeypatch.setenv("SCRAPE_INTERVAL_RIMI", "3600")
+    calls, changes = scraped
+    scheduler = Scheduler(links=LINKS[:2], now=lambda: clock[0])
+    changes["Breads"] = 3
+    clock[0] += timedelta(minutes=30)
+    scheduler.run_pending()
+    clock[0] += timedelta(minutes=60)
+    calls.clear()
+    scheduler.run_pending()
+    # Breads changed last time, so it runs ahead of the others
+    assert calls[0] == "Breads"
+    assert "Milk-products" in calls
+
+def test_store_lock_skips_target_during_manual_run(clock, scraped):
+    calls, _ = scraped
+    JobRun.acquire_lock("scrape_rimi", "manual", "admin")
+    scheduler = Scheduler(links=LINKS[:1], now=lambda: clock[0])
+    assert scheduler.run_pending() == 1
+    assert calls == ["Maxima"]
+    assert ScrapeSchedule.collection().find_one({"_id": "Rimi:Milk-products"})["last_run"] is None
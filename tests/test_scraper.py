@@ -0,0 +1,236 @@
+import asyncio
+import httpx
+import pytest
+from datetime import datetime
+from app.models import Item, PriceHistory
+from app.scraper import ItemWriter, run_adapter, scrape_store
+from app.fetcher import Fetcher, HttpCache, Page
+from app.stores import PARSERS, MaximaAdapter, RimiAdapter
+from helpers import FakeFetcher, ListWriter, MAXIMA_PAGE, make_item, rimi_page
+
+pytestmark = pytest.mark.usefixtures("fake_db")
+
+def test_item_writer_inserts_updates_and_skips(fake_db):
+    Item.create(make_item("1", price=1.0))
+    Item.create(make_item("2", price=2.0))
+    created = fake_db.find_one({"product_id": "2"})["time"]["created"]
+
+    writer = ItemWriter("Maxima")
+    writer.add(make_item("1", price=1.0))
+    writer.add(make_item("2", price=1.5, deadline=datetime(2030, 1, 1)))
+    writer.add(make_item("3", price=3.0))
+    summary = writer.flush()
+
+    assert summary == {"inserted": 1, "updated": 1, "unchanged": 1}
+    assert len(fake_db.data) == 3
+    updated = fake_db.find_one({"product_id": "2"})
+    assert updated["price"]["value"] == 1.5
+    assert updated["time"]["discount_deadline"] == datetime(2030, 1, 1)
+    assert updated["time"]["created"] == created
+    assert updated["content_hash"] == make_item("2", price=1.5, deadline=datetime(2030, 1, 1))["content_hash"]
+
+def test_item_writer_rewrites_items_without_hash(fake_db):
+    legacy = make_item("1")
+    del legacy["content_hash"]
+    Item.create(legacy)
+    writer = ItemWriter("Maxima")
+    writer.add(make_item("1"))
+    assert writer.flush() == {"inserted": 0, "updated": 1, "unchanged": 0}
+    assert fake_db.find_one({"product_id": "1"})["content_hash"] == make_item("1")["content_hash"]
+
+def test_unchanged_records_skip_normalize(fake_db, monkeypatch):
+    base_url = "https://rimi.example/c/SH-1?currentPage=1&pageSize=100"
+    pages = {RimiAdapter.page_url(base_url, 1): rimi_page(["1", "2"])}
+    monkeypatch.setattr("app.scraper.Fetcher", lambda: FakeFetcher(pages))
+    adapter = RimiAdapter(links=[("Milk-products", base_url)])
+    assert scrape_store(adapter) == {"inserted": 2, "updated": 0, "unchanged": 0}
+
+    normalized = []
+    monkeypatch.setattr(adapter, "normalize", lambda record: normalized.append(record))
+    assert scrape_store(adapter) == {"inserted": 0, "updated": 0, "unchanged": 2}
+    assert normalized == []
+
+def test_item_writer_records_price_changes(fake_db, fake_history):
+    writer = ItemWriter("Maxima")
+    writer.add(make_item("1", price=1.0))
+    writer.add(make_item("2", price=2.0))
+    writer.flush()
+    assert len(fake_history.data) == 2
+
+    writer = ItemWriter("Maxima")
+    writer.add(make_item("1", price=0.5))
+    writer.add(make_item("2", price=2.0, deadline=datetime(2030, 1, 1)))
+    writer.flush()
+    history = Item.price_history("1", "Maxima")
+    assert [point["price"] for point in history] == [1.0, 0.5]
+    assert len(Item.price_history("2", "Maxima")) == 1
+
+def test_existing_items_get_a_baseline_price_point_once(fake_db, fake_history, monkeypatch):
+    Item.create(make_item("1", price=1.0))
+    Item.create(make_item("2", price=2.0))
+    PriceHistory.record([PriceHistory.point(make_item("2", price=2.0), datetime.utcnow())])
+    monkeypatch.setattr("app.scraper.Fetcher", lambda: FakeFetcher({}))
+    scrape_store(MaximaAdapter())
+    assert [point["price"] for point in Item.price_history("1", "Maxima")] == [1.0]
+    assert len(Item.price_history("2", "Maxima")) == 1
+    scrape_store(MaximaAdapter())
+    assert len(fake_history.data) == 2
+
+def test_failed_backfill_is_retried(fake_db, fake_history, monkeypatch):
+    Item.create(make_item("1", price=1.0))
+    def failing_insert(points, ordered=True):
+        raise RuntimeError("write failed")
+    monkeypatch.setattr(fake_history, "insert_many", failing_insert)
+    with pytest.raises(RuntimeError):
+        PriceHistory.backfill()
+    monkeypatch.delattr(fake_history, "insert_many")
+    assert PriceHistory.backfill() == 1
+    assert PriceHistory.backfill() == 0
+
+def test_item_writer_flushes_in_chunks(fake_db):
+    writer = ItemWriter("Maxima", batch_size=2)
+    for product_id in ("1", "2", "3", "4", "5"):
+        writer.add(make_item(product_id))
+    assert len(fake_db.data) == 4
+    writer.flush()
+    assert len(fake_db.data) == 5
+
+def test_item_writer_handles_repeated_product_in_run(fake_db):
+    writer = ItemWriter("Rimi")
+    writer.add(make_item("1", price=1.0, store="Rimi"))
+    writer.add(make_item("1", price=0.8, store="Rimi"))
+    summary = writer.flush()
+    assert summary["inserted"] == 1
+    assert summary["updated"] == 1
+    assert len(fake_db.data) == 1
+    assert fake_db.find_one({"product_id": "1"})["price"]["value"] == 0.8
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_rimi_adapter_extract_and_normalize(parser):
+    adapter = RimiAdapter(links=[], parser=parser)
+    records = adapter.extract(rimi_page(["42"]), "Milk-products")
+    assert len(records) == 1
+    item = adapter.normalize(records[0])
+    assert item["product_id"] == "42"
+    assert item["store"] == "Rimi"
+    assert item["brand"] == "Rimi"
+    assert item["category"] == "Milk-products"
+    assert item["search_name"] == "piens"
+    assert item["image_url"] == "https://rimi.example/42.png"
+    assert item["price"]["value"] == 1.29
+    assert item["price"]["old_value"] == 1.59
+    assert item["price"]["discount"] == 19
+    assert item["price"]["price_per_unit"] == 1.29
+    assert (item["quantity"], item["unit"]) == (1000, "ml")
+
+def test_url_listed_under_two_categories_is_scraped_once(fake_db, monkeypatch):
+    url = "https://rimi.example/c/SH-15?currentPage=1&pageSize=100"
+    links = [("Babies-kids", url), ("Fish", "https://rimi.example/c/SH-9"), ("Clothing", url)]
+    pages = {RimiAdapter.page_url(url, 1): rimi_page(["1", "2"])}
+    monkeypatch.setattr("app.scraper.Fetcher", lambda: FakeFetcher(pages))
+    assert [category for category, _ in RimiAdapter(links=links).links] == ["Babies-kids", "Fish"]
+    summaries = [scrape_store(RimiAdapter(links=links)) for _ in range(3)]
+    assert [summary["inserted"] + summary["updated"] for summary in summaries] == [2, 0, 0]
+    assert {item["category"] for item in fake_db.data.values()} == {"Babies-kids"}
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_maxima_adapter_extract_and_normalize(parser):
+    adapter = MaximaAdapter(parser=parser)
+    records = adapter.extract(MAXIMA_PAGE, None)
+    assert len(records) == 1
+    item = adapter.normalize(records[0])
+    assert item["product_id"] == "777"
+    assert item["brand"] == "VALIO"
+    assert item["search_name"] == "jogurts  dabīgais"
+    assert item["image_url"] == "https://www.maxima.lv/images/777.png"
+    assert (item["quantity"], item["unit"]) == (400, "g")
+    assert item["price"]["value"] == 1.99
+    assert item["price"]["old_value"] == 2.49
+    assert item["price"]["discount"] == 20
+    assert item["price"]["price_per_unit"] == 4.97
+    assert item["time"]["discount_deadline"] == datetime(2025, 3, 9)
+
+def test_rimi_adapter_fans_out_pages(monkeypatch):
+    base_url = "https://rimi.example/c/SH-1?currentPage=1&pageSize=100"
+    page_url = RimiAdapter.page_url
+    pages = {
+        page_url(base_url, 1): rimi_page([f"a{i}" for i in range(100)], last_page=3),
+        page_url(base_url, 2): rimi_page([f"b{i}" for i in range(100)], last_page=3),
+        page_url(base_url, 3): rimi_page(["c0"], last_page=3),
+    }
+    fetcher, writer = FakeFetcher(pages), ListWriter()
+    monkeypatch.setattr("app.scraper.Fetcher", lambda: fetcher)
+    asyncio.run(run_adapter(RimiAdapter(links=[("Milk-products", base_url)]), writer))
+    assert len(writer.items) == 201
+    assert sorted(fetcher.requested) == sorted(pages)
+
+def test_maxima_records_categorized_on_ingest(fake_db, monkeypatch):
+    fake_db.insert_one({"store": "Rimi", "name": "Jogurts", "search_name": "jogurts", "category": "Milk-products"})
+    monkeypatch.setattr("app.scraper.Fetcher", lambda: FakeFetcher({MaximaAdapter().page_url(0): MAXIMA_PAGE}))
+    assert scrape_store(MaximaAdapter())["inserted"] == 1
+    item = fake_db.find_one({"product_id": "777"})
+    assert item["category"] == "Milk-products"
+    assert item["categorized_with"]
+
+def test_unchanged_pages_are_not_parsed(monkeypatch):
+    page = Page(MAXIMA_PAGE)
+    page.unchanged = True
+    monkeypatch.setattr("app.scraper.Fetcher", lambda: FakeFetcher({MaximaAdapter().page_url(0): page}))
+    adapter, writer = MaximaAdapter(), ListWriter()
+    monkeypatch.setattr(adapter, "extract", lambda html, context: pytest.fail("parsed an unchanged page"))
+    asyncio.run(run_adapter(adapter, writer))
+    assert writer.items == []
+
+def maxima_items(start, count):
+    return "".join(f'<div class="item" data-product-id="{i}"><div class="title">Piens {i}, 1 l</div>'
+                   f'<div class="t1"><span class="value">1</span><span class="cents">00</span></div></div>'
+                   for i in range(start, start + count))
+
+def test_maxima_adapter_pages_through_sales():
+    adapter = MaximaAdapter(page_size=2)
+    fetcher = FakeFetcher({adapter.page_url(0): maxima_items(0, 2), adapter.page_url(2): maxima_items(2, 2),
+                           adapter.page_url(4): maxima_items(4, 1)})
+    writer = ListWriter()
+    asyncio.run(run_adapter_with(adapter, fetcher, writer))
+    assert [item["product_id"] for item in writer.items] == ["0", "1", "2", "3", "4"]
+    assert len(fetcher.requested) == 3
+
+def test_maxima_adapter_falls_back_when_offset_ignored():
+    adapter = MaximaAdapter(page_size=2)
+    first = maxima_items(0, 2)
+    fetcher = FakeFetcher({adapter.page_url(0): first, adapter.page_url(2): first,
+                           adapter.url: maxima_items(0, 3)})
+    writer = ListWriter()
+    asyncio.run(run_adapter_with(adapter, fetcher, writer))
+    assert sorted({item["product_id"] for item in writer.items}) == ["0", "1", "2"]
+    assert fetcher.requested[-1] == adapter.url
+
+def test_failed_fallback_request_is_recorded():
+    adapter = MaximaAdapter(page_size=2)
+    first = maxima_items(0, 2)
+    writer = ListWriter()
+    asyncio.run(run_adapter_with(adapter, FakeFetcher({adapter.page_url(0): first, adapter.page_url(2): first}),
+                                 writer))
+    assert adapter.failed == [{"offset": 2}]
+
+async def run_adapter_with(adapter, fetcher, writer):
+    async for html, context in adapter.pages(fetcher):
+        for record in adapter.extract(html, context):
+            writer.add(adapter.normalize(record))
+
+def test_failed_final_write_leaves_pages_unparsed(fake_db, monkeypatch, tmp_path):
+    page_url = MaximaAdapter().page_url(0)
+    transport = httpx.MockTransport(lambda request: httpx.Response(
+        200, text=MAXIMA_PAGE if str(request.url) == page_url else "<html></html>"))
+    monkeypatch.setattr("app.scraper.Fetcher", lambda: Fetcher(cache=HttpCache(tmp_path), transport=transport,
+                                                               per_host_rate=1000))
+    bulk_write = fake_db.bulk_write
+    def write_once_failing(operations, ordered=True):
+        monkeypatch.setattr(fake_db, "bulk_write", bulk_write)
+        raise RuntimeError("write failed")
+    monkeypatch.setattr(fake_db, "bulk_write", write_once_failing)
+    with pytest.raises(RuntimeError):
+        scrape_store(MaximaAdapter())
+    # The page was not committed to the HTTP cache, so the next run parses and writes it
+    assert scrape_store(MaximaAdapter())["inserted"] == 1
+    assert fake_db.find_one({"product_id": "777"})
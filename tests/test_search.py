@@ -0,0 +1,50 @@
+import pytest
+from datetime import datetime, timedelta
+from app.models import Item
+from app import search
+from app.search import LocalSearch
+from app.scraper import ItemWriter
+from helpers import make_item, named
+
+pytestmark = pytest.mark.usefixtures("fake_db")
+
+@pytest.fixture
+def local(monkeypatch):
+    backend = LocalSearch(interval=0)
+    search.set_backend(backend)
+    return backend
+
+def test_local_search_folds_diacritics_and_tolerates_typos(local):
+    Item.create(named("1", "piens"))
+    Item.create(named("2", "jogurts dabīgais"))
+    Item.create(named("3", "maize"))
+    assert [item["product_id"] for item in local.search("Dabigais")] == ["2"]
+    assert [item["product_id"] for item in local.search("jogrts")] == ["2"]
+    assert local.search("zzzz") == []
+
+def test_local_search_applies_filters(local):
+    Item.create(named("1", "piens", store="Rimi"))
+    Item.create(named("2", "piens", store="Maxima"))
+    assert [item["store"] for item in local.search("piens", {"store": "Rimi"})] == ["Rimi"]
+
+def test_local_search_follows_writes(local, fake_db):
+    Item.create(named("1", "piens"))
+    assert len(local.search("siers")) == 0
+
+    # Same process: the writer pushes its items into the index
+    writer = ItemWriter("Maxima")
+    writer.add(named("2", "siers"))
+    writer.flush()
+    assert [item["product_id"] for item in local.search("siers")] == ["2"]
+
+    # Another process wrote: picked up through the version document and time.updated
+    item = named("3", "siers kausētais")
+    item["time"]["updated"] = datetime.utcnow() + timedelta(seconds=1)
+    fake_db.insert_one(item)
+    Item.bump_data_version()
+    assert {item["product_id"] for item in local.search("siers")} == {"2", "3"}
+
+    # Deletions force a reload
+    fake_db.delete_many({"product_id": "2"})
+    Item.bump_data_version(deleted=True)
+    assert [item["product_id"] for item in local.search("siers")] == ["3"]